@@ -0,0 +1,20 @@
+from django.apps import AppConfig
+from django.conf import settings
+from django.core.checks import run_checks
+from django.core.exceptions import ImproperlyConfigured
+
+
+class DetectionsConfig(AppConfig):
+    name = 'app'
+
+    def ready(self):
+        # Instrument database connections from the first query on
+        from . import metrics  # noqa: F401
+        from .checks import PERFORMANCE
+
+        # Servers don't run system checks, so the production profile runs its own at startup
+        if settings.PRODUCTION:
+            errors = [message for message in run_checks(tags=[PERFORMANCE]) if message.is_serious()]
+            if errors:
+                raise ImproperlyConfigured(
+                    'The production profile refuses these settings:\n' + '\n'.join(str(error) for error in errors))
@@ -0,0 +1,191 @@
+import asyncio
+import logging
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from . import llm_cache, metrics
+from .llm_client import get_client
+from .mitre import build_mitre_prompt, parse_classification, mitre_cache_key
+from .scoring import (
+    COMBINED,
+    missing_components,
+    build_prompts,
+    build_combined_prompt,
+    parse_score,
+    parse_combined_scores,
+    score_cache_key,
+    finish_scoring,
+)
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# The cache helpers use the ORM, which must run outside the event loop
+_cache_get = sync_to_async(llm_cache.get)
+_cache_set = sync_to_async(llm_cache.set)
+
+
+@metrics.timed('llm_score')
+async def arequest_score(prompt, timeout=None):
+    """
+    Async version of scoring.request_score.
+    """
+    score = parse_score(await get_client().acomplete(prompt, 10, timeout))
+    logger.info(f"Obtained score from OpenAI: {score}")
+    return score
+
+
+@metrics.timed('llm_scores_combined')
+async def arequest_combined_scores(prompt, components, timeout=None):
+    """
+    Async version of scoring.request_combined_scores.
+    """
+    content = await get_client().acomplete(prompt, 15 * len(components), timeout)
+    return parse_combined_scores(content, components)
+
+
+@metrics.timed('llm_classify_mitre')
+async def arequest_classification(prompt, timeout=None):
+    """
+    Async version of mitre.request_classification.
+    """
+    return (await get_client().acomplete(prompt, 500, timeout)).strip()
+
+
+async def ascore_components(prompts, components, max_concurrency=None, timeout=None, cache_keys=None):
+    """
+    Async version of scoring.score_components: same caching, concurrency limit and defaults,
+    but the calls are coroutines on the event loop instead of threads.
+    """
+    max_concurrency = max_concurrency or settings.SCORING_MAX_CONCURRENCY
+    timeout = timeout or settings.SCORING_CALL_TIMEOUT
+    cache_keys = cache_keys or {}
+
+    scores = {}
+    for component in components:
+        if component in cache_keys:
+            cached = await _cache_get(cache_keys[component])
+            if cached is not None:
+                scores[component] = cached
+    to_request = [component for component in components if component not in scores]
+    if not to_request:
+        return scores
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def request(component):
+        async with semaphore:
+            # The client enforces the per-call timeout too; wait_for also bounds time spent connecting
+            return await asyncio.wait_for(
+                arequest_score(prompts[component], timeout), get_client().max_duration(timeout) + 1
+            )
+
+    results = await asyncio.gather(*(request(component) for component in to_request), return_exceptions=True)
+    for component, result in zip(to_request, results):
+        if isinstance(result, asyncio.TimeoutError):
+            logger.error(f"Timed out waiting for {component.upper()} score.")
+        elif isinstance(result, ValueError):
+            logger.error(f"Invalid score format: {result}")
+            scores[component] = 0  # Default to 0 if parsing fails
+        elif isinstance(result, Exception):
+            # Failed calls leave the component unset, like the sync version
+            logger.error(f"Error getting score from OpenAI: {result}")
+        else:
+            scores[component] = result
+            # Only successful scores are cached, so failures are retried next time
+            if component in cache_keys:
+                await _cache_set(cache_keys[component], 'score', result)
+    return scores
+
+
+async def ascore_components_combined(logic_text, components, timeout=None):
+    """
+    Async version of scoring.score_components_combined.
+    """
+    timeout = timeout or settings.SCORING_CALL_TIMEOUT
+    cache_keys = {component: score_cache_key(component, logic_text, COMBINED) for component in components}
+
+    scores = {}
+    for component in components:
+        cached = await _cache_get(cache_keys[component])
+        if cached is not None:
+            scores[component] = cached
+    to_request = [component for component in components if component not in scores]
+
+    if to_request:
+        try:
+            combined = await asyncio.wait_for(
+                arequest_combined_scores(build_combined_prompt(logic_text, to_request), to_request, timeout),
+                get_client().max_duration(timeout) + 1,
+            )
+        except Exception as e:
+            logger.error(f"Error getting combined scores from OpenAI: {e}")
+            combined = {}
+        for component, score in combined.items():
+            scores[component] = score
+            await _cache_set(cache_keys[component], 'score', score)
+
+    # Fall back to one prompt per component for anything the combined response didn't cover
+    fallback = [component for component in components if component not in scores]
+    if fallback:
+        logger.warning(f"Falling back to per-component scoring for: {', '.join(fallback)}")
+        cache_keys = {component: score_cache_key(component, logic_text) for component in fallback}
+        scores.update(await ascore_components(build_prompts(logic_text), fallback, timeout=timeout, cache_keys=cache_keys))
+    return scores
+
+
+async def afill_missing_components(detection, mode=None):
+    """
+    Async version of scoring.fill_missing_components. The detection is not saved.
+    """
+    mode = mode or settings.SCORING_MODE
+    # Same sanitizing and length limit as the sync version
+    logic_text = detection.logic.strip()[:1000]
+
+    missing = missing_components(detection)
+    if not missing:
+        return {}
+
+    if mode == COMBINED:
+        scores = await ascore_components_combined(logic_text, missing)
+    else:
+        cache_keys = {component: score_cache_key(component, logic_text) for component in missing}
+        scores = await ascore_components(build_prompts(logic_text), missing, cache_keys=cache_keys)
+
+    for component, score in scores.items():
+        setattr(detection, component, score)
+        logger.info(f"Calculated {component.upper()} score: {score}")
+    return scores
+
+
+async def ascore_detection(detection, weights, mode=None, reused_from=None):
+    """
+    Async version of scoring.score_detection; raises the same errors.
+    """
+    logic_hash = detection.logic_hash
+    started = time.monotonic()
+    scored = await afill_missing_components(detection, mode)
+    return await sync_to_async(finish_scoring)(
+        detection, weights, mode, logic_hash, scored, time.monotonic() - started, reused_from)
+
+
+async def aclassify_mitre(description_text, timeout=None):
+    """
+    Return (tactics, techniques) for an (already sanitized) description, using the LLM cache.
+    Raises like mitre.request_classification and mitre.parse_classification.
+    """
+    timeout = timeout or settings.SCORING_CALL_TIMEOUT
+    cache_key = mitre_cache_key(description_text)
+    cached = await _cache_get(cache_key)
+    if cached is not None:
+        return cached['tactics'], cached['techniques']
+
+    content = await asyncio.wait_for(
+        arequest_classification(build_mitre_prompt(description_text), timeout),
+        get_client().max_duration(timeout) + 1,
+    )
+    tactics, techniques = parse_classification(content)
+    await _cache_set(cache_key, 'mitre', {'tactics': tactics, 'techniques': techniques})
+    return tactics, techniques
@@ -0,0 +1,161 @@
+# async_views.py
+#
+# Async versions of the endpoints that wait on OpenAI. Under ASGI (e.g. `uvicorn project.asgi:application`)
+# a request waiting on the LLM only holds a coroutine, not a worker thread, so many in-flight scoring
+# requests share the event loop and its connection pool. DRF views are sync-only, so these are plain
+# Django views returning the same payloads as their DetectionViewSet counterparts.
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse, HttpResponseNotAllowed
+
+from .models import Detection
+from .scoring import (
+    SCORING_MODES,
+    configure_backend,
+    get_weights,
+    missing_components,
+    ComponentsUnavailableError,
+    DetectionChangedError,
+)
+from .llm_client import CircuitOpenError
+from .async_scoring import ascore_detection, aclassify_mitre
+from .similarity import reuse_scored_neighbor
+from .views import parse_reuse_threshold
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+def _get_detection(pk):
+    try:
+        return Detection.objects.get(pk=pk)
+    except Detection.DoesNotExist:
+        return None
+
+
+_aget_detection = sync_to_async(_get_detection)
+_aget_weights = sync_to_async(get_weights)
+
+
+def _request_data(request):
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+async def calculate_score(request, pk):
+    """
+    Calculate the Shannon score for a specific Detection instance (async).
+    Pass "mode" ("per_component" or "combined") in the body or query string
+    to override the SCORING_MODE setting, and "reuse_similar" to copy the components of the
+    most similar fully scored detection (see views.parse_reuse_threshold).
+    """
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+
+    detection = await _aget_detection(pk)
+    if detection is None:
+        return JsonResponse({'detail': 'Not found.'}, status=404)
+
+    data = _request_data(request)
+    mode = data.get('mode') or request.GET.get('mode') or settings.SCORING_MODE
+    if mode not in SCORING_MODES:
+        return JsonResponse({'error': f"Invalid mode. Choose one of: {', '.join(SCORING_MODES)}"}, status=400)
+
+    threshold, error = parse_reuse_threshold(data, request.GET)
+    if error:
+        return JsonResponse({'error': error}, status=400)
+    reused_from = await sync_to_async(reuse_scored_neighbor)(detection, threshold) if threshold is not None else None
+
+    # Ensure OpenAI API key is set
+    if missing_components(detection) and not configure_backend():
+        return JsonResponse({'error': 'OPENAI_API_KEY environment variable is not set.'}, status=500)
+
+    weights = await _aget_weights()
+
+    try:
+        await ascore_detection(detection, weights, mode, reused_from)
+    except ComponentsUnavailableError as e:
+        # The components that were scored are kept; the client can retry the rest later
+        return JsonResponse({'error': 'The LLM backend is unavailable; some components could not be scored.',
+                             'missing': e.missing}, status=503)
+    except DetectionChangedError as e:
+        return JsonResponse({'error': str(e)}, status=409)
+    except Exception as e:
+        logger.error(f"Error calculating Shannon score: {e}")
+        return JsonResponse({'error': 'Failed to calculate Shannon score.', 'details': str(e)}, status=500)
+
+    result = {
+        'mode': mode,
+        'shannon_score': detection.shannon_score,
+        'weights_version': detection.weights_version,
+        'tac': detection.tac,
+        'di': detection.di,
+        'oc': detection.oc,
+        'irp': detection.irp,
+        'u': detection.u,
+    }
+    if threshold is not None:
+        result['reused_from'] = reused_from
+    return JsonResponse(result)
+
+
+
+async def classify_mitre(request, pk):
+    """
+    Classify MITRE ATT&CK tactics and techniques based on detection description (async).
+    """
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+
+    detection = await _aget_detection(pk)
+    if detection is None:
+        return JsonResponse({'detail': 'Not found.'}, status=404)
+
+    # Ensure OpenAI API key is set
+    if not configure_backend():
+        return JsonResponse({'error': 'OPENAI_API_KEY environment variable is not set.'}, status=500)
+
+    # Sanitize and limit the description like the sync view
+    description_text = detection.description.strip()[:1000]
+
+    try:
+        tactics, techniques = await aclassify_mitre(description_text)
+    except CircuitOpenError as e:
+        return JsonResponse({'error': str(e)}, status=503)
+    except json.JSONDecodeError as e:
+        logger.error(f"JSON parsing error: {e}")
+        return JsonResponse({'error': 'Failed to parse MITRE ATT&CK classification response.',
+                             'details': str(e)}, status=500)
+    except ValueError as ve:
+        logger.error(f"ValueError: {ve}")
+        return JsonResponse({'error': str(ve)}, status=400)
+    except Exception as e:
+        logger.error(f"Error classifying MITRE: {e}")
+        return JsonResponse({'error': 'Failed to classify MITRE mappings.', 'details': str(e)}, status=500)
+
+    try:
+        detection.mitre_tactics = tactics
+        detection.mitre_techniques = techniques
+        # Only the classification, so edits made while the LLM was answering are kept
+        await sync_to_async(detection.save)(update_fields=['mitre_tactics', 'mitre_techniques'])
+    except Exception as e:
+        logger.error(f"Error saving MITRE classification: {e}")
+        return JsonResponse({'error': 'Failed to classify MITRE mappings.', 'details': str(e)}, status=500)
+    logger.info(f"Classified MITRE Tactics: {tactics}")
+    logger.info(f"Classified MITRE Techniques: {techniques}")
+    return JsonResponse({
+        'mitre_tactics': detection.mitre_tactics,
+        'mitre_techniques': detection.mitre_techniques,
+    })
+
+
+# Django 3.2's csrf_exempt decorator wraps views in a sync function, so set the flag directly.
+# Like the DRF views, these endpoints are meant for API clients rather than browser sessions.
+calculate_score.csrf_exempt = True
+classify_mitre.csrf_exempt = True
@@ -0,0 +1,173 @@
+import difflib
+import functools
+import json
+import logging
+import re
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+_TECHNIQUE_ID = re.compile(r'\bT(\d{4})(?:\.(\d{3}))?\b', re.IGNORECASE)
+_TACTIC_ID = re.compile(r'\bTA(\d{4})\b', re.IGNORECASE)
+
+# Minimum difflib ratio for a misspelled tactic or technique name to match a catalog name
+FUZZY_CUTOFF = 0.85
+
+
+def name_key(name):
+    """
+    Lookup key of a tactic or technique name: lowercase words, ignoring punctuation and spacing.
+    """
+    return ' '.join(re.findall(r'[a-z0-9]+', name.lower()))
+
+
+class AttackCatalog:
+    """
+    In-memory index of the ATT&CK tactics and techniques, used to turn whatever the model (or a
+    user) wrote into canonical values: tactic names ("Execution") and technique IDs ("T1059").
+    """
+    def __init__(self, tactics, techniques, name='', version=''):
+        self.name = name
+        self.version = version
+        # Canonical tactic name by TA ID and by name and shortname key
+        self.tactics = {}
+        self._tactic_keys = {}
+        for tactic in tactics:
+            self.tactics[tactic['id']] = tactic['name']
+            self._tactic_keys[name_key(tactic['name'])] = tactic['name']
+            if tactic.get('shortname'):
+                self._tactic_keys[name_key(tactic['shortname'])] = tactic['name']
+        # Technique name by ID, and technique ID by name key
+        self.techniques = {technique['id']: technique['name'] for technique in techniques}
+        self._technique_keys = {}
+        for technique in techniques:
+            # A sub-technique name ("PowerShell") is only unique together with its parent's
+            parent = self.techniques.get(technique['id'].split('.')[0])
+            full_name = technique['name'] if parent in (None, technique['name']) else f"{parent}: {technique['name']}"
+            self._technique_keys.setdefault(name_key(full_name), technique['id'])
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        Load a catalog file: either a STIX 2 bundle as published by MITRE (e.g. enterprise-attack.json
+        from the mitre/cti repository) or the compact format of app/data/attack_catalog.json.
+        """
+        with open(path, encoding='utf-8') as catalog_file:
+            data = json.load(catalog_file)
+        if data.get('type') == 'bundle':
+            return cls.from_stix(data)
+        return cls(data['tactics'], data['techniques'], data.get('name', ''), data.get('version', ''))
+
+    @classmethod
+    def from_stix(cls, bundle):
+        tactics, techniques = [], []
+        version = ''
+        for obj in bundle.get('objects', []):
+            if obj.get('revoked') or obj.get('x_mitre_deprecated'):
+                continue
+            attack_id = next((reference.get('external_id') for reference in obj.get('external_references', [])
+                              if reference.get('source_name') == 'mitre-attack'), None)
+            if obj['type'] == 'x-mitre-collection':
+                version = obj.get('x_mitre_version', '')
+            elif obj['type'] == 'x-mitre-tactic' and attack_id:
+                tactics.append({'id': attack_id, 'name': obj['name'], 'shortname': obj.get('x_mitre_shortname', '')})
+            elif obj['type'] == 'attack-pattern' and attack_id:
+                techniques.append({
+                    'id': attack_id,
+                    'name': obj['name'],
+                    'tactics': [phase['phase_name'] for phase in obj.get('kill_chain_phases', [])
+                                if phase.get('kill_chain_name') == 'mitre-attack'],
+                })
+        # Parents first, so sub-technique names can be qualified with them
+        techniques.sort(key=lambda technique: technique['id'])
+        return cls(tactics, techniques, 'MITRE ATT&CK (STIX bundle)', version)
+
+    def normalize_tactic(self, value):
+        """
+        Return the canonical name of the tactic `value` refers to (by TA ID, name or shortname,
+        tolerating small typos), or None if it is not in the catalog.
+        """
+        match = _TACTIC_ID.search(value)
+        if match and f'TA{match.group(1)}' in self.tactics:
+            return self.tactics[f'TA{match.group(1)}']
+        key = name_key(_TACTIC_ID.sub('', value))
+        if key in self._tactic_keys:
+            return self._tactic_keys[key]
+        close = difflib.get_close_matches(key, list(self._tactic_keys), n=1, cutoff=FUZZY_CUTOFF)
+        return self._tactic_keys[close[0]] if close else None
+
+    def normalize_technique(self, value):
+        """
+        Return the canonical ID of the technique `value` refers to ("T1059", "t1059.001",
+        "T1059: Command and Scripting Interpreter" or a name, tolerating small typos), or None if it
+        is not in the catalog. Sub-techniques the catalog does not list map to their parent.
+        """
+        match = _TECHNIQUE_ID.search(value)
+        if match:
+            technique_id = f'T{match.group(1)}'
+            if match.group(2) and f'{technique_id}.{match.group(2)}' in self.techniques:
+                return f'{technique_id}.{match.group(2)}'
+            if technique_id in self.techniques:
+                return technique_id
+        # No (known) ID: fall back to the name
+        key = name_key(_TECHNIQUE_ID.sub('', value))
+        if key in self._technique_keys:
+            return self._technique_keys[key]
+        close = difflib.get_close_matches(key, list(self._technique_keys), n=1, cutoff=FUZZY_CUTOFF)
+        return self._technique_keys[close[0]] if close else None
+
+    def normalize(self, tactics, techniques):
+        """
+        Normalize a classification. Returns (tactics, techniques, rejected): the canonical values,
+        without duplicates and in their original order, and the values that matched nothing.
+        """
+        rejected = []
+        canonical = {'tactics': [], 'techniques': []}
+        for kind, values, normalize in (('tactics', tactics, self.normalize_tactic),
+                                        ('techniques', techniques, self.normalize_technique)):
+            for value in values:
+                normalized = normalize(value) if isinstance(value, str) else None
+                if normalized is None:
+                    rejected.append(value)
+                elif normalized not in canonical[kind]:
+                    canonical[kind].append(normalized)
+        return canonical['tactics'], canonical['techniques'], rejected
+
+    def technique_name(self, technique_id):
+        return self.techniques.get(technique_id)
+
+
+@functools.lru_cache(maxsize=None)
+def load_catalog(path):
+    catalog = AttackCatalog.from_file(path)
+    logger.info(f"Loaded {catalog.name} {catalog.version}: {len(catalog.tactics)} tactics, "
+                f"{len(catalog.techniques)} techniques")
+    return catalog
+
+
+def get_catalog():
+    """
+    Return the catalog loaded from the MITRE_ATTACK_CATALOG file (read once per process).
+    """
+    return load_catalog(settings.MITRE_ATTACK_CATALOG)
+
+
+def normalize_classification(tactics, techniques):
+    """
+    Return (tactics, techniques) as canonical catalog values, dropping (and logging) anything
+    that is not a known ATT&CK tactic or technique.
+    """
+    tactics, techniques, rejected = get_catalog().normalize(tactics, techniques)
+    if rejected:
+        logger.warning(f"Dropped values not in the ATT&CK catalog: {rejected}")
+    return tactics, techniques
+
+
+@receiver(setting_changed)
+def _reset_catalog(setting, **kwargs):
+    if setting == 'MITRE_ATTACK_CATALOG':
+        load_catalog.cache_clear()
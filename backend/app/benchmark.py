@@ -0,0 +1,246 @@
+import csv
+import io
+import json
+import logging
+import random
+import time
+import tracemalloc
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from .attack import get_catalog
+from .models import Detection, compute_logic_hash, compute_signature_fields
+from .scoring import COMPONENTS, recompute_shannon_scores
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+SCENARIOS = ['list', 'retrieve', 'upload_csv', 'update_weights', 'calculate_score']
+
+# Building blocks of the synthetic detection rules
+PROCESSES = ['powershell.exe', 'cmd.exe', 'rundll32.exe', 'regsvr32.exe', 'mshta.exe', 'wmic.exe',
+             'certutil.exe', 'schtasks.exe', 'bitsadmin.exe', 'msiexec.exe', 'wscript.exe', 'sc.exe']
+ARGUMENTS = ['-enc', '-nop', 'downloadstring', '/create', 'urlcache', 'javascript:', 'shadowcopy delete',
+             '/transfer', 'scrobj.dll', 'process call create', 'config', '-w hidden']
+USERS = ['SYSTEM', 'LOCAL SERVICE', 'NETWORK SERVICE', 'admin', 'svc_backup']
+ACTIONS = ['launching', 'spawning', 'executing', 'loading', 'abusing']
+
+# Two weight sets the update_weights scenario alternates between (each sums to 1)
+WEIGHT_SETS = [
+    {'tac_weight': 0.3, 'di_weight': 0.2, 'oc_weight': 0.2, 'irp_weight': 0.2, 'u_weight': 0.1},
+    {'tac_weight': 0.2, 'di_weight': 0.2, 'oc_weight': 0.2, 'irp_weight': 0.2, 'u_weight': 0.2},
+]
+
+
+class BenchmarkError(Exception):
+    """
+    Raised when a benchmarked request does not succeed.
+    """
+
+
+def synthetic_detection(number, rng):
+    """
+    Return the name, logic and description of synthetic detection `number`.
+    """
+    process, argument = rng.choice(PROCESSES), rng.choice(ARGUMENTS)
+    user, threshold = rng.choice(USERS), rng.randint(1, 50)
+    logic = (f'process.name == "{process}" and process.command_line contains "{argument}" '
+             f'and user.name != "{user}" and event.count > {threshold} | rule {number}')
+    description = (f'Detects {process} {rng.choice(ACTIONS)} with "{argument}" outside of {user}, '
+                   f'more than {threshold} times within five minutes (rule {number}).')
+    return f'bench-{number}', logic, description
+
+
+def seed_detections(count, rng, start=0, batch_size=1000):
+    """
+    Insert synthetic detections numbered start..count-1, fully scored and classified, the way
+    the bulk upload path writes them. Returns the number of inserted rows.
+    """
+    catalog = get_catalog()
+    tactics, techniques = list(catalog.tactics.values()), list(catalog.techniques)
+    batch = []
+    for number in range(start, count):
+        name, logic, description = synthetic_detection(number, rng)
+        batch.append(Detection(
+            name=name,
+            logic=logic,
+            logic_hash=compute_logic_hash(logic),
+            description=description,
+            mitre_tactics=rng.sample(tactics, 2),
+            mitre_techniques=rng.sample(techniques, 3),
+            **{component: float(rng.randint(0, 100)) for component in COMPONENTS},
+            **compute_signature_fields(logic=logic, description=description),
+        ))
+        if len(batch) >= batch_size:
+            Detection.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        Detection.objects.bulk_create(batch)
+    recompute_shannon_scores()
+    return max(count - start, 0)
+
+
+def build_csv(rows, rng, prefix):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(['name', 'logic', 'description'])
+    for number in range(rows):
+        name, logic, description = synthetic_detection(number, rng)
+        writer.writerow([f'{prefix}-{name}', logic, description])
+    return buffer.getvalue().encode('utf-8')
+
+
+def percentile(values, fraction):
+    """
+    Linearly interpolated percentile of `values` (fraction between 0 and 1).
+    """
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def measure(operation, iterations, warmup=0, prepare=None, cleanup=None):
+    """
+    Call `operation(state)` warmup + iterations times, where `state` comes from `prepare(i)` and
+    is passed to `cleanup(state)` afterwards (neither is timed). Returns throughput, latency
+    percentiles, queries per call and the peak Python memory of one extra (traced) call.
+    """
+    latencies, queries = [], []
+    for iteration in range(warmup + iterations):
+        state = prepare(iteration) if prepare else None
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            operation(state)
+            elapsed = time.perf_counter() - started
+        if cleanup:
+            cleanup(state)
+        if iteration >= warmup:
+            latencies.append(elapsed)
+            queries.append(len(captured.captured_queries))
+
+    # Memory is measured separately, since tracing slows every allocation down
+    state = prepare(warmup + iterations) if prepare else None
+    tracemalloc.start()
+    try:
+        operation(state)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    if cleanup:
+        cleanup(state)
+
+    total = sum(latencies)
+    return {
+        'iterations': iterations,
+        'throughput_per_s': iterations / total if total else None,
+        'latency_ms': {
+            'mean': total / iterations * 1000,
+            'p50': percentile(latencies, 0.5) * 1000,
+            'p99': percentile(latencies, 0.99) * 1000,
+            'max': max(latencies) * 1000,
+        },
+        'queries_per_op': sum(queries) / iterations,
+        'peak_memory_kib': peak / 1024,
+    }
+
+
+def check(response, expected):
+    if response.status_code != expected:
+        body = response.content[:500].decode('utf-8', 'replace') if not response.streaming else ''
+        raise BenchmarkError(f"{response.request['REQUEST_METHOD']} {response.request['PATH_INFO']} "
+                             f"returned {response.status_code}: {body}")
+    return response
+
+
+class Benchmark:
+    """
+    Runs the SCENARIOS against the detection API in-process, with a Django test client, on
+    whatever database the default connection points to. The database is emptied first.
+    """
+    def __init__(self, iterations=50, warmup=3, upload_rows=1000, seed=0, log=None):
+        self.iterations = iterations
+        self.warmup = warmup
+        self.upload_rows = upload_rows
+        self.rng = random.Random(seed)
+        self.client = Client()
+        self.log = log or logger.info
+        self.seeded = 0
+
+    def reset(self):
+        with connection.cursor() as cursor:
+            cursor.execute('TRUNCATE app_detection, app_detectionchange, app_llmcacheentry RESTART IDENTITY CASCADE')
+        self.seeded = 0
+
+    def grow_to(self, size):
+        started = time.perf_counter()
+        self.seeded += seed_detections(size, self.rng, start=self.seeded)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE app_detection')
+        self.log(f'Seeded {size} detections in {time.perf_counter() - started:.1f}s')
+        self.ids = list(Detection.objects.values_list('id', flat=True))
+
+    def run(self, sizes, scenarios=None):
+        """
+        Seed each size in turn (ascending, adding rows to the previous library) and run the
+        scenarios against it. Returns a list of result dicts.
+        """
+        results = []
+        self.reset()
+        for size in sorted(sizes):
+            self.grow_to(size)
+            for scenario in scenarios or SCENARIOS:
+                result = {'size': size, 'scenario': scenario, **getattr(self, f'bench_{scenario}')()}
+                self.log(f"{size:>8} {scenario:<16} p50 {result['latency_ms']['p50']:9.1f} ms  "
+                         f"p99 {result['latency_ms']['p99']:9.1f} ms  {result['throughput_per_s']:8.1f}/s  "
+                         f"{result['queries_per_op']:6.1f} queries  {result['peak_memory_kib']:9.0f} KiB")
+                results.append(result)
+        return results
+
+    def bench_list(self):
+        return measure(lambda state: check(self.client.get('/api/detections/'), 200),
+                       self.iterations, self.warmup)
+
+    def bench_retrieve(self):
+        return measure(lambda pk: check(self.client.get(f'/api/detections/{pk}/'), 200),
+                       self.iterations, self.warmup, prepare=lambda i: self.rng.choice(self.ids))
+
+    def bench_upload_csv(self):
+        def prepare(iteration):
+            prefix = f'upload{iteration}'
+            return prefix, SimpleUploadedFile('detections.csv', build_csv(self.upload_rows, self.rng, prefix),
+                                              content_type='text/csv')
+
+        def upload(state):
+            check(self.client.post('/api/detections/upload_csv/', {'file': state[1]}), 201)
+
+        def cleanup(state):
+            # Keep the library at its seeded size
+            Detection.objects.filter(name__startswith=f'{state[0]}-').delete()
+
+        # Uploads are slower, so run fewer of them
+        return measure(upload, max(self.iterations // 5, 1), min(self.warmup, 1), prepare, cleanup)
+
+    def bench_update_weights(self):
+        def update(weights):
+            check(self.client.patch('/api/shannon-score-weights/1/', json.dumps(weights),
+                                    content_type='application/json'), 200)
+
+        return measure(update, self.iterations, self.warmup,
+                       prepare=lambda i: WEIGHT_SETS[i % len(WEIGHT_SETS)])
+
+    def bench_calculate_score(self):
+        def prepare(iteration):
+            # Clear a detection's scores so every component goes to the (fake) LLM
+            pk = self.rng.choice(self.ids)
+            Detection.objects.filter(pk=pk).update(shannon_score=None, **{component: None for component in COMPONENTS})
+            return pk
+
+        return measure(lambda pk: check(self.client.post(f'/api/detections/{pk}/calculate_score/'), 200),
+                       self.iterations, self.warmup, prepare)
@@ -0,0 +1,34 @@
+from .models import DetectionChange
+
+# Cursor of a client that has not synced yet
+START = (0, 0)
+
+
+def parse_cursor(value):
+    """
+    Parse a change feed cursor ("<change_seq>-<detection_id>"). Raises ValueError if it is malformed.
+    """
+    if not value:
+        return START
+    change_seq, detection_id = (int(part) for part in value.split('-'))
+    if change_seq < 0 or detection_id < 0:
+        raise ValueError(value)
+    return change_seq, detection_id
+
+
+def format_cursor(change_seq, detection_id):
+    return f'{change_seq}-{detection_id}'
+
+
+def changes_since(cursor, limit):
+    """
+    Return (changes, has_more): up to `limit` DetectionChange rows after `cursor`, in
+    (change_seq, detection_id) order. A range scan of the change_seq index, so the cost
+    depends on the number of changes, not on the size of the library.
+    """
+    change_seq, detection_id = cursor
+    changes = list(DetectionChange.objects
+                   .filter(change_seq__gte=change_seq)
+                   .exclude(change_seq=change_seq, detection_id__lte=detection_id)
+                   .order_by('change_seq', 'detection_id')[:limit + 1])
+    return changes[:limit], len(changes) > limit
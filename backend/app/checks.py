@@ -0,0 +1,74 @@
+from django.conf import settings
+from django.core.checks import Error, Warning, register
+
+# Tag of the checks below; under the production profile they run at startup (see apps.py)
+PERFORMANCE = 'performance'
+
+
+@register(PERFORMANCE)
+def check_performance_settings(app_configs=None, **kwargs):
+    """
+    Refuse settings known to make the production profile slow.
+    """
+    if not settings.PRODUCTION:
+        return []
+
+    from .renderers import orjson
+
+    errors = []
+    if settings.DEBUG:
+        errors.append(Error(
+            'DEBUG is on.',
+            hint='DEBUG keeps every SQL query in memory, which grows workers during bulk uploads. '
+                 'Unset DJANGO_DEBUG.',
+            id='app.E001',
+        ))
+    for alias, database in settings.DATABASES.items():
+        if not database.get('CONN_MAX_AGE'):
+            errors.append(Error(
+                f"Database '{alias}' opens a new connection for every request.",
+                hint='Set DB_CONN_MAX_AGE to a number of seconds.',
+                id='app.E002',
+            ))
+    if orjson is None:
+        errors.append(Error(
+            'orjson is not installed.',
+            hint='pip install orjson (see requirements.txt).',
+            id='app.E003',
+        ))
+    renderers = settings.REST_FRAMEWORK.get('DEFAULT_RENDERER_CLASSES', [])
+    if not renderers or renderers[0] != 'app.renderers.OrjsonRenderer':
+        errors.append(Error(
+            'The default DRF renderer is not app.renderers.OrjsonRenderer.',
+            id='app.E004',
+        ))
+    if 'rest_framework.renderers.BrowsableAPIRenderer' in renderers:
+        errors.append(Error(
+            'The browsable API renderer is enabled.',
+            hint='It renders HTML forms (and queries their choices) whenever a browser hits the API.',
+            id='app.E005',
+        ))
+    if 'app.middleware.CompressionMiddleware' not in settings.MIDDLEWARE:
+        errors.append(Error(
+            'Response compression is disabled.',
+            hint="Add 'app.middleware.CompressionMiddleware' to MIDDLEWARE.",
+            id='app.E006',
+        ))
+    for alias, cache in settings.CACHES.items():
+        if cache['BACKEND'] == 'django.core.cache.backends.dummy.DummyCache':
+            errors.append(Error(
+                f"Cache '{alias}' is a DummyCache, so every weights lookup queries the database.",
+                id='app.E007',
+            ))
+    if settings.LLM_BACKEND == 'fake':
+        errors.append(Error(
+            "LLM_BACKEND is 'fake'.",
+            hint='The fake backend is for load tests and benchmarks.',
+            id='app.E008',
+        ))
+    if not settings.LLM_CACHE_ENABLED:
+        errors.append(Warning(
+            'The LLM response cache is disabled, so identical rules are scored again.',
+            id='app.W001',
+        ))
+    return errors
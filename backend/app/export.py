@@ -0,0 +1,93 @@
+import csv
+import json
+
+from django.conf import settings
+from django.db import connections
+
+from .scoring import COMPONENTS
+
+# Export columns. name, logic and description are the upload_csv columns, so an export can be
+# uploaded again as is (extra columns are ignored; use mode=upsert to update instead of duplicating).
+EXPORT_FIELDS = [
+    'id',
+    'name',
+    'logic',
+    'description',
+    'shannon_score',
+    *COMPONENTS,
+    'weights_version',
+    'mitre_tactics',
+    'mitre_techniques',
+]
+
+# Export formats
+CSV = 'csv'
+NDJSON = 'ndjson'
+EXPORT_FORMATS = {
+    CSV: 'text/csv',
+    NDJSON: 'application/x-ndjson',
+}
+
+# Separator of the MITRE list columns in CSV exports (technique names contain commas)
+LIST_SEPARATOR = ';'
+
+
+class Echo:
+    """
+    File-like object whose write() returns the value, so csv.writer produces strings to stream.
+    """
+    def write(self, value):
+        return value
+
+
+def export_rows(queryset, chunk_size=None):
+    """
+    Yield a dict per detection, `chunk_size` rows at a time, so memory use does not grow with
+    the size of the export. Rows come from a server-side cursor, or, when those are disabled
+    (behind a transaction-mode pooler), from one keyset query per chunk.
+    """
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    rows = queryset.order_by('id').values(*EXPORT_FIELDS)
+    if not connections[queryset.db].settings_dict.get('DISABLE_SERVER_SIDE_CURSORS'):
+        yield from rows.iterator(chunk_size=chunk_size)
+        return
+    # Without a cursor the export is not one snapshot: rows changed while it runs may be missed
+    # or appear with their new values
+    last_id = None
+    while True:
+        chunk = list((rows if last_id is None else rows.filter(id__gt=last_id))[:chunk_size])
+        yield from chunk
+        if len(chunk) < chunk_size:
+            return
+        last_id = chunk[-1]['id']
+
+
+def csv_lines(queryset, chunk_size=None):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in export_rows(queryset, chunk_size):
+        for field in ('mitre_tactics', 'mitre_techniques'):
+            row[field] = LIST_SEPARATOR.join(row[field])
+        yield writer.writerow([row[field] for field in EXPORT_FIELDS])
+
+
+def ndjson_lines(queryset, chunk_size=None):
+    for row in export_rows(queryset, chunk_size):
+        yield json.dumps(row) + '\n'
+
+
+def stream_export(queryset, export_format, chunk_size=None):
+    """
+    Return an iterator over the export of `queryset` in `export_format` (CSV or NDJSON).
+    Lines are sent in blocks of `chunk_size` rows, since every yielded piece costs a write.
+    """
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    lines = ndjson_lines(queryset, chunk_size) if export_format == NDJSON else csv_lines(queryset, chunk_size)
+    block = []
+    for line in lines:
+        block.append(line)
+        if len(block) >= chunk_size:
+            yield ''.join(block)
+            block = []
+    if block:
+        yield ''.join(block)
@@ -0,0 +1,89 @@
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend, OrderingFilter
+
+from .attack import get_catalog
+from .models import SCORE_FIELDS, ShannonScoreWeights
+
+
+def rank_field(field):
+    # Name of the score_rank() annotation added by DetectionViewSet.get_queryset
+    return f'{field}_rank'
+
+
+def split_values(value):
+    if not value:
+        return []
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+class DetectionFilter(BaseFilterBackend):
+    """
+    Filter detections by name and score range.
+
+    ?name=<exact name>, ?name_contains=<text>, and ?min_<score>= / ?max_<score>= for
+    shannon_score, tac, di, oc, irp and u. Range filters exclude unscored detections.
+
+    ?stale_weights=true matches scored detections whose score predates the current weights.
+
+    MITRE filters take comma-separated values and use the GIN indexes on the arrays:
+    ?tactic= / ?technique= match detections mapped to all of them (contains),
+    ?tactic_any= / ?technique_any= match detections mapped to any of them (overlap).
+    Values are normalized like stored classifications, so ?technique=t1059 matches T1059.
+    """
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+
+        if params.get('name'):
+            queryset = queryset.filter(name=params['name'])
+        if params.get('name_contains'):
+            queryset = queryset.filter(name__icontains=params['name_contains'])
+
+        if params.get('stale_weights', '').lower() == 'true':
+            current = ShannonScoreWeights.load().version
+            queryset = queryset.filter(shannon_score__isnull=False).exclude(weights_version=current)
+
+        catalog = get_catalog()
+        for param, field, normalize in (('tactic', 'mitre_tactics', catalog.normalize_tactic),
+                                        ('technique', 'mitre_techniques', catalog.normalize_technique)):
+            # Unknown values are kept as given (and match nothing)
+            values = [normalize(value) or value for value in split_values(params.get(param))]
+            if values:
+                queryset = queryset.filter(**{f'{field}__contains': values})
+            values = [normalize(value) or value for value in split_values(params.get(f'{param}_any'))]
+            if values:
+                queryset = queryset.filter(**{f'{field}__overlap': values})
+
+        for field in SCORE_FIELDS:
+            for bound, lookup in (('min', 'gte'), ('max', 'lte')):
+                param = f'{bound}_{field}'
+                value = params.get(param)
+                if value in (None, ''):
+                    continue
+                try:
+                    value = float(value)
+                except ValueError:
+                    raise ValidationError({param: 'Must be a number.'})
+                # Filter on the indexed rank expression; unscored rows rank below 0
+                queryset = queryset.filter(**{f'{rank_field(field)}__{lookup}': value})
+                if bound == 'max':
+                    queryset = queryset.filter(**{f'{rank_field(field)}__gte': 0})
+        return queryset
+
+
+class DetectionOrderingFilter(OrderingFilter):
+    """
+    ?ordering= on name, id and the score columns. Score columns are ordered by their
+    non-null rank (unscored last when descending), and id breaks ties.
+    """
+    def get_ordering(self, request, queryset, view):
+        ordering = []
+        for field in super().get_ordering(request, queryset, view):
+            descending = field.startswith('-')
+            name = field.lstrip('-')
+            if name in SCORE_FIELDS:
+                name = rank_field(name)
+            ordering.append(f'-{name}' if descending else name)
+
+        if not any(field.lstrip('-') == 'id' for field in ordering):
+            ordering.append('-id' if ordering and ordering[0].startswith('-') else 'id')
+        return ordering
@@ -0,0 +1,196 @@
+import codecs
+import csv
+import logging
+
+from django.conf import settings
+from django.db import transaction
+
+from . import metrics
+from .models import Detection, compute_logic_hash, compute_signature_fields
+from .scoring import CLEARED_SCORES
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+REQUIRED_COLUMNS = {'name', 'logic', 'description'}
+
+# Upload modes: always insert, or merge into existing detections
+CREATE = 'create'
+UPSERT = 'upsert'
+UPLOAD_MODES = [CREATE, UPSERT]
+
+# Columns an upsert can match existing detections on
+UPSERT_KEYS = ['name', 'logic_hash']
+
+SIGNATURE_COLUMNS = ['logic_minhash', 'logic_bands', 'description_minhash', 'description_bands']
+
+
+class MissingColumnsError(Exception):
+    """
+    Raised when the CSV header lacks one of the required columns.
+    """
+    def __init__(self, missing):
+        self.missing = sorted(missing)
+        super().__init__(f"Missing CSV columns: {', '.join(self.missing)}")
+
+
+class IngestResult:
+    """
+    Outcome of a CSV ingestion. Only the first CSV_UPLOAD_MAX_ERRORS row errors are kept.
+    """
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.errors = []
+        self.error_count = 0
+
+    def add_error(self, message):
+        self.error_count += 1
+        if len(self.errors) < settings.CSV_UPLOAD_MAX_ERRORS:
+            self.errors.append(message)
+
+
+def read_csv_rows(file):
+    """
+    Return a DictReader that decodes the uploaded file line by line instead of reading it whole.
+    """
+    # Iterating a Django File yields lines read in chunks; iterdecode decodes them incrementally
+    reader = csv.DictReader(codecs.iterdecode(file, 'utf-8'))
+    fieldnames = set(reader.fieldnames or [])
+    if not REQUIRED_COLUMNS.issubset(fieldnames):
+        raise MissingColumnsError(REQUIRED_COLUMNS - fieldnames)
+    return reader
+
+
+def _set_signatures(detection, *names):
+    for field, value in compute_signature_fields(**{name: getattr(detection, name) for name in names}).items():
+        setattr(detection, field, value)
+
+
+def _create_batch(batch):
+    # bulk_create doesn't call save(), so set the signatures here
+    for detection in batch:
+        _set_signatures(detection, 'logic', 'description')
+    Detection.objects.bulk_create(batch)
+
+
+def _upsert_batch(batch, key):
+    """
+    Merge a batch of new detections into the table, matching existing rows on `key`.
+
+    Rows whose logic is unchanged keep their S3 components and score; rows whose logic
+    changed have them cleared so they get re-scored. Signatures are only computed for the texts
+    that are new or changed. Returns (created, updated, unchanged).
+    """
+    # The last row wins when the same key appears more than once in a batch
+    incoming = {getattr(detection, key): detection for detection in batch}
+
+    existing = {}
+    for detection in Detection.objects.filter(**{f'{key}__in': list(incoming)}).order_by('-id'):
+        # If the table already holds duplicates, merge into the oldest one
+        existing[getattr(detection, key)] = detection
+
+    to_create, to_update, unchanged = [], [], 0
+    for value, new in incoming.items():
+        current = existing.get(value)
+        if current is None:
+            to_create.append(new)
+            continue
+
+        changed = False
+        if current.logic_hash != new.logic_hash:
+            current.logic = new.logic
+            current.logic_hash = new.logic_hash
+            _set_signatures(current, 'logic')
+            for field, cleared in CLEARED_SCORES.items():
+                setattr(current, field, cleared)
+            changed = True
+        if current.name != new.name:
+            current.name = new.name
+            changed = True
+        if current.description != new.description or not current.description_minhash:
+            current.description = new.description
+            _set_signatures(current, 'description')
+            changed = True
+
+        if changed:
+            to_update.append(current)
+        else:
+            unchanged += 1
+
+    _create_batch(to_create)
+    Detection.objects.bulk_update(
+        to_update, ['name', 'logic', 'logic_hash', 'description', *CLEARED_SCORES, *SIGNATURE_COLUMNS]
+    )
+    return len(to_create), len(to_update), unchanged
+
+
+def ingest_csv(file, batch_size=None, mode=CREATE, key='name'):
+    """
+    Validate the uploaded CSV row by row and write detections in chunks of `batch_size`.
+
+    In CREATE mode every row becomes a new detection. In UPSERT mode rows are matched on
+    `key` ('name' or 'logic_hash') and merged into existing detections (see _upsert_batch).
+
+    Everything runs in one transaction: if any row is invalid, nothing is kept and the result
+    lists the row errors. Memory use is bounded by the batch size, not the file size.
+    Raises MissingColumnsError, UnicodeDecodeError or csv.Error for malformed files.
+    """
+    batch_size = batch_size or settings.CSV_UPLOAD_BATCH_SIZE
+    reader = read_csv_rows(file)
+    result = IngestResult()
+
+    def flush(batch):
+        if mode == UPSERT:
+            with metrics.timer('bulk_upsert'):
+                created, updated, unchanged = _upsert_batch(batch, key)
+            result.created += created
+            result.updated += updated
+            result.unchanged += unchanged
+        else:
+            with metrics.timer('bulk_create'):
+                _create_batch(batch)
+            result.created += len(batch)
+
+    with transaction.atomic():
+        batch = []
+        row_num = 1  # To track row number for error reporting
+        for row in reader:
+            row_num += 1
+            name = (row.get('name') or '').strip()
+            logic = (row.get('logic') or '').strip()
+            description = (row.get('description') or '').strip()
+
+            # Validate required fields
+            if not name or not logic or not description:
+                error_msg = f"Row {row_num}: 'name', 'logic', and 'description' are required."
+                logger.error(error_msg)
+                result.add_error(error_msg)
+                continue
+
+            # Once a row has failed the upload will be rolled back, so only keep validating
+            if result.error_count:
+                continue
+
+            # bulk_create doesn't call save(), so set the logic hash here (signatures are set
+            # when the batch is written, for the rows that need them)
+            batch.append(Detection(
+                name=name,
+                logic=logic,
+                logic_hash=compute_logic_hash(logic),
+                description=description,
+            ))
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+
+        if result.error_count:
+            transaction.set_rollback(True)
+            result.created = result.updated = result.unchanged = 0
+            return result
+
+        if batch:
+            flush(batch)
+
+    return result
@@ -0,0 +1,158 @@
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import ScoringJob, ScoringJobItem
+from .llm_client import get_client
+from .scoring import configure_backend, get_weights, score_detection
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# In-process worker pool state
+_lock = threading.Lock()
+_workers = []
+_wakeup = False
+
+
+def enqueue_scoring_job(detection_ids):
+    """
+    Create a ScoringJob with one queued item per detection and start the local workers.
+    """
+    detection_ids = list(detection_ids)
+    with transaction.atomic():
+        job = ScoringJob.objects.create(total=len(detection_ids))
+        ScoringJobItem.objects.bulk_create(
+            [ScoringJobItem(job=job, detection_id=detection_id) for detection_id in detection_ids],
+            batch_size=1000,
+        )
+        if settings.SCORING_JOB_AUTOSTART:
+            # Only start once the items are visible to the worker threads
+            transaction.on_commit(start_workers)
+    logger.info(f"Queued scoring job {job.pk} with {job.total} detections.")
+    return job
+
+
+def start_workers():
+    """
+    Make sure up to SCORING_JOB_WORKERS threads are draining the queue in this process.
+    Threads exit once the queue is empty.
+    """
+    global _wakeup
+    with _lock:
+        # Tell workers that are about to exit that there is new work
+        _wakeup = True
+        _workers[:] = [worker for worker in _workers if worker.is_alive()]
+        for _ in range(settings.SCORING_JOB_WORKERS - len(_workers)):
+            worker = threading.Thread(target=_run_pool_worker, name='scoring-worker', daemon=True)
+            _workers.append(worker)
+            worker.start()
+
+
+def _run_pool_worker():
+    global _wakeup
+    try:
+        while True:
+            run_worker(stop_when_empty=True)
+            with _lock:
+                if not _wakeup:
+                    _workers.remove(threading.current_thread())
+                    return
+                _wakeup = False
+    finally:
+        # Each thread has its own database connection
+        connection.close()
+
+
+def claim_item(stale_after=None):
+    """
+    Atomically take the next queued item and mark it as running.
+    Locked rows are skipped, so several workers (threads or processes) can share the queue.
+    Once no item is queued, items running for longer than `stale_after` (a timedelta,
+    SCORING_JOB_STALE_AFTER seconds by default) are reclaimed, since their worker probably died.
+    """
+    if stale_after is None:
+        stale_after = timedelta(seconds=settings.SCORING_JOB_STALE_AFTER)
+    with transaction.atomic():
+        items = ScoringJobItem.objects.select_for_update(skip_locked=True).order_by('id')
+        item = items.filter(status=ScoringJobItem.QUEUED).first()
+        if item is None:
+            item = items.filter(status=ScoringJobItem.RUNNING, updated_at__lt=timezone.now() - stale_after).first()
+            if item is None:
+                return None
+            logger.warning(f"Reclaiming item {item.pk} of scoring job {item.job_id}, running since {item.updated_at}.")
+        item.status = ScoringJobItem.RUNNING
+        item.save(update_fields=['status', 'updated_at'])
+        ScoringJob.objects.filter(pk=item.job_id, status=ScoringJob.QUEUED).update(
+            status=ScoringJob.RUNNING, started_at=timezone.now()
+        )
+    return item
+
+
+def process_item(item, weights=None):
+    """
+    Score the detection of a claimed item and record the outcome.
+    """
+    try:
+        detection = score_detection(item.detection, weights)
+        item.status = ScoringJobItem.DONE
+        item.shannon_score = detection.shannon_score
+    except Exception as e:
+        logger.error(f"Error scoring detection {item.detection_id} for job {item.job_id}: {e}")
+        item.status = ScoringJobItem.FAILED
+        item.error = str(e)
+    item.save(update_fields=['status', 'shannon_score', 'error', 'updated_at'])
+    _finish_job_if_done(item.job_id)
+
+
+def _finish_job_if_done(job_id):
+    pending = ScoringJobItem.objects.filter(
+        job_id=job_id, status__in=[ScoringJobItem.QUEUED, ScoringJobItem.RUNNING]
+    )
+    if not pending.exists():
+        updated = ScoringJob.objects.filter(pk=job_id, finished_at__isnull=True).update(
+            status=ScoringJob.COMPLETED, finished_at=timezone.now()
+        )
+        if updated:
+            logger.info(f"Scoring job {job_id} completed.")
+
+
+def requeue_stale_items(older_than):
+    """
+    Put items back in the queue that have been running for longer than `older_than`
+    (e.g. because the worker process died). Returns the number of requeued items.
+    """
+    cutoff = timezone.now() - older_than
+    return ScoringJobItem.objects.filter(status=ScoringJobItem.RUNNING, updated_at__lt=cutoff).update(
+        status=ScoringJobItem.QUEUED, updated_at=timezone.now()
+    )
+
+
+def run_worker(stop_when_empty=True, poll_interval=1.0):
+    """
+    Process queued items one at a time. Returns the number of processed items.
+    """
+    if not configure_backend():
+        return 0
+
+    processed = 0
+    while True:
+        # Don't burn through the queue failing items while the LLM backend is down
+        if get_client().breaker.is_open():
+            time.sleep(poll_interval)
+            continue
+        item = claim_item()
+        if item is None:
+            if stop_when_empty:
+                return processed
+            time.sleep(poll_interval)
+            continue
+        # Weights can change between items; re-read them so every item uses the current ones
+        process_item(item, get_weights())
+        processed += 1
+
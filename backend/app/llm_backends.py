@@ -0,0 +1,220 @@
+import asyncio
+import functools
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import time
+import weakref
+
+import aiohttp
+import openai
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Short names accepted by the LLM_BACKEND setting; anything else is a dotted path to a backend class
+BACKENDS = {
+    'openai': 'app.llm_backends.OpenAIBackend',
+    'fake': 'app.llm_backends.FakeBackend',
+}
+
+
+class BackendError(Exception):
+    """
+    Raised by a backend when a completion fails.
+    """
+
+
+class CompletionBackend:
+    """
+    Interface of the text completion services used for scoring and MITRE classification.
+
+    `model` identifies the backend's outputs in the LLM cache, so responses from different
+    backends are never mixed up.
+    """
+    model = None
+
+    def configure(self):
+        """
+        Prepare the backend for use. Returns False if it is missing its configuration.
+        """
+        return True
+
+    def complete(self, prompt, max_tokens, timeout=None):
+        """
+        Return the completion text for `prompt`. Raises if the call fails or takes over `timeout` seconds.
+        """
+        raise NotImplementedError
+
+    async def acomplete(self, prompt, max_tokens, timeout=None):
+        """
+        Async version of complete().
+        """
+        raise NotImplementedError
+
+
+class OpenAIBackend(CompletionBackend):
+    """
+    The OpenAI completion API, through the legacy openai<1.0 client.
+    """
+    model = 'text-davinci-003'
+
+    def __init__(self):
+        # One HTTP session (and connection pool) per event loop, shared by every async call made on it
+        self._sessions = weakref.WeakKeyDictionary()
+
+    def configure(self):
+        openai_api_key = os.environ.get('OPENAI_API_KEY')
+        if not openai_api_key:
+            logger.error('OPENAI_API_KEY environment variable is not set.')
+            return False
+        openai.api_key = openai_api_key
+        openai.api_base = os.environ.get('OPENAI_API_BASE', 'https://api.openai.com/v1')
+        return True
+
+    def complete(self, prompt, max_tokens, timeout=None):
+        response = openai.Completion.create(
+            model=self.model,
+            prompt=prompt,
+            max_tokens=max_tokens,
+            temperature=0,
+            request_timeout=timeout,
+        )
+        self._log_usage(response)
+        return response.choices[0].text
+
+    async def acomplete(self, prompt, max_tokens, timeout=None):
+        # openai reads the session from a context variable, which is local to the current request
+        openai.aiosession.set(self.get_session())
+        response = await openai.Completion.acreate(
+            model=self.model,
+            prompt=prompt,
+            max_tokens=max_tokens,
+            temperature=0,
+            request_timeout=timeout,
+        )
+        self._log_usage(response)
+        return response.choices[0].text
+
+    def get_session(self):
+        """
+        Return the aiohttp session of the running event loop, creating it on first use.
+        Its connector caps the OpenAI connections of the whole process at ASYNC_HTTP_POOL_SIZE.
+        """
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=settings.ASYNC_HTTP_POOL_SIZE)
+            )
+            self._sessions[loop] = session
+        return session
+
+    def _log_usage(self, response):
+        usage = getattr(response, 'usage', None)
+        if usage:
+            logger.info(f"Token usage - prompt: {usage.prompt_tokens}, completion: {usage.completion_tokens}")
+
+
+class FakeBackend(CompletionBackend):
+    """
+    Local stand-in for load tests and benchmarks; it makes no network calls.
+
+    Responses are deterministic: the same prompt always gets the same answer, in the format the
+    prompt asks for (a score, a JSON object of scores or a MITRE classification). Latency and
+    failures are random: each call takes `latency` seconds plus an exponentially distributed
+    `jitter` (which gives a long tail), and fails with probability `failure_rate`. Calls whose
+    latency exceeds their timeout fail with TimeoutError after the timeout.
+    """
+    model = 'fake'
+
+    TACTICS = ['Execution', 'Persistence', 'Privilege Escalation', 'Defense Evasion',
+               'Credential Access', 'Discovery', 'Lateral Movement', 'Command and Control']
+    TECHNIQUES = ['T1059: Command and Scripting Interpreter', 'T1053: Scheduled Task/Job',
+                  'T1548: Abuse Elevation Control Mechanism', 'T1562: Impair Defenses',
+                  'T1003: OS Credential Dumping', 'T1082: System Information Discovery',
+                  'T1021: Remote Services', 'T1071: Application Layer Protocol']
+
+    def __init__(self, latency=None, jitter=None, failure_rate=None, seed=None):
+        self.latency = settings.FAKE_LLM_LATENCY if latency is None else latency
+        self.jitter = settings.FAKE_LLM_LATENCY_JITTER if jitter is None else jitter
+        self.failure_rate = settings.FAKE_LLM_FAILURE_RATE if failure_rate is None else failure_rate
+        self._random = random.Random(settings.FAKE_LLM_SEED if seed is None else seed)
+
+    def complete(self, prompt, max_tokens, timeout=None):
+        delay, fails = self._draw()
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"Fake completion timed out after {timeout}s")
+        time.sleep(delay)
+        if fails:
+            raise BackendError('Fake completion failed.')
+        return self.respond(prompt)
+
+    async def acomplete(self, prompt, max_tokens, timeout=None):
+        delay, fails = self._draw()
+        if timeout is not None and delay > timeout:
+            await asyncio.sleep(timeout)
+            raise TimeoutError(f"Fake completion timed out after {timeout}s")
+        await asyncio.sleep(delay)
+        if fails:
+            raise BackendError('Fake completion failed.')
+        return self.respond(prompt)
+
+    def _draw(self):
+        jitter = self._random.expovariate(1 / self.jitter) if self.jitter > 0 else 0
+        return self.latency + jitter, self._random.random() < self.failure_rate
+
+    def respond(self, prompt):
+        """
+        Return the deterministic answer to `prompt`.
+        """
+        if 'MITRE ATT&CK' in prompt:
+            # Batch prompts list one '<id>: "<description>"' per line
+            items = re.findall(r'^(\d+): "(.*)"$', prompt, re.MULTILINE)
+            if items:
+                return json.dumps({item_id: self._classify(text) for item_id, text in items})
+            match = re.search(r'Detection Description:\s*"(.*?)"\n', prompt, re.DOTALL)
+            return json.dumps(self._classify(match.group(1) if match else prompt))
+        # The combined scoring prompt lists the expected keys as "<component>": <score>
+        keys = re.findall(r'"(\w+)": <score>', prompt)
+        if keys:
+            return json.dumps({key: self._number(f'{key}:{prompt}') % 101 for key in keys})
+        return f' {self._number(prompt) % 101}'
+
+    def _classify(self, description):
+        index = self._number(description) % len(self.TACTICS)
+        return {'tactics': [self.TACTICS[index]], 'techniques': [self.TECHNIQUES[index]]}
+
+    @staticmethod
+    def _number(text):
+        return int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest()[:8], 'big')
+
+
+@functools.lru_cache(maxsize=None)
+def load_backend(name):
+    """
+    Return the (shared) backend instance for a BACKENDS name or a dotted class path.
+    """
+    return import_string(BACKENDS.get(name, name))()
+
+
+def get_backend():
+    """
+    Return the backend selected by the LLM_BACKEND setting.
+    """
+    return load_backend(settings.LLM_BACKEND)
+
+
+@receiver(setting_changed)
+def _reset_backends(setting, **kwargs):
+    # Backends read their settings when created, so drop them when those settings are overridden
+    if setting == 'LLM_BACKEND' or setting.startswith('FAKE_LLM_'):
+        load_backend.cache_clear()
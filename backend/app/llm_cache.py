@@ -0,0 +1,119 @@
+import hashlib
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from . import metrics
+from .models import LLMCacheEntry
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Per-process hit/miss counters
+_lock = threading.Lock()
+_counters = {'hits': 0, 'misses': 0, 'writes': 0}
+
+
+def make_key(model, template_version, text):
+    """
+    Hash (model, prompt template version, truncated input text) into a cache key.
+    """
+    digest = hashlib.sha256()
+    for part in (model, template_version, text):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def _count(name):
+    with _lock:
+        _counters[name] += 1
+
+
+def get(key):
+    """
+    Return the cached value for `key`, or None on a miss or an expired entry.
+    """
+    if not settings.LLM_CACHE_ENABLED:
+        return None
+
+    entry = LLMCacheEntry.objects.filter(key=key).only('value', 'created_at').first()
+    if entry is not None and entry.created_at < timezone.now() - timedelta(seconds=settings.LLM_CACHE_TTL):
+        entry.delete()
+        entry = None
+
+    if entry is None:
+        _count('misses')
+        return None
+
+    _count('hits')
+    LLMCacheEntry.objects.filter(key=key).update(hits=F('hits') + 1, last_used_at=timezone.now())
+    return entry.value
+
+
+def set(key, kind, value):
+    """
+    Store `value` under `key`, evicting the least recently used entries when the cache is full.
+    """
+    if not settings.LLM_CACHE_ENABLED:
+        return
+
+    now = timezone.now()
+    LLMCacheEntry.objects.update_or_create(
+        key=key, defaults={'kind': kind, 'value': value, 'created_at': now, 'last_used_at': now}
+    )
+    with _lock:
+        _counters['writes'] += 1
+        evict_now = _counters['writes'] % settings.LLM_CACHE_EVICT_INTERVAL == 0
+    if evict_now:
+        evict()
+
+
+def evict():
+    """
+    Delete expired entries, then the least recently used ones above LLM_CACHE_MAX_ENTRIES.
+    Returns the number of deleted entries.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.LLM_CACHE_TTL)
+    deleted, _ = LLMCacheEntry.objects.filter(created_at__lt=cutoff).delete()
+
+    overflow = LLMCacheEntry.objects.count() - settings.LLM_CACHE_MAX_ENTRIES
+    if overflow > 0:
+        oldest = LLMCacheEntry.objects.order_by('last_used_at').values_list('key', flat=True)[:overflow]
+        removed, _ = LLMCacheEntry.objects.filter(key__in=list(oldest)).delete()
+        deleted += removed
+
+    if deleted:
+        logger.info(f"Evicted {deleted} LLM cache entries.")
+    return deleted
+
+
+@metrics.collector
+def _cache_metrics():
+    with _lock:
+        counters = dict(_counters)
+    return [
+        ('llm_cache_lookups_total', 'counter', 'LLM cache lookups by result (hit or miss).',
+         [({'result': 'hit'}, counters['hits']), ({'result': 'miss'}, counters['misses'])]),
+        ('llm_cache_writes_total', 'counter', 'LLM cache writes.', [({}, counters['writes'])]),
+    ]
+
+
+def stats():
+    """
+    Return the hit/miss counters of this process plus the size of the persistent cache.
+    """
+    with _lock:
+        hits, misses = _counters['hits'], _counters['misses']
+    lookups = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / lookups if lookups else None,
+        'entries': LLMCacheEntry.objects.count(),
+        'total_entry_hits': LLMCacheEntry.objects.aggregate(total=Sum('hits'))['total'] or 0,
+    }
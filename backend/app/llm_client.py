@@ -0,0 +1,257 @@
+import asyncio
+import functools
+import logging
+import random
+import threading
+import time
+
+import openai
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from . import metrics
+from .llm_backends import get_backend
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Errors that will not go away by retrying the same request
+NON_RETRYABLE_ERRORS = (
+    openai.error.InvalidRequestError,
+    openai.error.AuthenticationError,
+    openai.error.PermissionError,
+)
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling the backend while the circuit breaker is open.
+    """
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket allowing `rate` calls per second with bursts of up to `burst` calls.
+
+    Callers reserve a token and then wait until it is due, so waiting callers are served in
+    order and the long-run rate never exceeds `rate`, however many threads or coroutines share it.
+    """
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """
+        Take a token and return how many seconds to wait before using it.
+        """
+        if self.rate <= 0:
+            return 0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Tokens can go negative: that is the queue of callers waiting for their turn
+            self._tokens -= 1
+            return max(0, -self._tokens / self.rate)
+
+    def acquire(self):
+        delay = self.reserve()
+        if delay:
+            time.sleep(delay)
+
+    async def aacquire(self):
+        delay = self.reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
+
+class CircuitBreaker:
+    """
+    Stops calls to an unhealthy backend.
+
+    After `failure_threshold` consecutive failures the circuit opens and calls fail fast with
+    CircuitOpenError. After `reset_timeout` seconds one trial call is let through (half-open):
+    if it succeeds the circuit closes, otherwise it opens again.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0
+        self._lock = threading.Lock()
+
+    def is_open(self):
+        """
+        True while calls fail fast, i.e. the circuit is open and not yet due for a trial call.
+        """
+        with self._lock:
+            return self.state != self.CLOSED and time.monotonic() - self._opened_at < self.reset_timeout
+
+    def before_call(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            # _opened_at is also reset when a trial starts, so a trial that never reports back
+            # (e.g. a cancelled coroutine) is replaced by a new one after reset_timeout
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                # Let this call through as the trial; everyone else keeps failing fast until it ends
+                self.state = self.HALF_OPEN
+                self._opened_at = time.monotonic()
+                return
+            raise CircuitOpenError('LLM backend is unavailable (circuit breaker open).')
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info('LLM backend recovered; closing the circuit breaker.')
+            self.state = self.CLOSED
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.error(f"LLM backend failed {self._failures} times in a row; opening the circuit breaker.")
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+class LLMClient:
+    """
+    Calls the LLM backend through a shared rate limiter, retries failed calls with jittered
+    exponential backoff and stops calling it while the circuit breaker is open.
+    """
+    def __init__(self, backend, rate_limiter, breaker, max_retries, base_delay, max_delay):
+        self.backend = backend
+        self.rate_limiter = rate_limiter
+        self.breaker = breaker
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempt):
+        # "Full jitter": spreads retries out so throttled callers don't all come back at once
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def max_duration(self, timeout):
+        """
+        Upper bound of the time complete() can take for a per-call `timeout`, rate limiting aside.
+        """
+        return timeout * (self.max_retries + 1) + self.max_delay * self.max_retries
+
+    @staticmethod
+    def record(model, outcome, started):
+        metrics.LLM_CALLS.inc(model=model, outcome=outcome)
+        metrics.LLM_CALL_SECONDS.observe(time.perf_counter() - started, model=model)
+
+    def complete(self, prompt, max_tokens, timeout=None):
+        """
+        Return the backend's completion for `prompt`.
+        Raises CircuitOpenError if the backend is unhealthy, or the last error once retries run out.
+        """
+        model = self.backend.model
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.breaker.before_call()
+            except CircuitOpenError:
+                metrics.LLM_CALLS.inc(model=model, outcome='circuit_open')
+                raise
+            self.rate_limiter.acquire()
+            started = time.perf_counter()
+            try:
+                content = self.backend.complete(prompt, max_tokens, timeout)
+            except NON_RETRYABLE_ERRORS:
+                # The backend answered; retrying or opening the circuit would not help
+                self.breaker.record_success()
+                self.record(model, 'rejected', started)
+                raise
+            except Exception as e:
+                self.breaker.record_failure()
+                self.record(model, 'error', started)
+                if attempt == self.max_retries:
+                    raise
+                delay = self.backoff(attempt)
+                logger.warning(f"LLM call failed ({e}); retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+                metrics.LLM_RETRIES.inc(model=model)
+                time.sleep(delay)
+                continue
+            self.breaker.record_success()
+            self.record(model, 'success', started)
+            return content
+
+    async def acomplete(self, prompt, max_tokens, timeout=None):
+        """
+        Async version of complete().
+        """
+        model = self.backend.model
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.breaker.before_call()
+            except CircuitOpenError:
+                metrics.LLM_CALLS.inc(model=model, outcome='circuit_open')
+                raise
+            await self.rate_limiter.aacquire()
+            started = time.perf_counter()
+            try:
+                content = await self.backend.acomplete(prompt, max_tokens, timeout)
+            except NON_RETRYABLE_ERRORS:
+                # The backend answered; retrying or opening the circuit would not help
+                self.breaker.record_success()
+                self.record(model, 'rejected', started)
+                raise
+            except Exception as e:
+                self.breaker.record_failure()
+                self.record(model, 'error', started)
+                if attempt == self.max_retries:
+                    raise
+                delay = self.backoff(attempt)
+                logger.warning(f"LLM call failed ({e}); retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+                metrics.LLM_RETRIES.inc(model=model)
+                await asyncio.sleep(delay)
+                continue
+            self.breaker.record_success()
+            self.record(model, 'success', started)
+            return content
+
+
+@functools.lru_cache(maxsize=None)
+def load_client(backend):
+    return LLMClient(
+        backend,
+        TokenBucket(settings.LLM_RATE_LIMIT_PER_MINUTE / 60, settings.LLM_RATE_LIMIT_BURST),
+        CircuitBreaker(settings.LLM_CIRCUIT_FAILURE_THRESHOLD, settings.LLM_CIRCUIT_RESET_TIMEOUT),
+        settings.LLM_MAX_RETRIES,
+        settings.LLM_RETRY_BASE_DELAY,
+        settings.LLM_RETRY_MAX_DELAY,
+    )
+
+
+def get_client():
+    """
+    Return the process-wide client of the configured LLM backend. Every thread, job worker and
+    async request shares its rate limiter and circuit breaker.
+    """
+    return load_client(get_backend())
+
+
+@metrics.collector
+def _breaker_metrics():
+    breaker = get_client().breaker
+    return [('llm_circuit_open', 'gauge', 'Whether LLM calls currently fail fast (1) or not (0).',
+             [({}, int(breaker.is_open()))])]
+
+
+@receiver(setting_changed)
+def _reset_clients(setting, **kwargs):
+    if setting.startswith('LLM_') or setting.startswith('FAKE_LLM_'):
+        load_client.cache_clear()
@@ -0,0 +1,120 @@
+import json
+import os
+import platform
+import subprocess
+from datetime import datetime, timezone
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from app.benchmark import SCENARIOS, Benchmark, BenchmarkError
+
+
+def parse_list(value):
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              cwd=settings.BASE_DIR, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = ('Benchmark the detection API (list, retrieve, CSV upload, weight update and scoring) on '
+            'synthetic libraries of several sizes and write the results as JSON. Runs in a separate '
+            'test database, with OpenAI replaced by the fake LLM backend.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,100000',
+                            help='Comma-separated library sizes (number of detections).')
+        parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                            help=f"Comma-separated scenarios among: {', '.join(SCENARIOS)}.")
+        parser.add_argument('--iterations', type=int, default=50,
+                            help='Measured requests per scenario and size (CSV uploads run a fifth of them).')
+        parser.add_argument('--warmup', type=int, default=3,
+                            help='Unmeasured requests before each scenario.')
+        parser.add_argument('--upload-rows', type=int, default=1000,
+                            help='Rows per uploaded CSV file.')
+        parser.add_argument('--llm-latency', type=float, default=0.2,
+                            help='Seconds the fake LLM takes per call.')
+        parser.add_argument('--llm-jitter', type=float, default=0.0,
+                            help='Mean extra (exponentially distributed) seconds per fake LLM call.')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Random seed of the synthetic data and of the fake LLM.')
+        parser.add_argument('--output', default=None,
+                            help='Result file (default: benchmark-results/<UTC timestamp>.json).')
+        parser.add_argument('--keepdb', action='store_true',
+                            help='Keep the test database between runs instead of recreating it.')
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in parse_list(options['sizes'])]
+        except ValueError:
+            raise CommandError('--sizes must be comma-separated integers.')
+        scenarios = parse_list(options['scenarios'])
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+        started_at = datetime.now(timezone.utc)
+        output = options['output'] or os.path.join(
+            'benchmark-results', f"{started_at.strftime('%Y%m%dT%H%M%SZ')}.json")
+
+        overrides = {
+            'ALLOWED_HOSTS': ['testserver'],
+            'LLM_BACKEND': 'fake',
+            'FAKE_LLM_LATENCY': options['llm_latency'],
+            'FAKE_LLM_LATENCY_JITTER': options['llm_jitter'],
+            'FAKE_LLM_FAILURE_RATE': 0,
+            'FAKE_LLM_SEED': options['seed'],
+            # Measure the application, not the client-side limits or the cache
+            'LLM_RATE_LIMIT_PER_MINUTE': 0,
+            'LLM_CACHE_ENABLED': False,
+            'SCORING_JOB_AUTOSTART': False,
+        }
+
+        # Never touch the real data: seed and measure in the test database
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            with override_settings(**overrides):
+                benchmark = Benchmark(options['iterations'], options['warmup'], options['upload_rows'],
+                                      options['seed'], log=self.stdout.write)
+                results = benchmark.run(sizes, scenarios)
+            with connection.cursor() as cursor:
+                cursor.execute('SHOW server_version')
+                server_version = cursor.fetchone()[0]
+        except BenchmarkError as e:
+            raise CommandError(str(e))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+
+        report = {
+            'started_at': started_at.isoformat(),
+            'git_commit': git_commit(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': f'{connection.vendor} {server_version}',
+            'options': {
+                'sizes': sorted(sizes),
+                'iterations': options['iterations'],
+                'warmup': options['warmup'],
+                'upload_rows': options['upload_rows'],
+                'llm_latency': options['llm_latency'],
+                'llm_jitter': options['llm_jitter'],
+                'seed': options['seed'],
+                'scoring_mode': settings.SCORING_MODE,
+                'page_size': settings.DETECTION_PAGE_SIZE,
+            },
+            'results': results,
+        }
+        if os.path.dirname(output):
+            os.makedirs(os.path.dirname(output), exist_ok=True)
+        with open(output, 'w') as result_file:
+            json.dump(report, result_file, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {len(results)} results to {output}'))
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from app.attack import get_catalog
+from app.models import Detection
+
+
+class Command(BaseCommand):
+    help = ('Rewrite stored MITRE classifications as canonical ATT&CK catalog values '
+            '(tactic names and technique IDs), dropping values that are not in the catalog.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report what would change without saving.')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of detections read and updated at a time.')
+
+    def handle(self, *args, **options):
+        catalog = get_catalog()
+        batch_size = options['batch_size']
+        classified = (Detection.objects.filter(~Q(mitre_tactics=[]) | ~Q(mitre_techniques=[]))
+                      .only('id', 'mitre_tactics', 'mitre_techniques').order_by('id'))
+
+        changed, rejected = [], {}
+        updated = 0
+        for detection in classified.iterator(chunk_size=batch_size):
+            tactics, techniques, unknown = catalog.normalize(detection.mitre_tactics, detection.mitre_techniques)
+            for value in unknown:
+                rejected[value] = rejected.get(value, 0) + 1
+            if (tactics, techniques) == (detection.mitre_tactics, detection.mitre_techniques):
+                continue
+            detection.mitre_tactics, detection.mitre_techniques = tactics, techniques
+            changed.append(detection)
+            if len(changed) >= batch_size:
+                updated += self._save(changed, options['dry_run'])
+                changed = []
+        updated += self._save(changed, options['dry_run'])
+
+        for value, count in sorted(rejected.items(), key=lambda item: -item[1]):
+            self.stdout.write(f'Dropped {value!r} from {count} detections.')
+        verb = 'Would update' if options['dry_run'] else 'Updated'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {updated} detections ({catalog.name} {catalog.version}).'))
+
+    @staticmethod
+    def _save(detections, dry_run):
+        if detections and not dry_run:
+            Detection.objects.bulk_update(detections, ['mitre_tactics', 'mitre_techniques'])
+        return len(detections)
@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app.jobs import requeue_stale_items, run_worker
+
+
+class Command(BaseCommand):
+    help = 'Run a scoring worker that processes queued ScoringJob items.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once the queue is empty instead of polling for new items.')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to wait between polls when the queue is empty.')
+
+    def handle(self, *args, **options):
+        requeued = requeue_stale_items(timedelta(seconds=settings.SCORING_JOB_STALE_AFTER))
+        if requeued:
+            self.stdout.write(f'Requeued {requeued} stale items.')
+
+        processed = run_worker(stop_when_empty=options['once'], poll_interval=options['poll_interval'])
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} items.'))
@@ -0,0 +1,283 @@
+# metrics.py
+#
+# In-process metrics in the Prometheus text format, served at /metrics. Recording a value takes a
+# lock and a few additions, so instrumentation can stay on under load. Every process has its own
+# registry: with several worker processes, scrape each of them (or let Prometheus sum the series).
+import asyncio
+import bisect
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse
+
+# Default histogram buckets (seconds)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_registry = []
+_collectors = []
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """
+    Base of the metric types: a named family of series, one per combination of label values.
+    """
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type}']
+        with self._lock:
+            series = sorted(self._series.items())
+            lines.extend(self._render_series(key, value) for key, value in series)
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def _render_series(self, key, value):
+        return f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        # Index of the first bucket the value fits in; counts are made cumulative when rendered
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def _render_series(self, key, value):
+        counts, total, count = value
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip((*self.buckets, float('inf')), counts):
+            cumulative += bucket_count
+            labels = _format_labels(self.labelnames, key, [('le', _format_value(bound))])
+            lines.append(f'{self.name}_bucket{labels} {cumulative}')
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+        lines.append(f'{self.name}_count{labels} {count}')
+        return '\n'.join(lines)
+
+
+def collector(function):
+    """
+    Register a function returning (name, type, documentation, [(labels dict, value), ...]) tuples
+    for values that are read when /metrics is scraped rather than recorded as they change.
+    """
+    _collectors.append(function)
+    return function
+
+
+def render():
+    """
+    Return every metric in the Prometheus text exposition format.
+    """
+    parts = [metric.render() for metric in _registry]
+    for function in _collectors:
+        for name, metric_type, documentation, samples in function():
+            lines = [f'# HELP {name} {documentation}', f'# TYPE {name} {metric_type}']
+            for labels, value in samples:
+                lines.append(f'{name}{_format_labels(labels, labels.values())} {_format_value(value)}')
+            parts.append('\n'.join(lines))
+    return '\n'.join(parts) + '\n'
+
+
+# ---------------------------
+# Application metrics
+# ---------------------------
+HTTP_REQUESTS = Counter('http_requests_total', 'HTTP requests by view, method and status.',
+                        ['view', 'method', 'status'])
+HTTP_REQUEST_SECONDS = Histogram('http_request_duration_seconds', 'HTTP request latency by view.',
+                                 ['view', 'method'])
+HTTP_REQUEST_DB_QUERIES = Histogram('http_request_db_queries', 'Database queries per HTTP request by view.',
+                                    ['view', 'method'], buckets=(0, 1, 2, 5, 10, 20, 50, 100, 250, 1000))
+HTTP_REQUEST_DB_SECONDS = Counter('http_request_db_seconds_total', 'Time spent in database queries by view.',
+                                  ['view', 'method'])
+DB_QUERY_SECONDS = Histogram('db_query_duration_seconds', 'Database query latency.',
+                             buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1, 5))
+LLM_CALLS = Counter('llm_calls_total', 'LLM calls by model and outcome (success, error, rejected '
+                    'by the backend as invalid, or circuit_open when not sent).', ['model', 'outcome'])
+LLM_CALL_SECONDS = Histogram('llm_call_duration_seconds', 'LLM call latency, per attempt.', ['model'])
+LLM_RETRIES = Counter('llm_retries_total', 'Retried LLM calls.', ['model'])
+OPERATION_SECONDS = Histogram('app_operation_duration_seconds',
+                              'Latency of instrumented operations (LLM requests including retries, '
+                              'bulk writes, response rendering).', ['operation'])
+OPERATION_ERRORS = Counter('app_operation_errors_total', 'Instrumented operations that raised.', ['operation'])
+
+
+@contextmanager
+def timer(operation):
+    """
+    Record the duration of the block under `operation`, and count it as an error if it raises.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        OPERATION_ERRORS.inc(operation=operation)
+        raise
+    finally:
+        OPERATION_SECONDS.observe(time.perf_counter() - started, operation=operation)
+
+
+def timed(operation):
+    """
+    Decorator version of timer(), for functions and coroutine functions.
+    """
+    def decorator(function):
+        if asyncio.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                with timer(operation):
+                    return await function(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with timer(operation):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ---------------------------
+# Database instrumentation
+# ---------------------------
+# [query count, seconds] of the current request; a context variable so it follows the request
+# into sync_to_async threads
+_request_db = contextvars.ContextVar('request_db', default=None)
+
+
+def _db_wrapper(execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        DB_QUERY_SECONDS.observe(elapsed)
+        totals = _request_db.get()
+        if totals is not None:
+            totals[0] += 1
+            totals[1] += elapsed
+
+
+@receiver(connection_created)
+def _instrument_connection(connection, **kwargs):
+    # The wrapper list outlives reconnections of the same connection object
+    if _db_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_db_wrapper)
+
+
+# ---------------------------
+# Middleware and endpoint
+# ---------------------------
+class MetricsMiddleware:
+    """
+    Record the latency, status and database queries of every request, per view name (e.g.
+    "detection-detail", so IDs in the URL don't create new series).
+    Works for sync and async views without switching the request to the other mode.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # Mark the instance as a coroutine function for Django's middleware adaptation
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        totals = [0, 0.0]
+        token = _request_db.set(totals)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_db.reset(token)
+        self.record(request, response, time.perf_counter() - started, totals)
+        return response
+
+    async def __acall__(self, request):
+        totals = [0, 0.0]
+        token = _request_db.set(totals)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_db.reset(token)
+        self.record(request, response, time.perf_counter() - started, totals)
+        return response
+
+    @staticmethod
+    def record(request, response, elapsed, totals):
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name or match.route) if match is not None else 'unmatched'
+        method = request.method
+        HTTP_REQUESTS.inc(view=view, method=method, status=response.status_code)
+        HTTP_REQUEST_SECONDS.observe(elapsed, view=view, method=method)
+        HTTP_REQUEST_DB_QUERIES.observe(totals[0], view=view, method=method)
+        HTTP_REQUEST_DB_SECONDS.inc(totals[1], view=view, method=method)
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint.
+    """
+    return HttpResponse(render(), content_type=CONTENT_TYPE)
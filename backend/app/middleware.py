@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from django.utils.regex_helper import _lazy_re_compile
+
+try:
+    import brotli
+except ImportError:  # Optional: without it responses are gzipped
+    brotli = None
+
+_accepts_br = _lazy_re_compile(r'\bbr\b')
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Compress responses of at least COMPRESSION_MIN_SIZE bytes: with brotli when the package is
+    installed and the client accepts it, otherwise with gzip (like Django's GZipMiddleware, which
+    also handles streaming responses such as exports).
+    """
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding'):
+            return response
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+        if brotli is None or response.streaming or not _accepts_br.search(request.META.get('HTTP_ACCEPT_ENCODING', '')):
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        compressed = brotli.compress(response.content, quality=settings.COMPRESSION_BROTLI_QUALITY)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        # Like GZipMiddleware: the representation changed, so a strong ETag becomes weak
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = f'W/{etag}'
+        response['Content-Encoding'] = 'br'
+        return response
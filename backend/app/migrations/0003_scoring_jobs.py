@@ -0,0 +1,45 @@
+# Generated by Django 3.2.25 on 2026-10-18 12:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0002_auto_20241103_0928'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScoringJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('completed', 'Completed')], db_index=True, default='queued', max_length=16)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ScoringJobItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=16)),
+                ('shannon_score', models.FloatField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('detection', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scoring_job_items', to='app.detection')),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='app.scoringjob')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='scoringjobitem',
+            index=models.Index(fields=['status', 'id'], name='app_scoring_status_7c3de7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scoringjobitem',
+            index=models.Index(fields=['job', 'status'], name='app_scoring_job_id_693443_idx'),
+        ),
+    ]
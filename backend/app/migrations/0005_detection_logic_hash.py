@@ -0,0 +1,34 @@
+# Generated by Django 3.2.25 on 2026-10-18 12:38
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def populate_logic_hash(apps, schema_editor):
+    Detection = apps.get_model('app', 'Detection')
+    batch = []
+    for detection in Detection.objects.only('id', 'logic').iterator(chunk_size=2000):
+        detection.logic_hash = hashlib.sha256(detection.logic.strip().encode('utf-8')).hexdigest()
+        batch.append(detection)
+        if len(batch) >= 2000:
+            Detection.objects.bulk_update(batch, ['logic_hash'])
+            batch = []
+    if batch:
+        Detection.objects.bulk_update(batch, ['logic_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_llm_cache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='detection',
+            name='logic_hash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=64),
+        ),
+        migrations.RunPython(populate_logic_hash, migrations.RunPython.noop),
+    ]
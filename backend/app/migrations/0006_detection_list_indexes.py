@@ -0,0 +1,43 @@
+# Generated by Django 3.2.25 on 2026-10-18 12:39
+
+from django.db import migrations, models
+import django.db.models.expressions
+import django.db.models.functions.comparison
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_detection_logic_hash'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='detection',
+            index=models.Index(fields=['name'], name='app_detecti_name_9312f0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='detection',
+            index=models.Index(django.db.models.functions.comparison.Coalesce('shannon_score', django.db.models.expressions.Value(-1.0)), name='det_shannon_score_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='detection',
+            index=models.Index(django.db.models.functions.comparison.Coalesce('tac', django.db.models.expressions.Value(-1.0)), name='det_tac_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='detection',
+            index=models.Index(django.db.models.functions.comparison.Coalesce('di', django.db.models.expressions.Value(-1.0)), name='det_di_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='detection',
+            index=models.Index(django.db.models.functions.comparison.Coalesce('oc', django.db.models.expressions.Value(-1.0)), name='det_oc_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='detection',
+            index=models.Index(django.db.models.functions.comparison.Coalesce('irp', django.db.models.expressions.Value(-1.0)), name='det_irp_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='detection',
+            index=models.Index(django.db.models.functions.comparison.Coalesce('u', django.db.models.expressions.Value(-1.0)), name='det_u_rank_idx'),
+        ),
+    ]
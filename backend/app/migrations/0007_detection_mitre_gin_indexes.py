@@ -0,0 +1,22 @@
+# Generated by Django 3.2.25 on 2026-10-18 12:44
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_detection_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='detection',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['mitre_tactics'], name='det_mitre_tactics_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='detection',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['mitre_techniques'], name='det_mitre_techniques_gin'),
+        ),
+    ]
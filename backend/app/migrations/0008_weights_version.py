@@ -0,0 +1,23 @@
+# Generated by Django 3.2.25 on 2026-10-18 12:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_detection_mitre_gin_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='detection',
+            name='weights_version',
+            field=models.PositiveIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='shannonscoreweights',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
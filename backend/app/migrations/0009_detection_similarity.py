@@ -0,0 +1,63 @@
+# Generated by Django 3.2.25 on 2026-10-18 12:52
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+from app import minhash
+
+
+def populate_signatures(apps, schema_editor):
+    Detection = apps.get_model('app', 'Detection')
+    fields = ['logic_minhash', 'logic_bands', 'description_minhash', 'description_bands']
+    batch = []
+    for detection in Detection.objects.only('id', 'logic', 'description').iterator(chunk_size=2000):
+        for name in ('logic', 'description'):
+            signature = minhash.signature(getattr(detection, name))
+            setattr(detection, f'{name}_minhash', signature)
+            setattr(detection, f'{name}_bands', minhash.bands(signature))
+        batch.append(detection)
+        if len(batch) >= 2000:
+            Detection.objects.bulk_update(batch, fields)
+            batch = []
+    if batch:
+        Detection.objects.bulk_update(batch, fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0008_weights_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='detection',
+            name='description_bands',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), blank=True, default=list, editable=False, size=None),
+        ),
+        migrations.AddField(
+            model_name='detection',
+            name='description_minhash',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), blank=True, default=list, editable=False, size=None),
+        ),
+        migrations.AddField(
+            model_name='detection',
+            name='logic_bands',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), blank=True, default=list, editable=False, size=None),
+        ),
+        migrations.AddField(
+            model_name='detection',
+            name='logic_minhash',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), blank=True, default=list, editable=False, size=None),
+        ),
+        migrations.RunPython(populate_signatures, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='detection',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['logic_bands'], name='det_logic_bands_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='detection',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['description_bands'], name='det_description_bands_gin'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 3.2.25 on 2026-10-18 12:53
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+# Keeps search_vector current for every write path, including bulk_create and bulk_update.
+# Django writes NULL to the column on a full save(), so unchanged texts keep the old vector.
+CREATE_TRIGGER = """
+CREATE OR REPLACE FUNCTION app_detection_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND OLD.search_vector IS NOT NULL
+       AND NEW.name IS NOT DISTINCT FROM OLD.name
+       AND NEW.description IS NOT DISTINCT FROM OLD.description
+       AND NEW.logic IS NOT DISTINCT FROM OLD.logic THEN
+        NEW.search_vector := OLD.search_vector;
+    ELSE
+        NEW.search_vector :=
+            setweight(to_tsvector('english', coalesce(NEW.name, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(NEW.description, '')), 'B') ||
+            setweight(to_tsvector('english', coalesce(NEW.logic, '')), 'C');
+    END IF;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER app_detection_search_vector_trigger
+    BEFORE INSERT OR UPDATE ON app_detection
+    FOR EACH ROW EXECUTE PROCEDURE app_detection_search_vector_update();
+
+-- Fill in existing rows (their vector is NULL, so the trigger computes it)
+UPDATE app_detection SET name = name;
+"""
+
+DROP_TRIGGER = """
+DROP TRIGGER IF EXISTS app_detection_search_vector_trigger ON app_detection;
+DROP FUNCTION IF EXISTS app_detection_search_vector_update();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_detection_similarity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='detection',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunSQL(CREATE_TRIGGER, DROP_TRIGGER),
+        migrations.AddIndex(
+            model_name='detection',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='det_search_vector_gin'),
+        ),
+    ]
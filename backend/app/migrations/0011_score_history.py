@@ -0,0 +1,40 @@
+# Generated by Django 3.2.25 on 2026-10-18 12:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0010_detection_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScoreHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('model', models.CharField(max_length=100)),
+                ('prompt_hash', models.CharField(max_length=16)),
+                ('logic_hash', models.CharField(max_length=64)),
+                ('weights_version', models.PositiveIntegerField(blank=True, null=True)),
+                ('shannon_score', models.FloatField(blank=True, null=True)),
+                ('tac', models.FloatField(blank=True, null=True)),
+                ('di', models.FloatField(blank=True, null=True)),
+                ('oc', models.FloatField(blank=True, null=True)),
+                ('irp', models.FloatField(blank=True, null=True)),
+                ('u', models.FloatField(blank=True, null=True)),
+                ('latency_ms', models.PositiveIntegerField(blank=True, null=True)),
+                ('detection', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='score_history', to='app.detection')),
+            ],
+            options={
+                'verbose_name_plural': 'Score history',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='scorehistory',
+            index=models.Index(fields=['detection', '-id'], name='scorehistory_latest_idx'),
+        ),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 3.2.25 on 2026-10-18 13:11
+
+from django.db import migrations, models
+
+
+# updated_at: set on every UPDATE that changes the row (save() sets it too, bulk_update and
+# queryset updates don't). search_vector's trigger fires first (triggers run in name order).
+CREATE_UPDATED_AT_TRIGGER = """
+CREATE OR REPLACE FUNCTION app_detection_updated_at_update() RETURNS trigger AS $$
+BEGIN
+    NEW.updated_at := OLD.updated_at;
+    IF NEW IS DISTINCT FROM OLD THEN
+        NEW.updated_at := now();
+    END IF;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER app_detection_updated_at_trigger
+    BEFORE UPDATE ON app_detection
+    FOR EACH ROW EXECUTE PROCEDURE app_detection_updated_at_update();
+"""
+
+DROP_UPDATED_AT_TRIGGER = """
+DROP TRIGGER IF EXISTS app_detection_updated_at_trigger ON app_detection;
+DROP FUNCTION IF EXISTS app_detection_updated_at_update();
+"""
+
+# Table version: bumped once per transaction, at commit (deferred constraint trigger), so writers
+# only hold the counter row's lock while committing and versions follow the commit order.
+# A transaction-local setting skips the rows after the first.
+CREATE_VERSION_TRIGGER = """
+CREATE OR REPLACE FUNCTION app_bump_table_version() RETURNS trigger AS $$
+BEGIN
+    IF coalesce(current_setting('app.bumped_' || TG_TABLE_NAME, true), '') <> 'on' THEN
+        PERFORM set_config('app.bumped_' || TG_TABLE_NAME, 'on', true);
+        INSERT INTO app_tableversion ("table", version, changed_at)
+        VALUES (TG_TABLE_NAME, 1, clock_timestamp())
+        ON CONFLICT ("table") DO UPDATE
+            SET version = app_tableversion.version + 1, changed_at = clock_timestamp();
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE CONSTRAINT TRIGGER app_detection_version_trigger
+    AFTER INSERT OR UPDATE OR DELETE ON app_detection
+    DEFERRABLE INITIALLY DEFERRED
+    FOR EACH ROW EXECUTE PROCEDURE app_bump_table_version();
+
+CREATE TRIGGER app_detection_truncate_version_trigger
+    AFTER TRUNCATE ON app_detection
+    FOR EACH STATEMENT EXECUTE PROCEDURE app_bump_table_version();
+
+INSERT INTO app_tableversion ("table", version, changed_at) VALUES ('app_detection', 1, now());
+"""
+
+DROP_VERSION_TRIGGER = """
+DROP TRIGGER IF EXISTS app_detection_truncate_version_trigger ON app_detection;
+DROP TRIGGER IF EXISTS app_detection_version_trigger ON app_detection;
+DROP FUNCTION IF EXISTS app_bump_table_version();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0011_score_history'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TableVersion',
+            fields=[
+                ('table', models.CharField(max_length=63, primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField(default=0)),
+                ('changed_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='detection',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='shannonscoreweights',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunSQL(CREATE_UPDATED_AT_TRIGGER, DROP_UPDATED_AT_TRIGGER),
+        migrations.RunSQL(CREATE_VERSION_TRIGGER, DROP_VERSION_TRIGGER),
+    ]
@@ -0,0 +1,106 @@
+# Generated by Django 3.2.25 on 2026-10-18 13:13
+
+from django.db import migrations, models
+
+
+# Replaces the detection triggers of 0012: besides bumping the table version once per transaction
+# (at commit, holding the version row's lock until the commit is visible), record the new version
+# as the change_seq of every detection the transaction inserted, updated or deleted. Updates that
+# change nothing are skipped. Truncating the table turns every detection into a tombstone.
+CREATE_CHANGE_TRIGGERS = """
+CREATE OR REPLACE FUNCTION app_detection_log_change() RETURNS trigger AS $$
+DECLARE
+    seq bigint;
+BEGIN
+    IF TG_OP = 'UPDATE' AND NEW IS NOT DISTINCT FROM OLD THEN
+        RETURN NULL;
+    END IF;
+    seq := nullif(current_setting('app.version_app_detection', true), '')::bigint;
+    IF seq IS NULL THEN
+        INSERT INTO app_tableversion ("table", version, changed_at)
+        VALUES (TG_TABLE_NAME, 1, clock_timestamp())
+        ON CONFLICT ("table") DO UPDATE
+            SET version = app_tableversion.version + 1, changed_at = clock_timestamp()
+        RETURNING version INTO seq;
+        PERFORM set_config('app.version_app_detection', seq::text, true);
+    END IF;
+    INSERT INTO app_detectionchange (detection_id, change_seq, deleted, changed_at)
+    VALUES (CASE WHEN TG_OP = 'DELETE' THEN OLD.id ELSE NEW.id END, seq, TG_OP = 'DELETE', clock_timestamp())
+    ON CONFLICT (detection_id) DO UPDATE
+        SET change_seq = EXCLUDED.change_seq, deleted = EXCLUDED.deleted, changed_at = EXCLUDED.changed_at;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION app_detection_truncate_changes() RETURNS trigger AS $$
+DECLARE
+    seq bigint;
+BEGIN
+    INSERT INTO app_tableversion ("table", version, changed_at)
+    VALUES (TG_TABLE_NAME, 1, clock_timestamp())
+    ON CONFLICT ("table") DO UPDATE
+        SET version = app_tableversion.version + 1, changed_at = clock_timestamp()
+    RETURNING version INTO seq;
+    UPDATE app_detectionchange SET change_seq = seq, deleted = true, changed_at = clock_timestamp()
+    WHERE NOT deleted;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS app_detection_version_trigger ON app_detection;
+DROP TRIGGER IF EXISTS app_detection_truncate_version_trigger ON app_detection;
+
+CREATE CONSTRAINT TRIGGER app_detection_change_trigger
+    AFTER INSERT OR UPDATE OR DELETE ON app_detection
+    DEFERRABLE INITIALLY DEFERRED
+    FOR EACH ROW EXECUTE PROCEDURE app_detection_log_change();
+
+CREATE TRIGGER app_detection_truncate_change_trigger
+    AFTER TRUNCATE ON app_detection
+    FOR EACH STATEMENT EXECUTE PROCEDURE app_detection_truncate_changes();
+
+-- Existing detections enter the feed at the current version
+INSERT INTO app_detectionchange (detection_id, change_seq, deleted, changed_at)
+SELECT id, coalesce((SELECT version FROM app_tableversion WHERE "table" = 'app_detection'), 0), false, now()
+FROM app_detection;
+"""
+
+DROP_CHANGE_TRIGGERS = """
+DROP TRIGGER IF EXISTS app_detection_truncate_change_trigger ON app_detection;
+DROP TRIGGER IF EXISTS app_detection_change_trigger ON app_detection;
+DROP FUNCTION IF EXISTS app_detection_truncate_changes();
+DROP FUNCTION IF EXISTS app_detection_log_change();
+
+CREATE CONSTRAINT TRIGGER app_detection_version_trigger
+    AFTER INSERT OR UPDATE OR DELETE ON app_detection
+    DEFERRABLE INITIALLY DEFERRED
+    FOR EACH ROW EXECUTE PROCEDURE app_bump_table_version();
+
+CREATE TRIGGER app_detection_truncate_version_trigger
+    AFTER TRUNCATE ON app_detection
+    FOR EACH STATEMENT EXECUTE PROCEDURE app_bump_table_version();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0012_conditional_get'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DetectionChange',
+            fields=[
+                ('detection_id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('change_seq', models.BigIntegerField()),
+                ('deleted', models.BooleanField(default=False)),
+                ('changed_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='detectionchange',
+            index=models.Index(fields=['change_seq', 'detection_id'], name='det_change_seq_idx'),
+        ),
+        migrations.RunSQL(CREATE_CHANGE_TRIGGERS, DROP_CHANGE_TRIGGERS),
+    ]
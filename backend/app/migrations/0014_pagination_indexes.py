@@ -0,0 +1,71 @@
+# Generated by Django 3.2.25 on 2026-10-18 13:22
+
+from django.db import migrations, models
+import django.db.models.expressions
+import django.db.models.functions.comparison
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0013_change_feed'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='detection',
+            name='app_detecti_name_9312f0_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='detection',
+            name='det_shannon_score_rank_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='detection',
+            name='det_tac_rank_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='detection',
+            name='det_di_rank_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='detection',
+            name='det_oc_rank_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='detection',
+            name='det_irp_rank_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='detection',
+            name='det_u_rank_idx',
+        ),
+        migrations.AddIndex(
+            model_name='detection',
+            index=models.Index(fields=['name', 'id'], name='det_name_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='detection',
+            index=models.Index(django.db.models.functions.comparison.Coalesce('shannon_score', django.db.models.expressions.Value(-1.0)), django.db.models.expressions.F('id'), name='det_shannon_score_rank_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='detection',
+            index=models.Index(django.db.models.functions.comparison.Coalesce('tac', django.db.models.expressions.Value(-1.0)), django.db.models.expressions.F('id'), name='det_tac_rank_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='detection',
+            index=models.Index(django.db.models.functions.comparison.Coalesce('di', django.db.models.expressions.Value(-1.0)), django.db.models.expressions.F('id'), name='det_di_rank_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='detection',
+            index=models.Index(django.db.models.functions.comparison.Coalesce('oc', django.db.models.expressions.Value(-1.0)), django.db.models.expressions.F('id'), name='det_oc_rank_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='detection',
+            index=models.Index(django.db.models.functions.comparison.Coalesce('irp', django.db.models.expressions.Value(-1.0)), django.db.models.expressions.F('id'), name='det_irp_rank_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='detection',
+            index=models.Index(django.db.models.functions.comparison.Coalesce('u', django.db.models.expressions.Value(-1.0)), django.db.models.expressions.F('id'), name='det_u_rank_id_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-18 13:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0014_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scorehistory',
+            name='mode',
+            field=models.CharField(blank=True, default='', max_length=16),
+        ),
+    ]
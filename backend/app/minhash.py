@@ -0,0 +1,100 @@
+import hashlib
+import random
+import re
+
+import numpy as np
+
+# MinHash signature length, split into LSH_BANDS bands of LSH_ROWS values. Two texts become
+# candidates when any band matches, which is likely above a Jaccard similarity of about
+# (1 / LSH_BANDS) ** (1 / LSH_ROWS) = 0.37 (e.g. 92% of pairs at 0.5 and 99.9% at 0.7).
+NUM_PERM = 60
+LSH_BANDS = 20
+LSH_ROWS = NUM_PERM // LSH_BANDS
+
+# Number of consecutive tokens in a shingle
+SHINGLE_SIZE = 3
+
+_PRIME = (1 << 61) - 1
+# Fixed seed: signatures are stored, so the permutations must never change
+_random = random.Random(20241018)
+_PERMUTATIONS = [(_random.randrange(1, _PRIME), _random.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+# The permutations as columns, split for _mulmod
+_A = np.array([a for a, b in _PERMUTATIONS], dtype=np.uint64)[:, None]
+_B = np.array([b for a, b in _PERMUTATIONS], dtype=np.uint64)[:, None]
+_A_HIGH, _A_LOW = _A >> np.uint64(31), _A & np.uint64((1 << 31) - 1)
+_P = np.uint64(_PRIME)
+
+_TOKEN = re.compile(r'[a-z_][a-z0-9_.]*|\d+(?:\.\d+)?|[^\sa-z0-9_]')
+
+
+def tokenize(text):
+    """
+    Lowercase tokens of `text`, with every number replaced by '0' so rules that only differ in
+    thresholds or whitespace get the same tokens.
+    """
+    return ['0' if token[0].isdigit() else token for token in _TOKEN.findall(text.lower())]
+
+
+def shingles(text):
+    tokens = tokenize(text)
+    if len(tokens) < SHINGLE_SIZE:
+        return {' '.join(tokens)}
+    return {' '.join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def _mod(x):
+    """
+    x % _PRIME for uint64 arrays, without a division: 2**61 = 1 (mod _PRIME).
+    """
+    x = (x & _P) + (x >> np.uint64(61))
+    return np.where(x >= _P, x - _P, x)
+
+
+def _mulmod(h):
+    """
+    (a * h) % _PRIME for every permutation `a` (rows) and value `h` < _PRIME (columns), exactly,
+    in uint64: with a = a1 * 2**31 + a0 and 2**61 = 1 (mod _PRIME), no partial sum reaches 2**64.
+    """
+    h_high, h_low = h >> np.uint64(31), h & np.uint64((1 << 31) - 1)
+    middle = _A_HIGH * h_low + _A_LOW * h_high
+    product = ((_A_HIGH * h_high) << np.uint64(1)) + (middle >> np.uint64(30)) \
+        + ((middle & np.uint64((1 << 30) - 1)) << np.uint64(31)) + _A_LOW * h_low
+    return _mod(product)
+
+
+def signature(text):
+    """
+    MinHash signature of `text`: NUM_PERM values below 2**61, so they fit a bigint column.
+    All permutations are applied at once with numpy; the values are those of the plain
+    min((a * h + b) % _PRIME) over the shingle hashes h.
+    """
+    hashes = np.array([_hash(shingle) % _PRIME for shingle in shingles(text)], dtype=np.uint64)
+    values = _mod(_mulmod(hashes) + _B)
+    return values.min(axis=1).tolist()
+
+
+def bands(sig):
+    """
+    LSH band keys of a signature, as signed 64-bit integers. The band number is part of the
+    key, so equal values in different bands don't match.
+    """
+    keys = []
+    for band in range(LSH_BANDS):
+        values = sig[band * LSH_ROWS:(band + 1) * LSH_ROWS]
+        key = _hash(f"{band}:{','.join(map(str, values))}")
+        keys.append(key - (1 << 63))  # Shift into the signed bigint range
+    return keys
+
+
+def similarity(sig1, sig2):
+    """
+    Estimated Jaccard similarity of the shingles behind two signatures.
+    """
+    if not sig1 or not sig2:
+        return 0.0
+    return sum(1 for x, y in zip(sig1, sig2) if x == y) / len(sig1)
@@ -0,0 +1,196 @@
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from . import llm_cache, metrics
+from .attack import normalize_classification
+from .llm_backends import get_backend
+from .llm_client import get_client
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Bump when the classification prompt or its parsing changes, so cached classifications are not reused
+MITRE_PROMPT_VERSION = 'mitre-v2'
+
+
+def build_mitre_prompt(description_text):
+    """
+    Build the MITRE ATT&CK classification prompt from the (already sanitized) description.
+    """
+    return f"""
+You are a cybersecurity expert familiar with the MITRE ATT&CK framework. Based on the following detection description, identify the relevant MITRE ATT&CK Tactics and Techniques.
+
+Detection Description:
+"{description_text}"
+
+Provide your answer in the following JSON format:
+{{
+    "tactics": ["List of tactic names"],
+    "techniques": ["List of technique IDs and names in the format 'T####: Technique Name'"]
+}}
+
+Only include tactics and techniques that are directly relevant to the detection description.
+"""
+
+
+@metrics.timed('llm_classify_mitre')
+def request_classification(prompt):
+    """
+    Send the classification prompt to the LLM backend and return the raw completion text.
+    """
+    return get_client().complete(prompt, 500).strip()
+
+
+def parse_classification(content):
+    """
+    Parse a classification response into (tactics, techniques), normalized to canonical tactic
+    names and technique IDs; values that are not in the ATT&CK catalog are dropped.
+    Raises json.JSONDecodeError or ValueError if the response is not in the expected format.
+    """
+    mitre_data = json.loads(content)
+    # Validate that the data is in the expected format
+    tactics = mitre_data.get('tactics', [])
+    techniques = mitre_data.get('techniques', [])
+    if not isinstance(tactics, list) or not isinstance(techniques, list):
+        raise ValueError("Invalid format for tactics or techniques.")
+    return normalize_classification(tactics, techniques)
+
+
+def mitre_cache_key(description_text):
+    return llm_cache.make_key(get_backend().model, MITRE_PROMPT_VERSION, description_text)
+
+
+def build_mitre_batch_prompt(items):
+    """
+    Build one classification prompt for several (id, description) pairs.
+    """
+    # One line per description, so newlines inside a description are folded
+    descriptions = '\n'.join(f'{item_id}: "{" ".join(description.split())}"' for item_id, description in items)
+    return f"""
+You are a cybersecurity expert familiar with the MITRE ATT&CK framework. For each of the following detection descriptions, identify the relevant MITRE ATT&CK Tactics and Techniques.
+
+Detection Descriptions (one per line, prefixed with their ID):
+{descriptions}
+
+Provide your answer as one JSON object keyed by detection ID, in the following format:
+{{
+    "<ID>": {{
+        "tactics": ["List of tactic names"],
+        "techniques": ["List of technique IDs and names in the format 'T####: Technique Name'"]
+    }}
+}}
+
+Include every ID. Only include tactics and techniques that are directly relevant to each description.
+"""
+
+
+def parse_batch_classification(content, ids):
+    """
+    Parse a batch classification response into a dict of id -> (tactics, techniques).
+    Items that are missing or malformed are left out.
+    Raises json.JSONDecodeError or ValueError if the response is not a JSON object.
+    """
+    data = json.loads(content)
+    if not isinstance(data, dict):
+        raise ValueError("Batch classification response is not a JSON object.")
+    results = {}
+    for item_id in ids:
+        item = data.get(str(item_id))
+        if not isinstance(item, dict):
+            logger.error(f"Missing or invalid classification for item {item_id} in batch response.")
+            continue
+        try:
+            results[item_id] = parse_classification(json.dumps(item))
+        except ValueError as ve:
+            logger.error(f"Invalid classification for item {item_id}: {ve}")
+    return results
+
+
+@metrics.timed('llm_classify_mitre_batch')
+def request_batch_classification(items):
+    """
+    Classify a batch of (id, description) pairs with one LLM call.
+    Returns a dict of id -> (tactics, techniques) for the items that came back valid.
+    """
+    prompt = build_mitre_batch_prompt(items)
+    content = get_client().complete(prompt, settings.MITRE_BATCH_ITEM_TOKENS * len(items)).strip()
+    return parse_batch_classification(content, [item_id for item_id, _ in items])
+
+
+def classify_description(description_text):
+    """
+    Classify one (already sanitized) description with the single-item prompt, bypassing the cache.
+    Returns (tactics, techniques); raises like request_classification and parse_classification.
+    """
+    return parse_classification(request_classification(build_mitre_prompt(description_text)))
+
+
+def classify_descriptions(descriptions, batch_size=None, max_concurrency=None):
+    """
+    Classify many (already sanitized) descriptions, given as a dict of id -> description.
+
+    Cached classifications are reused and identical descriptions are only sent once. The rest
+    go out `batch_size` per prompt (MITRE_BATCH_SIZE by default), up to `max_concurrency`
+    prompts at a time (MITRE_BATCH_CONCURRENCY); items a batch response doesn't cover are
+    retried on their own with the single-item prompt.
+
+    Returns (results, errors): dicts of id -> (tactics, techniques) and id -> error message.
+    """
+    batch_size = batch_size or settings.MITRE_BATCH_SIZE
+    max_concurrency = max_concurrency or settings.MITRE_BATCH_CONCURRENCY
+
+    # The cache is read and written from this thread so the pool threads never touch the database
+    by_text = {}
+    for item_id, description in descriptions.items():
+        by_text.setdefault(description, []).append(item_id)
+    classified, errors = {}, {}
+    pending = []
+    for description in by_text:
+        cached = llm_cache.get(mitre_cache_key(description))
+        if cached is not None:
+            classified[description] = (cached['tactics'], cached['techniques'])
+        else:
+            pending.append(description)
+
+    # Number the distinct descriptions, so the prompt IDs stay short
+    numbered = list(enumerate(pending, start=1))
+    batches = [numbered[i:i + batch_size] for i in range(0, len(numbered), batch_size)]
+    if batches:
+        with ThreadPoolExecutor(max_workers=min(max_concurrency, len(batches))) as executor:
+            futures = [executor.submit(request_batch_classification, batch) for batch in batches]
+            retry = []
+            for batch, future in zip(batches, futures):
+                try:
+                    batch_results = future.result()
+                except Exception as e:
+                    logger.error(f"Error classifying a batch of {len(batch)} descriptions: {e}")
+                    batch_results = {}
+                for number, description in batch:
+                    if number in batch_results:
+                        classified[description] = batch_results[number]
+                    else:
+                        retry.append(description)
+
+            if retry:
+                logger.warning(f"Retrying {len(retry)} descriptions one at a time.")
+                single = {description: executor.submit(classify_description, description) for description in retry}
+                for description, future in single.items():
+                    try:
+                        classified[description] = future.result()
+                    except Exception as e:
+                        logger.error(f"Error classifying MITRE: {e}")
+                        for item_id in by_text[description]:
+                            errors[item_id] = str(e)
+
+    results = {}
+    requested = set(pending)
+    for description, (tactics, techniques) in classified.items():
+        if description in requested:
+            llm_cache.set(mitre_cache_key(description), 'mitre', {'tactics': tactics, 'techniques': techniques})
+        for item_id in by_text[description]:
+            results[item_id] = (tactics, techniques)
+    return results, errors
+
@@ -1,10 +1,66 @@
-from django.db import models
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce
 from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.exceptions import ValidationError
 
+from . import minhash
+
+# Score columns that can be filtered and ordered on
+SCORE_FIELDS = ['shannon_score', 'tac', 'di', 'oc', 'irp', 'u']
+
+# Scores are 0-100, so unscored detections sort below every scored one
+UNSCORED_RANK = -1.0
+
+
+def score_rank(field):
+    """
+    Non-null sort key for a score column. Indexed, and used for filtering, ordering and
+    cursor pagination (which can't page over NULLs).
+    """
+    return Coalesce(field, Value(UNSCORED_RANK))
+
+
+def compute_logic_hash(logic):
+    """
+    Content hash of a detection's logic, used to spot unchanged rules on re-upload.
+    """
+    return hashlib.sha256(logic.strip().encode('utf-8')).hexdigest()
+
+
+# Text search configuration of Detection.search_vector; queries must use the same one
+SEARCH_CONFIG = 'english'
+
+# Columns only used by indexes and lookups, which the API never returns
+INDEX_ONLY_FIELDS = ['logic_minhash', 'logic_bands', 'description_minhash', 'description_bands', 'search_vector']
+
+# Text fields with a MinHash signature and LSH bands, for finding near-duplicate detections
+SIGNATURE_FIELDS = ['logic', 'description']
+
+
+def compute_signature_fields(**texts):
+    """
+    Return the signature columns for the given texts, e.g. compute_signature_fields(logic=...).
+    """
+    fields = {}
+    for name, text in texts.items():
+        signature = minhash.signature(text)
+        fields[f'{name}_minhash'] = signature
+        fields[f'{name}_bands'] = minhash.bands(signature)
+    return fields
+
+
 class Detection(models.Model):
     name = models.CharField(max_length=255)
     logic = models.TextField()
+    # Kept in sync with `logic` by save(); bulk writers must set it themselves
+    logic_hash = models.CharField(max_length=64, blank=True, db_index=True, editable=False)
     description = models.TextField()
     shannon_score = models.FloatField(null=True, blank=True)
     
@@ -15,6 +71,9 @@ class Detection(models.Model):
     irp = models.FloatField(null=True, blank=True)   # Impact & Risk Potential
     u = models.FloatField(null=True, blank=True)     # Utility
 
+    # ShannonScoreWeights.version used for shannon_score, to find scores left stale by a weight change
+    weights_version = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+
     # Fields for MITRE ATT&CK mappings
     mitre_tactics = ArrayField(
         models.CharField(max_length=255),
@@ -27,9 +86,64 @@ class Detection(models.Model):
         blank=True,
     )
 
+    # MinHash signatures and LSH band keys of logic and description (see app.minhash).
+    # Kept in sync by save(); bulk writers must set them with compute_signature_fields().
+    logic_minhash = ArrayField(models.BigIntegerField(), default=list, blank=True, editable=False)
+    logic_bands = ArrayField(models.BigIntegerField(), default=list, blank=True, editable=False)
+    description_minhash = ArrayField(models.BigIntegerField(), default=list, blank=True, editable=False)
+    description_bands = ArrayField(models.BigIntegerField(), default=list, blank=True, editable=False)
+
+    # Weighted full-text vector of name (A), description (B) and logic (C). Maintained by a database
+    # trigger (see migration 0010), so it is also current after bulk_create and bulk_update.
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    # Last change of the row. save() sets it; a database trigger (see migration 0012) also sets it
+    # on every other UPDATE, so it is current after bulk_update and queryset updates too
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # (ordering column, id) pairs, so cursor pagination seeks to the next page (see
+            # DetectionCursorPagination); the leading column also serves name and score filters
+            models.Index(fields=['name', 'id'], name='det_name_id_idx'),
+            *[models.Index(score_rank(field), F('id'), name=f'det_{field}_rank_id_idx') for field in SCORE_FIELDS],
+            # Array containment/overlap lookups for MITRE filtering
+            GinIndex(fields=['mitre_tactics'], name='det_mitre_tactics_gin'),
+            GinIndex(fields=['mitre_techniques'], name='det_mitre_techniques_gin'),
+            # Band overlap lookups for similarity candidates
+            GinIndex(fields=['logic_bands'], name='det_logic_bands_gin'),
+            GinIndex(fields=['description_bands'], name='det_description_bands_gin'),
+            GinIndex(fields=['search_vector'], name='det_search_vector_gin'),
+        ]
+
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded texts, so save() only recomputes the signatures of changed ones
+        instance._loaded_texts = {name: getattr(instance, name) for name in SIGNATURE_FIELDS if name in field_names}
+        return instance
+
+    def save(self, *args, **kwargs):
+        self.logic_hash = compute_logic_hash(self.logic)
+        loaded = getattr(self, '_loaded_texts', {})
+        changed = {name: getattr(self, name) for name in SIGNATURE_FIELDS
+                   if name not in loaded or loaded[name] != getattr(self, name)}
+        for field, value in compute_signature_fields(**changed).items():
+            setattr(self, field, value)
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            extra = {'logic_hash'} if 'logic' in update_fields else set()
+            for name in SIGNATURE_FIELDS:
+                if name in update_fields:
+                    extra |= {f'{name}_minhash', f'{name}_bands'}
+            kwargs['update_fields'] = set(update_fields) | extra
+        super().save(*args, **kwargs)
+        self._loaded_texts = {name: getattr(self, name) for name in SIGNATURE_FIELDS}
+
 
 class ShannonScoreWeights(models.Model):
     tac_weight = models.FloatField(default=0.2)
@@ -37,6 +151,11 @@ class ShannonScoreWeights(models.Model):
     oc_weight = models.FloatField(default=0.2)
     irp_weight = models.FloatField(default=0.2)
     u_weight = models.FloatField(default=0.2)
+    # Bumped on every save; scored detections record the version they were scored with
+    version = models.PositiveIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    CACHE_KEY = 'shannon-score-weights'
 
     class Meta:
         verbose_name_plural = "Shannon Score Weights"
@@ -50,4 +169,194 @@ class ShannonScoreWeights(models.Model):
         """
         if not self.pk and ShannonScoreWeights.objects.exists():
             raise ValidationError('There can be only one ShannonScoreWeights instance')
-        super(ShannonScoreWeights, self).save(*args, **kwargs)
\ No newline at end of file
+        bump = not self._state.adding
+        if bump:
+            # Incremented in the database, so concurrent updates never save the same version
+            self.version = F('version') + 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'version'}
+        super(ShannonScoreWeights, self).save(*args, **kwargs)
+        if bump:
+            self.refresh_from_db(fields=['version'])
+        # Drop the cached copy once the new weights are visible to other connections
+        transaction.on_commit(ShannonScoreWeights.invalidate_cache)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        transaction.on_commit(ShannonScoreWeights.invalidate_cache)
+        return result
+
+    @classmethod
+    def load(cls):
+        """
+        Return the singleton instance, creating it with default values if needed.
+        Served from the cache (see WEIGHTS_CACHE_TIMEOUT) so scoring doesn't query it every time.
+        """
+        weights = cache.get(cls.CACHE_KEY)
+        if weights is None:
+            weights, created = cls.objects.get_or_create(id=1)
+            cache.set(cls.CACHE_KEY, weights, settings.WEIGHTS_CACHE_TIMEOUT)
+        return weights
+
+    @classmethod
+    def invalidate_cache(cls):
+        cache.delete(cls.CACHE_KEY)
+
+    def as_tuple(self):
+        """
+        Return the weights as (W1, W2, W3, W4, W5), in the order of the S3 components.
+        """
+        return (self.tac_weight, self.di_weight, self.oc_weight, self.irp_weight, self.u_weight)
+
+
+class ScoringJob(models.Model):
+    """
+    A batch of detections queued for Shannon score calculation.
+    Progress is derived from the status of its items.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (COMPLETED, 'Completed'),
+    ]
+
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED, db_index=True)
+    total = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Scoring job {self.pk} ({self.status})"
+
+
+class ScoringJobItem(models.Model):
+    """
+    One detection of a ScoringJob. This table doubles as the work queue.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    job = models.ForeignKey(ScoringJob, related_name='items', on_delete=models.CASCADE)
+    detection = models.ForeignKey(Detection, related_name='scoring_job_items', on_delete=models.CASCADE)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED)
+    shannon_score = models.FloatField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'id']),
+            models.Index(fields=['job', 'status']),
+        ]
+
+    def __str__(self):
+        return f"Scoring job {self.job_id} item {self.pk} ({self.status})"
+
+
+class TableVersion(models.Model):
+    """
+    Change counter of a table, bumped by a database trigger once per committed transaction that
+    writes to it (see migrations 0012 and 0013). The counter only moves in commit order, so it is
+    a cheap validator for conditional GETs of views over the whole table.
+    """
+    table = models.CharField(max_length=63, primary_key=True)
+    version = models.BigIntegerField(default=0)
+    changed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.table} v{self.version}"
+
+    @classmethod
+    def current(cls, table):
+        """
+        Return (version, changed_at) of `table`, or (0, None) if it was never written to.
+        """
+        return cls.objects.filter(table=table).values_list('version', 'changed_at').first() or (0, None)
+
+
+class DetectionChange(models.Model):
+    """
+    Latest change of a detection, for the change feed: the detection table's TableVersion after
+    the transaction that last wrote (or deleted) it. Written by a database trigger at commit (see
+    migration 0013), so change_seq follows the commit order and a client that has read up to a
+    given sequence never misses a later one. Deleted detections stay as tombstones.
+    """
+    detection_id = models.BigIntegerField(primary_key=True)
+    change_seq = models.BigIntegerField()
+    deleted = models.BooleanField(default=False)
+    changed_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            # Range scans of the change feed, in cursor order
+            models.Index(fields=['change_seq', 'detection_id'], name='det_change_seq_idx'),
+        ]
+
+    def __str__(self):
+        return f"Detection {self.detection_id} {'deleted' if self.deleted else 'changed'} at {self.change_seq}"
+
+
+class LLMCacheEntry(models.Model):
+    """
+    A cached completion result, keyed by a hash of (model, prompt template version, input text).
+    """
+    key = models.CharField(max_length=64, primary_key=True)
+    kind = models.CharField(max_length=32)
+    value = models.JSONField()
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    last_used_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name_plural = "LLM cache entries"
+
+    def __str__(self):
+        return f"{self.kind} {self.key[:12]}"
+
+
+class ScoreHistory(models.Model):
+    """
+    Append-only record of an LLM scoring of a detection: the resulting scores and what produced
+    them (model, prompt and logic hashes, weights version), so changed prompts or rules can be
+    found and re-scored.
+    """
+    # Indexed together with id below
+    detection = models.ForeignKey(Detection, related_name='score_history', on_delete=models.CASCADE, db_index=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    model = models.CharField(max_length=100)
+    # Scoring mode (scoring.PER_COMPONENT or COMBINED); empty for entries recorded before it was
+    mode = models.CharField(max_length=16, blank=True, default='')
+    # scoring.prompt_hash() of the prompts used
+    prompt_hash = models.CharField(max_length=16)
+    logic_hash = models.CharField(max_length=64)
+    weights_version = models.PositiveIntegerField(null=True, blank=True)
+    shannon_score = models.FloatField(null=True, blank=True)
+    tac = models.FloatField(null=True, blank=True)
+    di = models.FloatField(null=True, blank=True)
+    oc = models.FloatField(null=True, blank=True)
+    irp = models.FloatField(null=True, blank=True)
+    u = models.FloatField(null=True, blank=True)
+    # Time spent getting the component scores
+    latency_ms = models.PositiveIntegerField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = "Score history"
+        indexes = [
+            # Latest entry per detection
+            models.Index(fields=['detection', '-id'], name='scorehistory_latest_idx'),
+        ]
+
+    def __str__(self):
+        return f"Score of detection {self.detection_id} at {self.created_at}"
@@ -0,0 +1,143 @@
+import base64
+import json
+import math
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models import F, Field, Func, Q, Value
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class RowValue(Func):
+    """
+    SQL row constructor, e.g. (shannon_score_rank, id), for row-value comparisons.
+    """
+    function = ''
+    output_field = Field()
+
+
+def valid_position_value(field, value):
+    """
+    Whether `value` can be the cursor value of ordering `field` (id, name or a score rank), so
+    a tampered cursor never reaches the database as a bad cast.
+    """
+    if isinstance(value, bool):
+        return False
+    if field == 'id':
+        return isinstance(value, int)
+    if field == 'name':
+        return isinstance(value, str)
+    return isinstance(value, (int, float)) and math.isfinite(value)
+
+
+class DetectionCursorPagination(BasePagination):
+    """
+    Keyset ("seek") pagination for the detection list.
+
+    The cursor holds the ordering values of the last row of a page and the next page starts
+    strictly after it. Unlike DRF's CursorPagination this stays correct when many rows share
+    a score (e.g. thousands of unscored detections). The ordering comes from
+    DetectionOrderingFilter, which always ends with id. When every ordering field has the same
+    direction (the default for each ?ordering=) the cursor condition is a row-value comparison,
+    which Postgres seeks in the (column, id) indexes, so deep pages cost the same as the first.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = settings.DETECTION_PAGE_SIZE
+    max_page_size = settings.DETECTION_MAX_PAGE_SIZE
+    ordering = ['-id']
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request)
+        if position is not None:
+            queryset = self._after(queryset, position)
+
+        # Fetch one extra row to know whether there is a next page
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        self.has_next = len(results) > self.page_size
+        return self.page
+
+    def _after(self, queryset, position):
+        """
+        Restrict `queryset` to the rows strictly after `position` in the ordering.
+        """
+        fields = [field.lstrip('-') for field in self.ordering]
+        directions = {field.startswith('-') for field in self.ordering}
+        if len(directions) == 1:
+            # (a, b, id) < (x, y, z): one index seek
+            lookup = 'lt' if directions.pop() else 'gt'
+            return queryset.alias(cursor_row=RowValue(*map(F, fields))).filter(
+                **{f'cursor_row__{lookup}': RowValue(*map(Value, position))})
+
+        # Mixed directions can't be one row comparison: (a > x) OR (a = x AND b < y) OR ...
+        condition = Q()
+        equal = {}
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return queryset.filter(condition)
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size < 1:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_ordering(self, request, queryset, view):
+        for backend in getattr(view, 'filter_backends', []):
+            if hasattr(backend, 'get_ordering'):
+                return list(backend().get_ordering(request, queryset, view))
+        return list(self.ordering)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+        except (TypeError, ValueError):
+            raise NotFound('Invalid cursor')
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound('Invalid cursor')
+        if not all(valid_position_value(field.lstrip('-'), value) for field, value in zip(self.ordering, position)):
+            raise NotFound('Invalid cursor')
+        return position
+
+    def encode_cursor(self, position):
+        encoded = base64.urlsafe_b64encode(json.dumps(position).encode('utf-8')).decode('ascii')
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        return self.encode_cursor([getattr(last, field.lstrip('-')) for field in self.ordering])
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,34 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from . import metrics
+
+try:
+    import orjson
+except ImportError:  # Only needed by the production profile (see app/checks.py)
+    orjson = None
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that records how long responses take to render.
+    """
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with metrics.timer('render_json'):
+            return super().render(data, accepted_media_type, renderer_context)
+
+
+class OrjsonRenderer(TimedJSONRenderer):
+    """
+    Renders compact JSON with orjson. Types orjson doesn't know (e.g. Decimal, lazy translations)
+    go through DRF's encoder, and indented output (?format=json with "indent") through the json module.
+    """
+    _encoder = JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        with metrics.timer('render_json'):
+            return orjson.dumps(data, default=self._encoder.default, option=orjson.OPT_NON_STR_KEYS)
@@ -0,0 +1,435 @@
+import functools
+import hashlib
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.db.models import F, OuterRef, Q, Subquery
+
+from . import llm_cache, metrics
+from .llm_backends import get_backend
+from .llm_client import get_client
+from .models import Detection, ShannonScoreWeights, ScoreHistory
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Prompt versions are part of prompt_hash(), which keys the LLM cache and the score history.
+# Edits to the prompt text change the hash by themselves; bump these for other changes that
+# should invalidate cached scores and mark detections for re-scoring (e.g. a new response parser).
+SCORE_PROMPT_VERSION = 'score-v1'
+COMBINED_PROMPT_VERSION = 'scores-v1'
+
+# Scoring modes: one prompt per component, or one structured prompt for all components
+PER_COMPONENT = 'per_component'
+COMBINED = 'combined'
+SCORING_MODES = [PER_COMPONENT, COMBINED]
+
+# S3 components, in the order they are weighted (W1..W5)
+COMPONENTS = ['tac', 'di', 'oc', 'irp', 'u']
+
+COMPONENT_LABELS = {
+    'tac': 'Technical Adversary Capability (TAC)',
+    'di': 'Detection Integrity (DI)',
+    'oc': 'Operational Complexity (OC)',
+    'irp': 'Incident Response Procedures (IRP)',
+    'u': 'Uncertainty (U)',
+}
+
+
+class ComponentsUnavailableError(Exception):
+    """
+    Raised when some S3 components could not be scored because the LLM backend failed.
+    """
+    def __init__(self, missing):
+        self.missing = missing
+        super().__init__(f"Could not score components: {', '.join(missing)}")
+
+
+class DetectionChangedError(Exception):
+    """
+    Raised when the logic of a detection changed (or it was deleted) while it was being scored.
+    The scores were calculated for the old logic, so they are not saved.
+    """
+    def __init__(self, detection_id):
+        self.detection_id = detection_id
+        super().__init__(f"Detection {detection_id} changed while it was being scored; the scores were discarded.")
+
+
+def configure_backend():
+    """
+    Prepare the LLM backend selected by the LLM_BACKEND setting.
+    Returns False if it is missing its configuration (e.g. OPENAI_API_KEY is not set).
+    """
+    return get_backend().configure()
+
+
+def get_weights():
+    """
+    Return the (cached) ShannonScoreWeights singleton.
+    """
+    return ShannonScoreWeights.load()
+
+
+def build_prompts(logic_text):
+    """
+    Build the prompt for each S3 component from the (already sanitized) detection logic.
+    """
+    return {
+        component: f"""As a cybersecurity expert, evaluate the {label} based on the following detection logic: "{logic_text}". Provide a score between 0 and 100."""
+        for component, label in COMPONENT_LABELS.items()
+    }
+
+
+def build_combined_prompt(logic_text, components):
+    """
+    Build a single prompt asking for several S3 components as one JSON object.
+    """
+    labels = '\n'.join(f'- "{component}": {COMPONENT_LABELS[component]}' for component in components)
+    keys = ', '.join(f'"{component}": <score>' for component in components)
+    return f"""As a cybersecurity expert, evaluate the following detection logic: "{logic_text}".
+Score each of these components between 0 and 100:
+{labels}
+
+Answer with only a JSON object in this format: {{{keys}}}"""
+
+
+@metrics.timed('llm_score')
+def request_score(prompt, timeout=None):
+    """
+    Get a single component score from the LLM backend (rate limited, with retries).
+    Raises if the call fails or the response is not a score between 0 and 100.
+    """
+    score = parse_score(get_client().complete(prompt, 10, timeout))
+    logger.info(f"Obtained score from OpenAI: {score}")
+    return score
+
+
+def parse_score(content):
+    """
+    Parse a component score response. Raises ValueError unless it is a score between 0 and 100.
+    """
+    # Extract the first line and try to parse it as a float
+    score_line = content.strip().split('\n')[0]
+    score = float(score_line)
+    # Ensure score is between 0 and 100
+    if not (0 <= score <= 100):
+        raise ValueError(f"Score out of bounds: {score}")
+    return score
+
+
+@metrics.timed('llm_scores_combined')
+def request_combined_scores(prompt, components, timeout=None):
+    """
+    Get several component scores from one LLM backend call.
+    Returns a dict with the components that came back as valid scores; the rest are left out.
+    Raises if the call fails or the response is not a JSON object.
+    """
+    content = get_client().complete(prompt, 15 * len(components), timeout)
+    return parse_combined_scores(content, components)
+
+
+def parse_combined_scores(content, components):
+    """
+    Parse a combined score response into a dict with the components that are valid scores.
+    Raises json.JSONDecodeError or ValueError if the response is not a JSON object.
+    """
+    data = json.loads(content.strip())
+    if not isinstance(data, dict):
+        raise ValueError("Combined score response is not a JSON object.")
+
+    scores = {}
+    for component in components:
+        try:
+            score = float(data[component])
+        except (KeyError, TypeError, ValueError):
+            logger.error(f"Missing or invalid {component.upper()} score in combined response.")
+            continue
+        if not (0 <= score <= 100):
+            logger.error(f"Score out of bounds: {score}")
+            continue
+        scores[component] = score
+    return scores
+
+
+@functools.lru_cache(maxsize=None)
+def prompt_hash(mode=PER_COMPONENT):
+    """
+    Short fingerprint of the prompt version and templates of a scoring mode.
+    """
+    if mode == COMBINED:
+        text = COMBINED_PROMPT_VERSION + build_combined_prompt('{logic}', COMPONENTS)
+    else:
+        text = SCORE_PROMPT_VERSION + json.dumps(build_prompts('{logic}'), sort_keys=True)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+
+
+def score_cache_key(component, logic_text, mode=PER_COMPONENT):
+    # Scores from the two modes are cached separately, since the prompts differ
+    return llm_cache.make_key(get_backend().model, f'{prompt_hash(mode)}:{component}', logic_text)
+
+
+def score_components(prompts, components, max_concurrency=None, timeout=None, cache_keys=None):
+    """
+    Request the given components concurrently and return a dict of component -> score.
+    `cache_keys` maps components to LLM cache keys; cached components skip the OpenAI call.
+    Components whose call failed (after retries) or timed out are left out, so they stay unset
+    and are retried later; a response that is not a valid score counts as 0.
+
+    At most `max_concurrency` calls are in flight at once (SCORING_MAX_CONCURRENCY by default),
+    and each call is bounded by `timeout` seconds (SCORING_CALL_TIMEOUT by default), so the
+    total time is roughly that of the slowest component rather than the sum of all of them.
+    """
+    max_concurrency = max_concurrency or settings.SCORING_MAX_CONCURRENCY
+    timeout = timeout or settings.SCORING_CALL_TIMEOUT
+    cache_keys = cache_keys or {}
+
+    # The cache is read and written from this thread so the pool threads never touch the database
+    scores = {}
+    for component in components:
+        if component in cache_keys:
+            cached = llm_cache.get(cache_keys[component])
+            if cached is not None:
+                scores[component] = cached
+    to_request = [component for component in components if component not in scores]
+    if not to_request:
+        return scores
+
+    executor = ThreadPoolExecutor(max_workers=min(max_concurrency, len(to_request)))
+    try:
+        futures = {
+            component: executor.submit(request_score, prompts[component], timeout)
+            for component in to_request
+        }
+        # The client enforces the per-call timeout; this is only a backstop for calls that hang
+        # (queued calls wait for a free worker, so allow one call with retries per "round" of calls).
+        rounds = -(-len(to_request) // max_concurrency)
+        done, _ = wait(futures.values(), timeout=get_client().max_duration(timeout) * rounds + 1)
+
+        for component, future in futures.items():
+            if future not in done:
+                logger.error(f"Timed out waiting for {component.upper()} score.")
+                continue
+            try:
+                scores[component] = future.result()
+            except ValueError as ve:
+                logger.error(f"Invalid score format: {ve}")
+                scores[component] = 0  # Default to 0 if parsing fails
+                continue
+            except Exception as e:
+                # Throttling or an outage is not a verdict on the detection, so don't store a 0
+                logger.error(f"Error getting score from OpenAI: {e}")
+                continue
+            # Only successful scores are cached, so failures are retried next time
+            if component in cache_keys:
+                llm_cache.set(cache_keys[component], 'score', scores[component])
+        return scores
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def score_components_combined(logic_text, components, timeout=None):
+    """
+    Request the given components in one structured prompt and return a dict of component -> score.
+    Components that are missing or invalid in the response are scored with per-component prompts.
+    """
+    timeout = timeout or settings.SCORING_CALL_TIMEOUT
+    cache_keys = {component: score_cache_key(component, logic_text, COMBINED) for component in components}
+
+    scores = {}
+    for component in components:
+        cached = llm_cache.get(cache_keys[component])
+        if cached is not None:
+            scores[component] = cached
+    to_request = [component for component in components if component not in scores]
+
+    if to_request:
+        try:
+            combined = request_combined_scores(build_combined_prompt(logic_text, to_request), to_request, timeout)
+        except Exception as e:
+            logger.error(f"Error getting combined scores from OpenAI: {e}")
+            combined = {}
+        for component, score in combined.items():
+            scores[component] = score
+            llm_cache.set(cache_keys[component], 'score', score)
+
+    # Fall back to one prompt per component for anything the combined response didn't cover
+    fallback = [component for component in components if component not in scores]
+    if fallback:
+        logger.warning(f"Falling back to per-component scoring for: {', '.join(fallback)}")
+        cache_keys = {component: score_cache_key(component, logic_text) for component in fallback}
+        scores.update(score_components(build_prompts(logic_text), fallback, timeout=timeout, cache_keys=cache_keys))
+    return scores
+
+
+def fill_missing_components(detection, mode=None):
+    """
+    Calculate every S3 component of `detection` that is not already set.
+    `mode` is PER_COMPONENT or COMBINED (SCORING_MODE by default).
+    Returns a dict of the newly calculated component scores. The detection is not saved.
+    """
+    mode = mode or settings.SCORING_MODE
+
+    # Sanitize detection.logic to prevent injection attacks
+    logic_text = detection.logic.strip()
+    # Limit the length of the text to prevent excessive API usage
+    logic_text = logic_text[:1000]  # Limit to first 1000 characters
+
+    missing = missing_components(detection)
+    if not missing:
+        return {}
+
+    started = time.monotonic()
+    if mode == COMBINED:
+        scores = score_components_combined(logic_text, missing)
+    else:
+        cache_keys = {component: score_cache_key(component, logic_text) for component in missing}
+        scores = score_components(build_prompts(logic_text), missing, cache_keys=cache_keys)
+    logger.info(f"Scored {len(missing)} components in {mode} mode in {time.monotonic() - started:.2f}s")
+
+    for component, score in scores.items():
+        setattr(detection, component, score)
+        logger.info(f"Calculated {component.upper()} score: {score}")
+    return scores
+
+
+def missing_components(detection):
+    return [component for component in COMPONENTS if getattr(detection, component) is None]
+
+
+def compute_shannon_score(detection, weights):
+    """
+    Combine the S3 components of `detection` using the ShannonScoreWeights `weights`.
+    """
+    return sum(weight * getattr(detection, component) for weight, component in zip(weights.as_tuple(), COMPONENTS))
+
+
+def save_scores(detection, logic_hash):
+    """
+    Write the components, Shannon score and weights version of `detection`, and only those, so
+    edits made to other fields while the LLM was answering are kept. Nothing is written if the
+    logic no longer has `logic_hash` (the hash it had when scoring started): raises
+    DetectionChangedError instead.
+    """
+    updated = Detection.objects.filter(pk=detection.pk, logic_hash=logic_hash).update(
+        shannon_score=detection.shannon_score,
+        weights_version=detection.weights_version,
+        **{component: getattr(detection, component) for component in COMPONENTS},
+    )
+    if not updated:
+        raise DetectionChangedError(detection.pk)
+
+
+def finish_scoring(detection, weights, mode, logic_hash, scored, latency=None, reused_from=None):
+    """
+    Second half of score_detection, once fill_missing_components returned `scored` after
+    `latency` seconds: recalculate the Shannon score, save it with save_scores and record the
+    history. `reused_from` ({'id', 'similarity'}) names the neighbor components were copied from.
+    """
+    missing = missing_components(detection)
+    if missing:
+        save_scores(detection, logic_hash)
+        raise ComponentsUnavailableError(missing)
+    detection.shannon_score = compute_shannon_score(detection, weights)
+    detection.weights_version = weights.version
+    save_scores(detection, logic_hash)
+    # Record where new component scores came from (nothing new if they were all set already)
+    if scored:
+        record_score_history(detection, mode, latency)
+    elif reused_from:
+        record_score_history(detection, mode, model=f"reused:{reused_from['id']}")
+    logger.info(f"Calculated Shannon Score for detection {detection.pk}: {detection.shannon_score}")
+    return detection
+
+
+def score_detection(detection, weights=None, mode=None, reused_from=None):
+    """
+    Fill in the missing components of `detection`, recalculate its Shannon score and save it.
+    Raises ComponentsUnavailableError (after saving the components it did get) if the LLM
+    backend could not score every component, or DetectionChangedError if the logic changed
+    in the meantime.
+    """
+    if weights is None:
+        weights = get_weights()
+    logic_hash = detection.logic_hash
+    started = time.monotonic()
+    scored = fill_missing_components(detection, mode)
+    return finish_scoring(detection, weights, mode, logic_hash, scored, time.monotonic() - started, reused_from)
+
+
+def record_score_history(detection, mode=None, latency=None, model=None):
+    """
+    Append a ScoreHistory entry with the current scores of `detection`.
+    Call it after the LLM scored some of its components; `latency` is the time that took (seconds).
+    """
+    mode = mode or settings.SCORING_MODE
+    return ScoreHistory.objects.create(
+        detection=detection,
+        model=model or get_backend().model,
+        mode=mode,
+        prompt_hash=prompt_hash(mode),
+        logic_hash=detection.logic_hash,
+        weights_version=detection.weights_version,
+        shannon_score=detection.shannon_score,
+        latency_ms=round(latency * 1000) if latency is not None else None,
+        **{component: getattr(detection, component) for component in COMPONENTS},
+    )
+
+
+def stale_scores(include_unrecorded=False):
+    """
+    Return the scored detections whose logic or scoring prompts changed since their latest
+    ScoreHistory entry; prompts are compared with the current ones of the mode that entry was
+    scored in. Scored detections without history (scored before it was recorded) are only
+    included with `include_unrecorded`.
+    """
+    latest = ScoreHistory.objects.filter(detection=OuterRef('pk')).order_by('-id')
+    queryset = Detection.objects.annotate(
+        scored_logic_hash=Subquery(latest.values('logic_hash')[:1]),
+        scored_mode=Subquery(latest.values('mode')[:1]),
+        scored_prompt_hash=Subquery(latest.values('prompt_hash')[:1]),
+    )
+    scored = Q(**{f'{component}__isnull': False for component in COMPONENTS}, _connector=Q.OR)
+    # Entries recorded before the mode was match the prompts of either mode
+    current_prompts = Q(scored_mode='', scored_prompt_hash__in=[prompt_hash(mode) for mode in SCORING_MODES])
+    for mode in SCORING_MODES:
+        current_prompts |= Q(scored_mode=mode, scored_prompt_hash=prompt_hash(mode))
+    changed = ~Q(scored_logic_hash=F('logic_hash')) | ~current_prompts
+    if include_unrecorded:
+        return queryset.filter(scored).filter(changed | Q(scored_logic_hash__isnull=True))
+    return queryset.filter(scored, scored_logic_hash__isnull=False).filter(changed)
+
+
+# Field values of a detection whose scores are cleared (including the stamp of the weights
+# they were calculated with)
+CLEARED_SCORES = {'shannon_score': None, 'weights_version': None, **{component: None for component in COMPONENTS}}
+
+
+def clear_scores(queryset):
+    """
+    Clear the components and Shannon score of the detections in `queryset`, so the next
+    scoring run asks the LLM for all of them. Returns the number of detections cleared.
+    """
+    return queryset.update(**CLEARED_SCORES)
+
+
+def recompute_shannon_scores(weights=None):
+    """
+    Re-apply the weights to the stored components of every fully scored detection.
+    Runs as a single UPDATE, so no OpenAI calls are made. Returns the number of updated detections.
+    """
+    if weights is None:
+        weights = get_weights()
+    terms = [F(component) * weight for weight, component in zip(weights.as_tuple(), COMPONENTS)]
+    shannon_score = terms[0]
+    for term in terms[1:]:
+        shannon_score = shannon_score + term
+
+    fully_scored = {f'{component}__isnull': False for component in COMPONENTS}
+    updated = Detection.objects.filter(**fully_scored).update(
+        shannon_score=shannon_score, weights_version=weights.version
+    )
+    logger.info(f"Recomputed Shannon scores for {updated} detections.")
+    return updated
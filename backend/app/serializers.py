@@ -1,7 +1,29 @@
 from rest_framework import serializers
-from .models import Detection, ShannonScoreWeights
+from .attack import get_catalog
+from .models import Detection, ShannonScoreWeights, ScoringJob, ScoringJobItem, ScoreHistory
+
+
+def get_requested_fields(request):
+    """
+    Return the set of field names asked for with ?fields=, or None for all fields.
+    """
+    if request is None or request.method != 'GET':
+        return None
+    fields = request.query_params.get('fields')
+    if not fields:
+        return None
+    return {field.strip() for field in fields.split(',') if field.strip()}
+
 
 class DetectionSerializer(serializers.ModelSerializer):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Sparse fieldsets: ?fields=id,name,shannon_score on GET requests
+        requested = get_requested_fields(self.context.get('request'))
+        if requested:
+            for field_name in set(self.fields) - requested:
+                self.fields.pop(field_name)
+
     class Meta:
         model = Detection
         fields = [
@@ -17,11 +39,69 @@ class DetectionSerializer(serializers.ModelSerializer):
             'u',
             'mitre_tactics',
             'mitre_techniques',
+            'weights_version',
             # Add any other relevant fields
         ]
-        read_only_fields = ['shannon_score']  # Optional: Make it read-only if it's calculated
+        read_only_fields = ['shannon_score', 'weights_version']  # Optional: Make it read-only if it's calculated
+
+    def validate_mitre_tactics(self, value):
+        return self._normalize(value, get_catalog().normalize_tactic, 'tactic', 'mitre_tactics')
+
+    def validate_mitre_techniques(self, value):
+        return self._normalize(value, get_catalog().normalize_technique, 'technique', 'mitre_techniques')
+
+    def _normalize(self, values, normalize, kind, field):
+        # Store canonical catalog values (tactic names, technique IDs) so coverage groups on exact keys.
+        # Values the detection already holds are kept even if unknown (rows classified before the
+        # catalog, until normalize_mitre runs), so saving an unrelated change doesn't fail.
+        stored = getattr(self.instance, field, None) or []
+        normalized, unknown = [], []
+        for value in values:
+            canonical = normalize(value)
+            if canonical is None and value in stored:
+                canonical = value
+            if canonical is None:
+                unknown.append(value)
+            elif canonical not in normalized:
+                normalized.append(canonical)
+        if unknown:
+            raise serializers.ValidationError(f"Unknown MITRE ATT&CK {kind}: {', '.join(unknown)}")
+        return normalized
 
 class ShannonScoreWeightsSerializer(serializers.ModelSerializer):
     class Meta:
         model = ShannonScoreWeights
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+        read_only_fields = ['version']
+
+class ScoringJobSerializer(serializers.ModelSerializer):
+    # Progress counts are annotated on the queryset by ScoringJobViewSet
+    queued = serializers.IntegerField(read_only=True)
+    running = serializers.IntegerField(read_only=True)
+    done = serializers.IntegerField(read_only=True)
+    failed = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = ScoringJob
+        fields = [
+            'id',
+            'status',
+            'total',
+            'queued',
+            'running',
+            'done',
+            'failed',
+            'created_at',
+            'started_at',
+            'finished_at',
+        ]
+
+class ScoringJobItemSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ScoringJobItem
+        fields = ['detection', 'status', 'shannon_score', 'error']
+
+class ScoreHistorySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ScoreHistory
+        exclude = ['detection']
@@ -0,0 +1,98 @@
+import logging
+
+from django.conf import settings
+
+from . import minhash
+from .models import Detection, INDEX_ONLY_FIELDS, SIGNATURE_FIELDS
+from .scoring import COMPONENTS, missing_components
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+def find_similar(detection, field='logic', threshold=None, limit=None, queryset=None):
+    """
+    Return up to `limit` (similarity, detection) pairs, most similar first, for the detections
+    whose `field` ('logic' or 'description') is at least `threshold` similar to that of `detection`.
+
+    Candidates come from the GIN-indexed LSH bands and are then ranked by MinHash similarity,
+    so this never scans the table. Candidates are ranked on their signature column alone; only
+    the matches are loaded as rows. `queryset` restricts the candidates (e.g. to scored detections).
+    """
+    if field not in SIGNATURE_FIELDS:
+        raise ValueError(f"Invalid field. Choose one of: {', '.join(SIGNATURE_FIELDS)}")
+    threshold = settings.SIMILARITY_THRESHOLD if threshold is None else threshold
+    limit = limit or settings.SIMILARITY_MAX_RESULTS
+
+    signature = getattr(detection, f'{field}_minhash')
+    bands = getattr(detection, f'{field}_bands')
+    if not signature:
+        return []
+
+    queryset = Detection.objects.all() if queryset is None else queryset
+    candidates = (
+        queryset.filter(**{f'{field}_bands__overlap': bands})
+        .exclude(pk=detection.pk)
+        .values_list('pk', f'{field}_minhash')
+        [:settings.SIMILARITY_MAX_CANDIDATES]
+    )
+    scores = []
+    for pk, candidate_signature in candidates:
+        score = minhash.similarity(signature, candidate_signature)
+        if score >= threshold:
+            scores.append((score, pk))
+    scores.sort(key=lambda match: (-match[0], match[1]))
+    scores = scores[:limit]
+    rows = queryset.defer(*INDEX_ONLY_FIELDS).in_bulk([pk for score, pk in scores])
+    return [(score, rows[pk]) for score, pk in scores if pk in rows]
+
+
+def find_scored_neighbor(detection, threshold=None):
+    """
+    Return (similarity, detection) for the fully scored detection whose logic is most similar to
+    that of `detection`, or None if none reaches `threshold` (SIMILARITY_REUSE_THRESHOLD by default).
+    """
+    threshold = settings.SIMILARITY_REUSE_THRESHOLD if threshold is None else threshold
+    fully_scored = Detection.objects.filter(**{f'{component}__isnull': False for component in COMPONENTS})
+    matches = find_similar(detection, 'logic', threshold, 1, fully_scored)
+    return matches[0] if matches else None
+
+
+def reuse_scored_neighbor(detection, threshold=None):
+    """
+    Copy the components `detection` is missing from its find_scored_neighbor, if it has one.
+    Returns {'id', 'similarity'} of the neighbor, or None. The detection is not saved.
+    """
+    if not missing_components(detection):
+        return None
+    neighbor = find_scored_neighbor(detection, threshold)
+    if not neighbor:
+        return None
+    similarity, neighbor = neighbor
+    reuse_components(detection, neighbor)
+    return {'id': neighbor.pk, 'similarity': similarity}
+
+
+def find_classified_neighbor(detection, threshold=None):
+    """
+    Return (similarity, detection) for the MITRE-classified detection whose description is most
+    similar to that of `detection`, or None if none reaches `threshold`.
+    """
+    threshold = settings.SIMILARITY_REUSE_THRESHOLD if threshold is None else threshold
+    classified = Detection.objects.exclude(mitre_tactics=[], mitre_techniques=[])
+    matches = find_similar(detection, 'description', threshold, 1, classified)
+    return matches[0] if matches else None
+
+
+def reuse_components(detection, neighbor):
+    """
+    Copy the neighbor's scores into the components of `detection` that are not set.
+    Returns the dict of copied components. The detection is not saved.
+    """
+    copied = {}
+    for component in COMPONENTS:
+        if getattr(detection, component) is None:
+            copied[component] = getattr(neighbor, component)
+            setattr(detection, component, copied[component])
+    logger.info(f"Reused {', '.join(copied) or 'no'} components of detection {neighbor.pk} for detection {detection.pk}")
+    return copied
@@ -0,0 +1,112 @@
+from django.db import connection
+
+from .attack import get_catalog
+from .models import Detection, SCORE_FIELDS, score_rank
+
+# Per-tactic and per-technique counts in one statement; COUNT(DISTINCT) guards against
+# a value that appears twice in the same detection's array
+COVERAGE_SQL = """
+    SELECT 'tactic' AS kind, mapping.value, COUNT(DISTINCT detection.id), AVG(detection.shannon_score)
+    FROM app_detection AS detection
+    CROSS JOIN LATERAL unnest(detection.mitre_tactics) AS mapping(value)
+    GROUP BY mapping.value
+    UNION ALL
+    SELECT 'technique' AS kind, mapping.value, COUNT(DISTINCT detection.id), AVG(detection.shannon_score)
+    FROM app_detection AS detection
+    CROSS JOIN LATERAL unnest(detection.mitre_techniques) AS mapping(value)
+    GROUP BY mapping.value
+    ORDER BY 1, 3 DESC, 2
+"""
+
+
+def mitre_coverage():
+    """
+    Return the number of detections and their average Shannon score per MITRE tactic and technique.
+    Techniques are stored as IDs; their catalog name is added as "name".
+    """
+    catalog = get_catalog()
+    coverage = {'tactics': [], 'techniques': []}
+    with connection.cursor() as cursor:
+        cursor.execute(COVERAGE_SQL)
+        for kind, value, count, avg_score in cursor.fetchall():
+            entry = {
+                kind: value,
+                'detections': count,
+                'avg_shannon_score': avg_score,
+            }
+            if kind == 'technique':
+                entry['name'] = catalog.technique_name(value)
+            coverage[f'{kind}s'].append(entry)
+    return coverage
+
+
+def _score_stats_sql():
+    columns = []
+    for field in SCORE_FIELDS:
+        columns.append(
+            f"COUNT({field}), AVG({field}), MIN({field}), MAX({field}), "
+            f"percentile_cont(ARRAY[0.25, 0.5, 0.75, 0.9]) WITHIN GROUP (ORDER BY {field})"
+        )
+    return f"SELECT COUNT(*), {', '.join(columns)} FROM app_detection"
+
+
+def _histogram_sql():
+    values = ', '.join(f"('{field}', {field})" for field in SCORE_FIELDS)
+    # width_bucket puts 100 (and anything out of range) in extra buckets, so clamp to 1..bins
+    return f"""
+        SELECT score.field, GREATEST(LEAST(width_bucket(score.value, 0, 100, %s), %s), 1) AS bucket, COUNT(*)
+        FROM app_detection
+        CROSS JOIN LATERAL (VALUES {values}) AS score(field, value)
+        WHERE score.value IS NOT NULL
+        GROUP BY 1, 2
+    """
+
+
+def detection_statistics(top_n=10, bins=10):
+    """
+    Return dashboard aggregates computed in the database: per-score count/mean/min/max and
+    percentiles, score histograms with `bins` buckets over 0-100, and the `top_n` highest and
+    lowest scored detections. The size of the result does not depend on the size of the table.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(_score_stats_sql())
+        row = cursor.fetchone()
+
+        cursor.execute(_histogram_sql(), [bins, bins])
+        histogram_rows = cursor.fetchall()
+
+    total, values = row[0], row[1:]
+    scores = {}
+    for index, field in enumerate(SCORE_FIELDS):
+        count, mean, minimum, maximum, percentiles = values[index * 5:index * 5 + 5]
+        p25, p50, p75, p90 = percentiles or (None, None, None, None)
+        scores[field] = {
+            'count': count,
+            'mean': mean,
+            'min': minimum,
+            'max': maximum,
+            'p25': p25,
+            'p50': p50,
+            'p75': p75,
+            'p90': p90,
+        }
+
+    width = 100 / bins
+    histograms = {field: [0] * bins for field in SCORE_FIELDS}
+    for field, bucket, count in histogram_rows:
+        histograms[field][bucket - 1] = count
+    histogram_edges = [round(index * width, 6) for index in range(bins + 1)]
+
+    # Ordered on the indexed rank expression; unscored detections rank below 0
+    ranked = Detection.objects.annotate(rank=score_rank('shannon_score')).filter(rank__gte=0)
+    top_fields = ['id', 'name', 'shannon_score', *SCORE_FIELDS[1:]]
+
+    return {
+        'total': total,
+        'scored': scores['shannon_score']['count'],
+        'scores': scores,
+        'histogram_edges': histogram_edges,
+        'histograms': histograms,
+        'top': list(ranked.order_by('-rank', '-id').values(*top_fields)[:top_n]),
+        'bottom': list(ranked.order_by('rank', 'id').values(*top_fields)[:top_n]),
+    }
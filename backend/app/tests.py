@@ -0,0 +1,557 @@
+import random
+from datetime import timedelta
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from . import minhash
+from .attack import AttackCatalog
+from .changes import START, format_cursor, parse_cursor
+from .filters import rank_field
+from .ingest import UPSERT, ingest_csv
+from .jobs import claim_item, enqueue_scoring_job, process_item
+from .llm_client import CircuitBreaker, CircuitOpenError, TokenBucket
+from .models import (
+    SCORE_FIELDS,
+    Detection,
+    DetectionChange,
+    ScoreHistory,
+    ScoringJob,
+    ScoringJobItem,
+    TableVersion,
+    compute_logic_hash,
+    score_rank,
+)
+from .pagination import DetectionCursorPagination
+from .scoring import (
+    COMBINED,
+    COMPONENTS,
+    PER_COMPONENT,
+    DetectionChangedError,
+    parse_combined_scores,
+    record_score_history,
+    score_detection,
+    stale_scores,
+)
+
+
+# ---------------------------
+# Pure logic
+# ---------------------------
+class ChangeCursorTests(SimpleTestCase):
+    def test_round_trip(self):
+        self.assertEqual(parse_cursor(format_cursor(12, 345)), (12, 345))
+
+    def test_missing_cursor_starts_from_the_beginning(self):
+        self.assertEqual(parse_cursor(None), START)
+        self.assertEqual(parse_cursor(''), START)
+
+    def test_malformed_cursors(self):
+        for value in ['abc', '1', '1-2-3', '-1-2', '1-x', '1.5-2']:
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                parse_cursor(value)
+
+
+class MinHashTests(SimpleTestCase):
+    RULE = 'process.name == "powershell.exe" and process.command_line contains "-enc" and user.name != "SYSTEM"'
+
+    def reference_signature(self, text):
+        hashes = [minhash._hash(shingle) for shingle in minhash.shingles(text)]
+        return [min((a * h + b) % minhash._PRIME for h in hashes) for a, b in minhash._PERMUTATIONS]
+
+    def test_signature_matches_the_plain_formula(self):
+        # Stored signatures must not change with the vectorized implementation
+        rng = random.Random(0)
+        words = self.RULE.split()
+        for length in [0, 1, 2, 3, 10, 100, 400]:
+            text = ' '.join(rng.choice(words) + str(rng.randint(0, 999)) for _ in range(length))
+            with self.subTest(length=length):
+                signature = minhash.signature(text)
+                self.assertEqual(signature, self.reference_signature(text))
+                self.assertEqual(len(signature), minhash.NUM_PERM)
+                self.assertTrue(all(type(value) is int and 0 <= value < minhash._PRIME for value in signature))
+
+    def test_numbers_and_case_are_ignored(self):
+        self.assertEqual(minhash.signature(self.RULE), minhash.signature(self.RULE.upper().replace('-enc', '-ENC 5')
+                                                                          .replace('5', '7')))
+
+    def test_similarity_estimates_jaccard(self):
+        base = self.RULE.split()
+        other = base[:10] + ['and', 'parent.name', '==', '"winword.exe"']
+        shingles1, shingles2 = minhash.shingles(' '.join(base)), minhash.shingles(' '.join(other))
+        jaccard = len(shingles1 & shingles2) / len(shingles1 | shingles2)
+        estimate = minhash.similarity(minhash.signature(' '.join(base)), minhash.signature(' '.join(other)))
+        self.assertAlmostEqual(estimate, jaccard, delta=0.2)
+        self.assertEqual(minhash.similarity(minhash.signature(self.RULE), minhash.signature(self.RULE)), 1.0)
+        self.assertEqual(minhash.similarity([], minhash.signature(self.RULE)), 0.0)
+
+    def test_bands(self):
+        signature = minhash.signature(self.RULE)
+        bands = minhash.bands(signature)
+        self.assertEqual(len(bands), minhash.LSH_BANDS)
+        self.assertTrue(all(-(1 << 63) <= band < (1 << 63) for band in bands))
+        self.assertEqual(bands, minhash.bands(list(signature)))
+
+
+class AttackCatalogTests(SimpleTestCase):
+    def setUp(self):
+        self.catalog = AttackCatalog(
+            [{'id': 'TA0002', 'name': 'Execution', 'shortname': 'execution'},
+             {'id': 'TA0005', 'name': 'Defense Evasion', 'shortname': 'defense-evasion'}],
+            [{'id': 'T1059', 'name': 'Command and Scripting Interpreter'},
+             {'id': 'T1059.001', 'name': 'PowerShell'},
+             {'id': 'T1027', 'name': 'Obfuscated Files or Information'}],
+        )
+
+    def test_tactics(self):
+        tactics, techniques, rejected = self.catalog.normalize(
+            ['execution', 'TA0002', 'Defense-Evasion', 'Exection', 'Persistence'], [])
+        self.assertEqual(tactics, ['Execution', 'Defense Evasion'])
+        self.assertEqual(rejected, ['Persistence'])
+
+    def test_techniques(self):
+        tactics, techniques, rejected = self.catalog.normalize([], [
+            't1059.001', 'T1059: Command and Scripting Interpreter', 'T1059.999',
+            'Command and Scripting Interpreter: PowerShell', 'Obfuscated Files or Informaton', 'T9999', 42,
+        ])
+        # Unknown sub-techniques map to their parent; duplicates are dropped in order
+        self.assertEqual(techniques, ['T1059.001', 'T1059', 'T1027'])
+        self.assertEqual(rejected, ['T9999', 42])
+
+    def test_technique_name(self):
+        self.assertEqual(self.catalog.technique_name('T1027'), 'Obfuscated Files or Information')
+        self.assertIsNone(self.catalog.technique_name('T9999'))
+
+
+class ParseCombinedScoresTests(SimpleTestCase):
+    def test_valid_scores(self):
+        content = ' {"tac": 10, "di": "20.5", "oc": 0, "irp": 100, "u": 55} \n'
+        self.assertEqual(parse_combined_scores(content, COMPONENTS),
+                         {'tac': 10.0, 'di': 20.5, 'oc': 0.0, 'irp': 100.0, 'u': 55.0})
+
+    def test_invalid_components_are_skipped(self):
+        content = '{"tac": 101, "di": -1, "oc": "high", "irp": null}'
+        with self.assertLogs('app.scoring', 'ERROR'):
+            self.assertEqual(parse_combined_scores(content, COMPONENTS), {})
+
+    def test_only_requested_components(self):
+        self.assertEqual(parse_combined_scores('{"tac": 1, "di": 2}', ['di']), {'di': 2.0})
+
+    def test_not_an_object(self):
+        with self.assertRaises(ValueError):
+            parse_combined_scores('[1, 2]', COMPONENTS)
+        with self.assertRaises(ValueError):
+            parse_combined_scores('not json', COMPONENTS)
+
+
+class TokenBucketTests(SimpleTestCase):
+    def test_burst_then_rate(self):
+        with mock.patch('app.llm_client.time.monotonic', return_value=100.0) as monotonic:
+            bucket = TokenBucket(rate=2, burst=3)
+            self.assertEqual([bucket.reserve() for _ in range(3)], [0, 0, 0])
+            # Waiting callers queue up at 1 / rate apart
+            self.assertEqual([bucket.reserve() for _ in range(2)], [0.5, 1.0])
+            # After the queue has drained and the bucket refilled, a burst is allowed again
+            monotonic.return_value = 110.0
+            self.assertEqual([bucket.reserve() for _ in range(3)], [0, 0, 0])
+
+    def test_disabled(self):
+        bucket = TokenBucket(rate=0, burst=1)
+        self.assertEqual([bucket.reserve() for _ in range(100)], [0] * 100)
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch('app.llm_client.time.monotonic', return_value=100.0)
+        self.monotonic = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+
+    def open_circuit(self):
+        with self.assertLogs('app.llm_client', 'ERROR'):
+            self.breaker.record_failure()
+            self.breaker.record_failure()
+
+    def test_opens_after_consecutive_failures(self):
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.breaker.before_call()
+        self.open_circuit()
+        self.assertTrue(self.breaker.is_open())
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_call()
+
+    def test_half_open_lets_one_trial_through(self):
+        self.open_circuit()
+        self.monotonic.return_value = 131.0
+        self.assertFalse(self.breaker.is_open())
+        self.breaker.before_call()
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        # Everyone else fails fast while the trial runs
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_call()
+        with self.assertLogs('app.llm_client', 'INFO'):
+            self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.breaker.before_call()
+
+    def test_failed_trial_reopens(self):
+        self.open_circuit()
+        self.monotonic.return_value = 131.0
+        self.breaker.before_call()
+        with self.assertLogs('app.llm_client', 'ERROR'):
+            self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(CircuitOpenError):
+            self.breaker.before_call()
+
+    def test_lost_trial_is_replaced(self):
+        # A trial that never reports back doesn't keep the circuit half-open forever
+        self.open_circuit()
+        self.monotonic.return_value = 131.0
+        self.breaker.before_call()
+        self.monotonic.return_value = 162.0
+        self.breaker.before_call()
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+
+
+# ---------------------------
+# Cursor pagination
+# ---------------------------
+class CursorPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        scores = [None, 10.0, 10.0, 50.0, None, 10.0, 90.0, 50.0]
+        Detection.objects.bulk_create([
+            Detection(name=f'rule {number % 3}', logic=f'logic {number}', description='d', shannon_score=score)
+            for number, score in enumerate(scores)
+        ])
+
+    def queryset(self):
+        return Detection.objects.annotate(**{rank_field(field): score_rank(field) for field in SCORE_FIELDS})
+
+    def walk(self, ordering, page_size=3):
+        """
+        Return the ids of every page, following the cursor of each page's last row.
+        """
+        paginator = DetectionCursorPagination()
+        paginator.ordering = ordering
+        fields = [field.lstrip('-') for field in ordering]
+        ids, position = [], None
+        while True:
+            queryset = self.queryset().order_by(*ordering)
+            if position is not None:
+                queryset = paginator._after(queryset, position)
+            page = list(queryset[:page_size])
+            ids += [detection.pk for detection in page]
+            if len(page) < page_size:
+                return ids
+            position = [getattr(page[-1], field) for field in fields]
+
+    def test_pages_match_the_full_ordering(self):
+        for ordering in [['-id'], ['id'], ['-shannon_score_rank', '-id'], ['shannon_score_rank', 'id'],
+                         ['name', 'id'], ['-name', '-id'], ['shannon_score_rank', '-id'], ['name', '-shannon_score_rank', 'id']]:
+            with self.subTest(ordering=ordering):
+                expected = list(self.queryset().order_by(*ordering).values_list('pk', flat=True))
+                self.assertEqual(self.walk(ordering), expected)
+
+    def test_same_direction_uses_a_row_comparison(self):
+        paginator = DetectionCursorPagination()
+        paginator.ordering = ['-shannon_score_rank', '-id']
+        sql = str(paginator._after(self.queryset(), [10.0, 5]).query)
+        self.assertIn('(COALESCE("app_detection"."shannon_score", -1.0), "app_detection"."id") <', sql.replace('  ', ' '))
+
+    def test_invalid_cursors(self):
+        paginator = DetectionCursorPagination()
+        paginator.ordering = ['-shannon_score_rank', '-id']
+        factory = APIRequestFactory()
+        for position in ['WyJhYmMiLCAxXQ==', 'not base64!', 'WzFd', 'WzEuNSwgIngiXQ==', 'W3RydWUsIDFd', 'W05hTiwgMV0=']:
+            request = Request(factory.get('/api/detections/', {'cursor': position}))
+            with self.subTest(position=position), self.assertRaises(NotFound):
+                paginator.decode_cursor(request)
+        request = Request(factory.get('/api/detections/', {'cursor': 'WzEwLjAsIDVd'}))
+        self.assertEqual(paginator.decode_cursor(request), [10.0, 5])
+
+
+# ---------------------------
+# Change tracking triggers (migrations 0012 and 0013)
+# ---------------------------
+class ChangeTrackingTests(TransactionTestCase):
+    """
+    The version and change-log triggers are deferred to commit, so these tests commit for real.
+    """
+    def version(self):
+        return TableVersion.current(Detection._meta.db_table)[0]
+
+    def changes(self):
+        return {change.detection_id: (change.change_seq, change.deleted) for change in DetectionChange.objects.all()}
+
+    def create(self, count):
+        with transaction.atomic():
+            Detection.objects.bulk_create([Detection(name=f'rule {i}', logic=f'logic {i}', description='d')
+                                           for i in range(count)])
+        return list(Detection.objects.order_by('id'))
+
+    def test_bulk_create_bumps_once(self):
+        before = self.version()
+        detections = self.create(3)
+        self.assertEqual(self.version(), before + 1)
+        self.assertEqual(self.changes(), {detection.pk: (before + 1, False) for detection in detections})
+
+    def test_bulk_update_bumps_once_and_sets_updated_at(self):
+        detections = self.create(3)
+        before, updated_at = self.version(), detections[0].updated_at
+        for detection in detections[:2]:
+            detection.name += ' v2'
+        with transaction.atomic():
+            Detection.objects.bulk_update(detections[:2], ['name'])
+        self.assertEqual(self.version(), before + 1)
+        changes = self.changes()
+        self.assertEqual([changes[detection.pk][0] for detection in detections], [before + 1, before + 1, before])
+        self.assertGreater(Detection.objects.get(pk=detections[0].pk).updated_at, updated_at)
+        self.assertEqual(Detection.objects.get(pk=detections[2].pk).updated_at, detections[2].updated_at)
+
+    def test_noop_update_changes_nothing(self):
+        detection = self.create(1)[0]
+        before = self.version()
+        Detection.objects.filter(pk=detection.pk).update(name=detection.name)
+        self.assertEqual(self.version(), before)
+        self.assertEqual(self.changes()[detection.pk], (before, False))
+        self.assertEqual(Detection.objects.get(pk=detection.pk).updated_at, detection.updated_at)
+
+    def test_delete_leaves_a_tombstone(self):
+        detections = self.create(3)
+        before = self.version()
+        with transaction.atomic():
+            Detection.objects.filter(pk__in=[detections[0].pk, detections[1].pk]).delete()
+        self.assertEqual(self.version(), before + 1)
+        changes = self.changes()
+        self.assertEqual(changes[detections[0].pk], (before + 1, True))
+        self.assertEqual(changes[detections[2].pk], (before, False))
+
+    def test_truncate_tombstones_everything(self):
+        detections = self.create(2)
+        before = self.version()
+        with connection.cursor() as cursor:
+            cursor.execute('TRUNCATE app_detection CASCADE')
+        self.assertEqual(self.version(), before + 1)
+        self.assertEqual(self.changes(), {detection.pk: (before + 1, True) for detection in detections})
+
+    def test_rolled_back_writes_are_not_logged(self):
+        self.create(1)
+        before, changes = self.version(), self.changes()
+        with transaction.atomic():
+            Detection.objects.create(name='gone', logic='gone', description='d')
+            transaction.set_rollback(True)
+        self.assertEqual(self.version(), before)
+        self.assertEqual(self.changes(), changes)
+
+    def test_change_feed(self):
+        client = APIClient()
+        detections = self.create(3)
+        full = client.get('/api/detections/changes/').json()
+        self.assertEqual([row['id'] for row in full['results']], [detection.pk for detection in detections])
+        self.assertFalse(full['has_more'])
+
+        Detection.objects.filter(pk=detections[0].pk).update(name='renamed')
+        Detection.objects.filter(pk=detections[1].pk).delete()
+        changes = client.get('/api/detections/changes/', {'since': full['cursor'], 'fields': 'id,name'}).json()
+        self.assertEqual(changes['results'], [{'id': detections[0].pk, 'name': 'renamed'}])
+        self.assertEqual(changes['deleted'], [detections[1].pk])
+
+        empty = client.get('/api/detections/changes/', {'since': changes['cursor']}).json()
+        self.assertEqual((empty['results'], empty['deleted'], empty['cursor']), ([], [], changes['cursor']))
+        self.assertEqual(client.get('/api/detections/changes/', {'since': 'x'}).status_code, 400)
+
+    def test_change_feed_pages(self):
+        client = APIClient()
+        detections = self.create(5)
+        ids, cursor = [], None
+        while True:
+            page = client.get('/api/detections/changes/', {'limit': 2, **({'since': cursor} if cursor else {})}).json()
+            ids += [row['id'] for row in page['results']]
+            cursor = page['cursor']
+            if not page['has_more']:
+                break
+        self.assertEqual(ids, [detection.pk for detection in detections])
+
+    def test_conditional_get(self):
+        client = APIClient()
+        detection = self.create(1)[0]
+        for url in ['/api/detections/', f'/api/detections/{detection.pk}/', '/api/shannon-score-weights/1/']:
+            with self.subTest(url=url):
+                etag = client.get(url)['ETag']
+                self.assertEqual(client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        etag = client.get('/api/detections/')['ETag']
+        Detection.objects.filter(pk=detection.pk).update(name='renamed')
+        self.assertEqual(client.get('/api/detections/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+# ---------------------------
+# CSV ingestion
+# ---------------------------
+SCORES = {'shannon_score': 50.0, 'weights_version': 1, **{component: 50.0 for component in COMPONENTS}}
+
+
+class IngestTests(TestCase):
+    def upload(self, rows, **kwargs):
+        content = 'name,logic,description\n' + ''.join(f'{name},{logic},{description}\n' for name, logic, description in rows)
+        return ingest_csv(SimpleUploadedFile('detections.csv', content.encode('utf-8')), **kwargs)
+
+    def test_create(self):
+        result = self.upload([('a', 'logic a', 'd'), ('b', 'logic b', 'd'), ('c', 'logic c', 'd')], batch_size=2)
+        self.assertEqual((result.created, result.errors), (3, []))
+        detection = Detection.objects.get(name='a')
+        self.assertTrue(detection.logic_hash and detection.logic_minhash and detection.description_bands)
+
+    def test_upsert_keeps_scores_unless_the_logic_changed(self):
+        same = Detection.objects.create(name='same', logic='logic 1', description='old', **SCORES)
+        changed = Detection.objects.create(name='changed', logic='logic 2', description='d', **SCORES)
+        untouched = Detection.objects.create(name='untouched', logic='logic 3', description='d', **SCORES)
+        result = self.upload([('same', 'logic 1', 'new'), ('changed', 'logic 2 v2', 'd'),
+                              ('untouched', 'logic 3', 'd'), ('added', 'logic 4', 'd')], mode=UPSERT, batch_size=2)
+        self.assertEqual((result.created, result.updated, result.unchanged), (1, 2, 1))
+
+        same.refresh_from_db()
+        self.assertEqual((same.description, same.shannon_score, same.tac), ('new', 50.0, 50.0))
+        changed.refresh_from_db()
+        self.assertEqual(changed.logic, 'logic 2 v2')
+        self.assertEqual(changed.logic_hash, compute_logic_hash('logic 2 v2'))
+        self.assertEqual([getattr(changed, field) for field in SCORES], [None] * len(SCORES))
+        untouched.refresh_from_db()
+        self.assertEqual(untouched.shannon_score, 50.0)
+        self.assertEqual(Detection.objects.count(), 4)
+
+    def test_upsert_on_logic_hash_renames(self):
+        detection = Detection.objects.create(name='old name', logic='logic 1', description='d', **SCORES)
+        result = self.upload([('new name', 'logic 1', 'd')], mode=UPSERT, key='logic_hash')
+        self.assertEqual((result.created, result.updated), (0, 1))
+        detection.refresh_from_db()
+        self.assertEqual((detection.name, detection.shannon_score), ('new name', 50.0))
+
+    def test_last_duplicate_row_wins(self):
+        result = self.upload([('a', 'logic 1', 'd'), ('a', 'logic 2', 'd')], mode=UPSERT)
+        self.assertEqual(result.created, 1)
+        self.assertEqual(Detection.objects.get(name='a').logic, 'logic 2')
+
+    def test_invalid_row_rolls_everything_back(self):
+        detection = Detection.objects.create(name='a', logic='logic 1', description='d', **SCORES)
+        with self.assertLogs('app.ingest', 'ERROR'):
+            result = self.upload([('a', 'logic 1 v2', 'd'), ('b', 'logic 2', ''), ('c', 'logic 3', 'd')],
+                                 mode=UPSERT, batch_size=1)
+        self.assertEqual((result.created, result.updated, result.error_count), (0, 0, 1))
+        self.assertIn('Row 3', result.errors[0])
+        detection.refresh_from_db()
+        self.assertEqual((detection.logic, detection.shannon_score), ('logic 1', 50.0))
+        self.assertEqual(Detection.objects.count(), 1)
+
+
+# ---------------------------
+# Scoring jobs and re-scoring (with the fake LLM backend)
+# ---------------------------
+@override_settings(LLM_BACKEND='fake', FAKE_LLM_LATENCY=0, FAKE_LLM_LATENCY_JITTER=0, FAKE_LLM_FAILURE_RATE=0,
+                   LLM_MAX_RETRIES=0, LLM_CACHE_ENABLED=False, SCORING_JOB_AUTOSTART=False)
+class ScoringJobTests(TestCase):
+    def setUp(self):
+        self.detections = [Detection.objects.create(name=f'rule {i}', logic=f'logic {i}', description='d')
+                           for i in range(2)]
+        self.job = enqueue_scoring_job([detection.pk for detection in self.detections])
+
+    def test_items_are_claimed_in_order_and_complete_the_job(self):
+        for detection in self.detections:
+            item = claim_item()
+            self.assertEqual((item.detection_id, item.status), (detection.pk, ScoringJobItem.RUNNING))
+            self.assertEqual(ScoringJob.objects.get(pk=self.job.pk).status, ScoringJob.RUNNING)
+            process_item(item)
+            item.refresh_from_db()
+            detection.refresh_from_db()
+            self.assertEqual(item.status, ScoringJobItem.DONE)
+            self.assertEqual(item.shannon_score, detection.shannon_score)
+            self.assertIsNotNone(detection.shannon_score)
+        self.assertIsNone(claim_item())
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, ScoringJob.COMPLETED)
+        self.assertIsNotNone(self.job.finished_at)
+        self.assertEqual(ScoreHistory.objects.filter(detection__in=self.detections).count(), 2)
+
+    def test_failed_item(self):
+        with override_settings(FAKE_LLM_FAILURE_RATE=1), self.assertLogs('app', 'ERROR'):
+            process_item(claim_item())
+        item = ScoringJobItem.objects.get(job=self.job, detection=self.detections[0])
+        self.assertEqual(item.status, ScoringJobItem.FAILED)
+        self.assertIn('Could not score components', item.error)
+        self.assertEqual(ScoringJob.objects.get(pk=self.job.pk).status, ScoringJob.RUNNING)
+
+        process_item(claim_item())
+        self.assertEqual(ScoringJob.objects.get(pk=self.job.pk).status, ScoringJob.COMPLETED)
+
+    def test_stale_running_items_are_reclaimed(self):
+        first = claim_item()
+        claim_item()
+        self.assertIsNone(claim_item())
+        ScoringJobItem.objects.filter(pk=first.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+        with self.assertLogs('app.jobs', 'WARNING'):
+            self.assertEqual(claim_item().pk, first.pk)
+        self.assertIsNone(claim_item())
+
+    def test_scores_for_changed_logic_are_discarded(self):
+        detection = self.detections[0]
+        Detection.objects.filter(pk=detection.pk).update(logic='edited', logic_hash='edited')
+        with self.assertRaises(DetectionChangedError):
+            score_detection(detection)
+        detection.refresh_from_db()
+        self.assertIsNone(detection.tac)
+
+
+@override_settings(LLM_BACKEND='fake', SCORING_JOB_AUTOSTART=False)
+class StaleScoresTests(TestCase):
+    def scored(self, name, mode=PER_COMPONENT):
+        detection = Detection.objects.create(name=name, logic=name, description='d', **SCORES)
+        record_score_history(detection, mode, model='test')
+        return detection
+
+    def test_current_scores_in_either_mode_are_not_stale(self):
+        self.scored('per component')
+        self.scored('combined', COMBINED)
+        self.assertFalse(stale_scores().exists())
+
+    def test_changed_logic_or_prompts_are_stale(self):
+        edited = self.scored('edited')
+        edited.logic = 'edited v2'
+        edited.save()
+        reprompted = self.scored('reprompted', COMBINED)
+        ScoreHistory.objects.filter(detection=reprompted).update(prompt_hash='old prompts')
+        legacy = self.scored('legacy', COMBINED)
+        ScoreHistory.objects.filter(detection=legacy).update(mode='')
+        self.assertEqual(set(stale_scores()), {edited, reprompted})
+
+    def test_unrecorded_scores_only_on_request(self):
+        unrecorded = Detection.objects.create(name='unrecorded', logic='x', description='d', **SCORES)
+        Detection.objects.create(name='unscored', logic='y', description='d')
+        self.assertFalse(stale_scores().exists())
+        self.assertEqual(list(stale_scores(include_unrecorded=True)), [unrecorded])
+
+    def test_rescore(self):
+        client = APIClient()
+        stale = self.scored('stale')
+        stale.logic = 'stale v2'
+        stale.save()
+        current = self.scored('current')
+        self.assertEqual(client.post('/api/detections/rescore/', {'dry_run': True}, format='json').json(), {'stale': 1})
+
+        response = client.post('/api/detections/rescore/', {}, format='json')
+        self.assertEqual(response.status_code, 202)
+        job = ScoringJob.objects.get(pk=response.json()['job_id'])
+        self.assertEqual(list(job.items.values_list('detection_id', flat=True)), [stale.pk])
+        stale.refresh_from_db()
+        current.refresh_from_db()
+        self.assertEqual([getattr(stale, field) for field in SCORES], [None] * len(SCORES))
+        self.assertEqual(current.shannon_score, 50.0)
@@ -3,23 +3,113 @@ from rest_framework import viewsets, status, generics
 from rest_framework.response import Response
 from rest_framework.decorators import action, permission_classes
 from rest_framework.permissions import AllowAny
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
 from django.shortcuts import get_object_or_404
 from django.core.exceptions import ValidationError
-from .models import Detection, ShannonScoreWeights
-from .serializers import DetectionSerializer, ShannonScoreWeightsSerializer
-import os
-import openai
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import transaction
+from django.db.models import Count, F, FloatField, Q
+from django.db.models.functions import Cast
+from .models import (
+    Detection,
+    ShannonScoreWeights,
+    ScoringJob,
+    TableVersion,
+    ScoringJobItem,
+    SCORE_FIELDS,
+    SEARCH_CONFIG,
+    INDEX_ONLY_FIELDS,
+    score_rank,
+)
+from .filters import DetectionFilter, DetectionOrderingFilter, rank_field
+from .pagination import DetectionCursorPagination
+from .serializers import (
+    get_requested_fields,
+    DetectionSerializer,
+    ShannonScoreWeightsSerializer,
+    ScoringJobSerializer,
+    ScoringJobItemSerializer,
+    ScoreHistorySerializer,
+)
+from .scoring import (
+    SCORING_MODES,
+    configure_backend,
+    get_weights,
+    missing_components,
+    recompute_shannon_scores,
+    score_detection,
+    stale_scores,
+    clear_scores,
+    ComponentsUnavailableError,
+    DetectionChangedError,
+)
+from .jobs import enqueue_scoring_job
+from .llm_client import CircuitOpenError
+from .mitre import (
+    build_mitre_prompt,
+    request_classification,
+    parse_classification,
+    mitre_cache_key,
+    classify_descriptions,
+)
+from .stats import mitre_coverage, detection_statistics
+from .similarity import find_similar, find_classified_neighbor, reuse_scored_neighbor
+from .changes import changes_since, format_cursor, parse_cursor
+from .export import CSV, EXPORT_FORMATS, stream_export
+from .ingest import CREATE, UPSERT, UPLOAD_MODES, UPSERT_KEYS, ingest_csv, MissingColumnsError
+from . import llm_cache
 import json
 import logging
 import csv
-from io import StringIO
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+
+def conditional_get(request, etag, last_modified, respond):
+    """
+    Answer a GET with 304 Not Modified if the client's If-None-Match / If-Modified-Since still
+    match, otherwise with respond(). Either way the response carries the validators, and clients
+    are asked to revalidate before reusing a cached copy.
+    """
+    last_modified = last_modified and int(last_modified.timestamp())
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = respond()
+    if response.status_code in (200, 304):
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ['Accept'])
+    return response
+
+
 # ---------------------------
 # DetectionViewSet
 # ---------------------------
+def parse_reuse_threshold(data, params):
+    """
+    Read the "reuse_similar" option from the request body (`data`) or query string (`params`),
+    with an optional "similarity_threshold" (SIMILARITY_REUSE_THRESHOLD by default).
+    Returns (threshold, error message); threshold is None when reuse was not requested.
+    """
+    reuse = data.get('reuse_similar', params.get('reuse_similar'))
+    if str(reuse).lower() not in ('true', '1'):
+        return None, None
+    threshold = data.get('similarity_threshold', params.get('similarity_threshold', settings.SIMILARITY_REUSE_THRESHOLD))
+    try:
+        threshold = float(threshold)
+    except (TypeError, ValueError):
+        threshold = None
+    if threshold is None or not (0 < threshold <= 1):
+        return None, "'similarity_threshold' must be a number between 0 and 1."
+    return threshold, None
+
+
 class DetectionViewSet(viewsets.ModelViewSet):
     """
     A viewset for viewing and editing Detection instances.
@@ -27,12 +117,81 @@ class DetectionViewSet(viewsets.ModelViewSet):
     queryset = Detection.objects.all()
     serializer_class = DetectionSerializer
     permission_classes = [AllowAny]
+    pagination_class = DetectionCursorPagination
+    filter_backends = [DetectionFilter, DetectionOrderingFilter]
+    ordering_fields = ['id', 'name', *SCORE_FIELDS]
+    ordering = ['-id']
+
+    def get_queryset(self):
+        """
+        Annotate the indexed score ranks used for filtering, ordering and cursor pagination,
+        and only load the columns requested with ?fields= (so lists can skip the rule text).
+        """
+        queryset = Detection.objects.annotate(**{rank_field(field): score_rank(field) for field in SCORE_FIELDS})
+        requested = get_requested_fields(self.request)
+        if requested:
+            model_fields = {field.name for field in Detection._meta.concrete_fields}
+            queryset = queryset.only(*(requested & model_fields - set(INDEX_ONLY_FIELDS) | {'id', 'updated_at'}))
+        else:
+            queryset = queryset.defer(*INDEX_ONLY_FIELDS)
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        """
+        List detections. Validated against the detection table's change counter, so an unchanged
+        page is answered with 304 without running the list query. The weights version is part of
+        the validators too, since ?stale_weights= depends on it.
+        """
+        version, changed_at = TableVersion.current(Detection._meta.db_table)
+        weights = ShannonScoreWeights.load()
+        etag = f'"detections-{version}-w{weights.version}-{request.accepted_renderer.format}"'
+        last_modified = max(filter(None, [changed_at, weights.updated_at]), default=None)
+        return conditional_get(request, etag, last_modified,
+                               lambda: super(DetectionViewSet, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Retrieve a detection, validated against its updated_at.
+        """
+        instance = self.get_object()
+        etag = f'"detection-{instance.pk}-{instance.updated_at.timestamp():.6f}-{request.accepted_renderer.format}"'
+        return conditional_get(request, etag, instance.updated_at,
+                               lambda: Response(self.get_serializer(instance).data))
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        Full-text search over name, description and logic with ?q= (web search syntax:
+        "quoted phrases", OR and -word). Results are ranked with name matches above description
+        and logic matches, and are paginated like the list; the list filters, ?ordering= and
+        ?fields= apply too.
+        """
+        q = request.query_params.get('q', '').strip()
+        if not q:
+            return Response({'error': "'q' is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+        query = SearchQuery(q, config=SEARCH_CONFIG, search_type='websearch')
+        queryset = (
+            self.get_queryset()
+            .filter(search_vector=query)
+            # ts_rank is a float4, which loses precision on its way through the cursor; compare doubles
+            .annotate(search_rank=Cast(SearchRank(F('search_vector'), query), FloatField()))
+        )
+        # Best matches first, unless ?ordering= asks for something else
+        self.ordering = ['-search_rank']
+        page = self.paginate_queryset(self.filter_queryset(queryset))
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
     @action(detail=False, methods=['post'], url_path='upload_csv')
     def upload_csv(self, request):
         """
         Handle CSV file uploads to bulk create Detection instances.
         Expected CSV Columns: name, logic, description
+        Rows are inserted in chunks of ?batch_size= (CSV_UPLOAD_BATCH_SIZE by default).
+        With ?mode=upsert (and optionally ?key=name or ?key=logic_hash), rows are merged into
+        existing detections instead of creating duplicates; detections whose logic changed
+        have their S3 components cleared so they get re-scored.
         """
         file = request.FILES.get('file')
 
@@ -45,53 +204,45 @@ class DetectionViewSet(viewsets.ModelViewSet):
             return Response({'error': 'File must be a CSV.'}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            # Decode the file. Assuming it's UTF-8 encoded.
-            decoded_file = file.read().decode('utf-8')
-            io_string = StringIO(decoded_file)
-            reader = csv.DictReader(io_string)
-
-            # Validate CSV headers
-            expected_headers = {'name', 'logic', 'description'}
-            if not expected_headers.issubset(set(reader.fieldnames)):
-                missing = expected_headers - set(reader.fieldnames)
-                logger.error(f"Missing CSV columns: {missing}")
-                return Response({'error': f'Missing columns: {", ".join(missing)}'}, status=status.HTTP_400_BAD_REQUEST)
-
-            detections_to_create = []
-            row_num = 1  # To track row number for error reporting
-            errors = []
-
-            for row in reader:
-                row_num += 1
-                name = row.get('name', '').strip()
-                logic = row.get('logic', '').strip()
-                description = row.get('description', '').strip()
-
-                # Validate required fields
-                if not name or not logic or not description:
-                    error_msg = f"Row {row_num}: 'name', 'logic', and 'description' are required."
-                    logger.error(error_msg)
-                    errors.append(error_msg)
-                    continue
-
-                # Optionally, perform more validation here (e.g., length checks)
-
-                detection = Detection(
-                    name=name,
-                    logic=logic,
-                    description=description
-                )
-                detections_to_create.append(detection)
-
-            if errors:
-                return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
-
-            # Bulk create detections
-            created_count = Detection.objects.bulk_create(detections_to_create)
-
-            logger.info(f"Successfully uploaded {len(created_count)} detections via CSV.")
-            return Response({'detail': f'Successfully uploaded {len(created_count)} detections.'}, status=status.HTTP_201_CREATED)
+            batch_size = int(request.query_params.get('batch_size') or settings.CSV_UPLOAD_BATCH_SIZE)
+            if batch_size < 1:
+                raise ValueError
+        except ValueError:
+            return Response({'error': "'batch_size' must be a positive integer."}, status=status.HTTP_400_BAD_REQUEST)
+
+        mode = request.query_params.get('mode', CREATE)
+        key = request.query_params.get('key', 'name')
+        if mode not in UPLOAD_MODES:
+            return Response({'error': f"Invalid mode. Choose one of: {', '.join(UPLOAD_MODES)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if key not in UPSERT_KEYS:
+            return Response({'error': f"Invalid key. Choose one of: {', '.join(UPSERT_KEYS)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            # Rows are decoded (as UTF-8), validated and written in batches as the file is read
+            result = ingest_csv(file, batch_size, mode, key)
+
+            if result.error_count:
+                return Response({'errors': result.errors, 'error_count': result.error_count},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+            if mode == UPSERT:
+                logger.info(f"CSV upsert: {result.created} created, {result.updated} updated, "
+                            f"{result.unchanged} unchanged.")
+                return Response({
+                    'detail': f'Successfully uploaded {result.created + result.updated + result.unchanged} detections.',
+                    'created': result.created,
+                    'updated': result.updated,
+                    'unchanged': result.unchanged,
+                }, status=status.HTTP_200_OK)
+
+            logger.info(f"Successfully uploaded {result.created} detections via CSV.")
+            return Response({'detail': f'Successfully uploaded {result.created} detections.'}, status=status.HTTP_201_CREATED)
 
+        except MissingColumnsError as e:
+            logger.error(str(e))
+            return Response({'error': f'Missing columns: {", ".join(e.missing)}'}, status=status.HTTP_400_BAD_REQUEST)
         except UnicodeDecodeError:
             logger.exception("Error decoding the uploaded CSV file.")
             return Response({'error': 'File encoding not supported. Please upload a UTF-8 encoded CSV.'}, status=status.HTTP_400_BAD_REQUEST)
@@ -106,184 +257,167 @@ class DetectionViewSet(viewsets.ModelViewSet):
     def calculate_score(self, request, pk=None):
         """
         Calculate the Shannon score for a specific Detection instance.
+        Pass "mode" ("per_component" or "combined") in the body or query string
+        to override the SCORING_MODE setting. Pass "reuse_similar": true to copy the components
+        of the most similar fully scored detection instead of asking the LLM (see get_reuse_threshold).
         """
         detection = self.get_object()
 
+        mode = request.data.get('mode') or request.query_params.get('mode') or settings.SCORING_MODE
+        if mode not in SCORING_MODES:
+            return Response({'error': f"Invalid mode. Choose one of: {', '.join(SCORING_MODES)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        threshold, error = self.get_reuse_threshold(request)
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+        reused_from = reuse_scored_neighbor(detection, threshold) if threshold is not None else None
+
         # Ensure OpenAI API key is set
-        openai_api_key = os.environ.get('OPENAI_API_KEY')
-        if not openai_api_key:
-            logger.error('OPENAI_API_KEY environment variable is not set.')
+        if missing_components(detection) and not configure_backend():
             return Response({'error': 'OPENAI_API_KEY environment variable is not set.'},
                             status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        openai.api_key = openai_api_key
-        openai.api_base = os.environ.get('OPENAI_API_BASE', 'https://api.openai.com/v1')
 
         # Get weights from ShannonScoreWeights model
-        weights = ShannonScoreWeights.objects.first()
-        if not weights:
-            logger.warning('No ShannonScoreWeights instance found. Using default weights.')
-            # Use default weights summing to 1.0
-            W1 = W2 = W3 = W4 = W5 = 0.2
-        else:
-            W1 = weights.tac_weight
-            W2 = weights.di_weight
-            W3 = weights.oc_weight
-            W4 = weights.irp_weight
-            W5 = weights.u_weight
-
-        logger.info(f"Using weights - W1(TAC): {W1}, W2(DI): {W2}, W3(OC): {W3}, W4(IRP): {W4}, W5(U): {W5}")
-
-        # Sanitize detection.logic to prevent injection attacks
-        logic_text = detection.logic.strip()
-        # Limit the length of the text to prevent excessive API usage
-        logic_text = logic_text[:1000]  # Limit to first 1000 characters
-
-        # Prompts for each component
-        prompts = {
-            'tac': f"""As a cybersecurity expert, evaluate the Technical Adversary Capability (TAC) based on the following detection logic: "{logic_text}". Provide a score between 0 and 100.""",
-            'di': f"""As a cybersecurity expert, evaluate the Detection Integrity (DI) based on the following detection logic: "{logic_text}". Provide a score between 0 and 100.""",
-            'oc': f"""As a cybersecurity expert, evaluate the Operational Complexity (OC) based on the following detection logic: "{logic_text}". Provide a score between 0 and 100.""",
-            'irp': f"""As a cybersecurity expert, evaluate the Incident Response Procedures (IRP) based on the following detection logic: "{logic_text}". Provide a score between 0 and 100.""",
-            'u': f"""As a cybersecurity expert, evaluate the Uncertainty (U) based on the following detection logic: "{logic_text}". Provide a score between 0 and 100.""",
-        }
-
-        # Function to get score from OpenAI
-        def get_score(prompt):
-            try:
-                response = openai.Completion.create(
-                    model='text-davinci-003',  # Updated from 'engine' to 'model'
-                    prompt=prompt,
-                    max_tokens=10,
-                    temperature=0
-                )
-                content = response.choices[0].text.strip()
-                # Extract the first line and try to parse it as a float
-                score_line = content.split('\n')[0]
-                score = float(score_line)
-                # Ensure score is between 0 and 100
-                if not (0 <= score <= 100):
-                    logger.error(f"Score out of bounds: {score}")
-                    score = 0
-                logger.info(f"Obtained score from OpenAI: {score}")
-                return score
-            except ValueError as ve:
-                logger.error(f"Invalid score format: {ve}")
-                return 0  # Default to 0 if parsing fails
-            except Exception as e:
-                logger.error(f"Error getting score from OpenAI: {e}")
-                return 0  # Default to 0 if error occurs
-
-        # Get scores for each component if they are not already set
-        try:
-            if detection.tac is None:
-                detection.tac = get_score(prompts['tac'])
-                logger.info(f"Calculated TAC score: {detection.tac}")
-            if detection.di is None:
-                detection.di = get_score(prompts['di'])
-                logger.info(f"Calculated DI score: {detection.di}")
-            if detection.oc is None:
-                detection.oc = get_score(prompts['oc'])
-                logger.info(f"Calculated OC score: {detection.oc}")
-            if detection.irp is None:
-                detection.irp = get_score(prompts['irp'])
-                logger.info(f"Calculated IRP score: {detection.irp}")
-            if detection.u is None:
-                detection.u = get_score(prompts['u'])
-                logger.info(f"Calculated U score: {detection.u}")
-        except Exception as e:
-            logger.error(f"Error calculating component scores: {e}")
-            return Response({'error': 'Failed to calculate component scores.', 'details': str(e)},
-                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        weights = get_weights()
+        logger.info("Using weights v{} - W1(TAC): {}, W2(DI): {}, W3(OC): {}, W4(IRP): {}, W5(U): {}".format(
+            weights.version, *weights.as_tuple()))
 
-        # Calculate the overall Shannon score
         try:
-            detection.shannon_score = (
-                W1 * detection.tac +
-                W2 * detection.di +
-                W3 * detection.oc +
-                W4 * detection.irp +
-                W5 * detection.u
-            )
-            detection.save()
-            logger.info(f"Calculated Shannon Score: {detection.shannon_score}")
+            score_detection(detection, weights, mode, reused_from)
+        except ComponentsUnavailableError as e:
+            # The components that were scored are kept; the client can retry the rest later
+            return Response({'error': 'The LLM backend is unavailable; some components could not be scored.',
+                             'missing': e.missing},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        except DetectionChangedError as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
         except Exception as e:
             logger.error(f"Error calculating Shannon score: {e}")
             return Response({'error': 'Failed to calculate Shannon score.', 'details': str(e)},
                             status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        return Response({
+        result = {
+            'mode': mode,
             'shannon_score': detection.shannon_score,
+            'weights_version': detection.weights_version,
             'tac': detection.tac,
             'di': detection.di,
             'oc': detection.oc,
             'irp': detection.irp,
             'u': detection.u
-        }, status=status.HTTP_200_OK)
+        }
+        if threshold is not None:
+            result['reused_from'] = reused_from
+        return Response(result, status=status.HTTP_200_OK)
+
+    def get_reuse_threshold(self, request):
+        """
+        Read the "reuse_similar" option of calculate_score and classify_mitre (see parse_reuse_threshold).
+        """
+        return parse_reuse_threshold(request.data, request.query_params)
+
+    @action(detail=False, methods=['post'], url_path='calculate_score', url_name='calculate-score-batch')
+    def calculate_scores(self, request):
+        """
+        Queue Shannon score calculation for many Detection instances.
+        Expected body: {"ids": [1, 2, 3]} or {"filter": {"unscored": true, "name": "powershell"}}.
+        An empty filter ({"filter": {}}) queues every detection.
+        Returns a job ID right away; poll /api/scoring-jobs/<job_id>/ for progress.
+        """
+        queryset, error = self.get_batch_queryset(request.data)
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Ensure OpenAI API key is set before queueing work that can't run
+        if not configure_backend():
+            return Response({'error': 'OPENAI_API_KEY environment variable is not set.'},
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        detection_ids = list(queryset.order_by('id').values_list('id', flat=True))
+        if not detection_ids:
+            return Response({'error': 'No detections match the request.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        job = enqueue_scoring_job(detection_ids)
+        return Response({
+            'job_id': job.pk,
+            'status': job.status,
+            'total': job.total,
+        }, status=status.HTTP_202_ACCEPTED)
+
+    def get_batch_queryset(self, data):
+        """
+        Build the queryset for a batch action from {"ids": [...]} or {"filter": {...}}.
+        Returns (queryset, error message).
+        """
+        queryset = Detection.objects.all()
+        if 'ids' in data:
+            ids = data.get('ids')
+            if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+                return None, "'ids' must be a list of integers."
+            return queryset.filter(id__in=ids), None
+
+        filters = data.get('filter')
+        if not isinstance(filters, dict):
+            return None, "Provide either 'ids' or 'filter'."
+        unknown = set(filters) - {'unscored', 'unclassified', 'name'}
+        if unknown:
+            return None, f"Unsupported filter keys: {', '.join(sorted(unknown))}"
+        if filters.get('unscored'):
+            queryset = queryset.filter(shannon_score__isnull=True)
+        if filters.get('unclassified'):
+            queryset = queryset.filter(mitre_tactics=[], mitre_techniques=[])
+        if filters.get('name'):
+            queryset = queryset.filter(name__icontains=filters['name'])
+        return queryset, None
 
     @action(detail=True, methods=['post'])
     def classify_mitre(self, request, pk=None):
         """
         Classify MITRE ATT&CK tactics and techniques based on detection description.
+        Pass "reuse_similar": true to copy the mappings of the classified detection with the
+        most similar description instead of asking the LLM (see get_reuse_threshold).
         """
         detection = self.get_object()
 
+        threshold, error = self.get_reuse_threshold(request)
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+        neighbor = find_classified_neighbor(detection, threshold) if threshold is not None else None
+
         # Ensure OpenAI API key is set
-        openai_api_key = os.environ.get('OPENAI_API_KEY')
-        if not openai_api_key:
-            logger.error('OPENAI_API_KEY environment variable is not set.')
+        if neighbor is None and not configure_backend():
             return Response({'error': 'OPENAI_API_KEY environment variable is not set.'},
                             status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        openai.api_key = openai_api_key
-        openai.api_base = os.environ.get('OPENAI_API_BASE', 'https://api.openai.com/v1')
 
         # Sanitize detection.description
         description_text = detection.description.strip()
         # Limit the length of the text
         description_text = description_text[:1000]  # Limit to first 1000 characters
 
-        # Prompt for classification
-        prompt = f"""
-You are a cybersecurity expert familiar with the MITRE ATT&CK framework. Based on the following detection description, identify the relevant MITRE ATT&CK Tactics and Techniques.
-
-Detection Description:
-"{description_text}"
-
-Provide your answer in the following JSON format:
-{{
-    "tactics": ["List of tactic names"],
-    "techniques": ["List of technique IDs and names in the format 'T####: Technique Name'"]
-}}
-
-Only include tactics and techniques that are directly relevant to the detection description.
-"""
-
-        try:
-            response = openai.Completion.create(
-                model='text-davinci-003',  # Updated from 'engine' to 'model'
-                prompt=prompt,
-                max_tokens=500,
-                temperature=0
-            )
-            content = response.choices[0].text.strip()
+        # Reuse the classification of identical descriptions
+        cache_key = mitre_cache_key(description_text)
+        cached = llm_cache.get(cache_key) if neighbor is None else None
+        if neighbor is not None:
+            similarity, neighbor = neighbor
+            tactics, techniques = neighbor.mitre_tactics, neighbor.mitre_techniques
+            logger.info(f"Reusing MITRE classification of detection {neighbor.pk} for detection {detection.pk}")
+        elif cached is not None:
+            tactics, techniques = cached['tactics'], cached['techniques']
+            logger.info(f"Using cached MITRE classification for detection {detection.pk}")
+        else:
+            try:
+                content = request_classification(build_mitre_prompt(description_text))
+            except CircuitOpenError as e:
+                return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            except Exception as e:
+                logger.error(f"Error classifying MITRE: {e}")
+                return Response({'error': 'Failed to classify MITRE mappings.', 'details': str(e)},
+                                status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
             # Parse the JSON response
             try:
-                mitre_data = json.loads(content)
-                # Validate that the data is in the expected format
-                tactics = mitre_data.get('tactics', [])
-                techniques = mitre_data.get('techniques', [])
-                if not isinstance(tactics, list) or not isinstance(techniques, list):
-                    raise ValueError("Invalid format for tactics or techniques.")
-
-                detection.mitre_tactics = tactics
-                detection.mitre_techniques = techniques
-                detection.save()
-                logger.info(f"Classified MITRE Tactics: {tactics}")
-                logger.info(f"Classified MITRE Techniques: {techniques}")
-                return Response({
-                    'mitre_tactics': detection.mitre_tactics,
-                    'mitre_techniques': detection.mitre_techniques
-                }, status=status.HTTP_200_OK)
+                tactics, techniques = parse_classification(content)
             except json.JSONDecodeError as e:
                 logger.error(f"JSON parsing error: {e}")
                 return Response({'error': 'Failed to parse MITRE ATT&CK classification response.',
@@ -295,11 +429,282 @@ Only include tactics and techniques that are directly relevant to the detection
                 logger.error(f"Error processing MITRE data: {e}")
                 return Response({'error': 'Invalid data format received from OpenAI.', 'details': str(e)},
                                 status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            llm_cache.set(cache_key, 'mitre', {'tactics': tactics, 'techniques': techniques})
 
+        try:
+            detection.mitre_tactics = tactics
+            detection.mitre_techniques = techniques
+            # Only the classification, so edits made while the LLM was answering are kept
+            detection.save(update_fields=['mitre_tactics', 'mitre_techniques'])
         except Exception as e:
-            logger.error(f"Error classifying MITRE: {e}")
+            logger.error(f"Error saving MITRE classification: {e}")
             return Response({'error': 'Failed to classify MITRE mappings.', 'details': str(e)},
                             status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        logger.info(f"Classified MITRE Tactics: {tactics}")
+        logger.info(f"Classified MITRE Techniques: {techniques}")
+        result = {
+            'mitre_tactics': detection.mitre_tactics,
+            'mitre_techniques': detection.mitre_techniques
+        }
+        if threshold is not None:
+            result['reused_from'] = {'id': neighbor.pk, 'similarity': similarity} if neighbor else None
+        return Response(result, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        """
+        Return the detections most similar to this one, by MinHash similarity of their logic
+        (or ?field=description). Use ?threshold=<0-1> (default SIMILARITY_THRESHOLD) and ?limit=<n>.
+        """
+        detection = self.get_object()
+        field = request.query_params.get('field', 'logic')
+        try:
+            threshold = float(request.query_params.get('threshold', settings.SIMILARITY_THRESHOLD))
+            limit = int(request.query_params.get('limit', settings.SIMILARITY_MAX_RESULTS))
+            if not (0 < threshold <= 1 and 1 <= limit <= settings.SIMILARITY_MAX_RESULTS):
+                raise ValueError
+        except ValueError:
+            return Response({'error': f"'threshold' must be between 0 and 1 and 'limit' between 1 and "
+                                      f"{settings.SIMILARITY_MAX_RESULTS}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            matches = find_similar(detection, field, threshold, limit)
+        except ValueError as ve:
+            return Response({'error': str(ve)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response([
+            {
+                'id': match.pk,
+                'name': match.name,
+                'similarity': similarity,
+                'shannon_score': match.shannon_score,
+                'mitre_tactics': match.mitre_tactics,
+            }
+            for similarity, match in matches
+        ], status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['post'], url_path='classify_mitre', url_name='classify-mitre-batch')
+    def classify_mitre_batch(self, request):
+        """
+        Classify MITRE ATT&CK mappings for many Detection instances, several per LLM request.
+        Expected body: {"ids": [1, 2, 3]} or {"filter": {"unclassified": true, "name": "powershell"}}.
+        Results are written in one bulk update; detections that could not be classified are
+        listed under "failed" and left unchanged. The LLM calls run inside the request, so at most
+        MITRE_BATCH_MAX_DETECTIONS detections are accepted; larger selections get a 400.
+        """
+        queryset, error = self.get_batch_queryset(request.data)
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Ensure OpenAI API key is set
+        if not configure_backend():
+            return Response({'error': 'OPENAI_API_KEY environment variable is not set.'},
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        limit = settings.MITRE_BATCH_MAX_DETECTIONS
+        detections = list(queryset.only('id', 'description').order_by('id')[:limit + 1])
+        if not detections:
+            return Response({'error': 'No detections match the request.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(detections) > limit:
+            return Response({'error': f'Too many detections; classify at most {limit} per request.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        # Same sanitizing and length limit as the single-detection action
+        descriptions = {detection.pk: detection.description.strip()[:1000] for detection in detections}
+        results, errors = classify_descriptions(descriptions)
+
+        classified = []
+        for detection in detections:
+            if detection.pk in results:
+                detection.mitre_tactics, detection.mitre_techniques = results[detection.pk]
+                classified.append(detection)
+        try:
+            Detection.objects.bulk_update(classified, ['mitre_tactics', 'mitre_techniques'], batch_size=1000)
+        except Exception as e:
+            logger.error(f"Error saving MITRE classifications: {e}")
+            return Response({'error': 'Failed to save MITRE classifications.', 'details': str(e)},
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        logger.info(f"Classified {len(classified)} detections; {len(errors)} failed.")
+        return Response({
+            'classified': len(classified),
+            'failed': [{'id': detection_id, 'error': error} for detection_id, error in sorted(errors.items())],
+        }, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['post'])
+    def recompute_scores(self, request):
+        """
+        Recompute the Shannon score of every fully scored detection with the current weights.
+        Uses the stored components only; no OpenAI calls are made.
+        """
+        try:
+            updated = recompute_shannon_scores()
+        except Exception as e:
+            logger.error(f"Error recomputing Shannon scores: {e}")
+            return Response({'error': 'Failed to recompute Shannon scores.', 'details': str(e)},
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response({'detail': f'Recomputed {updated} Shannon scores.', 'updated': updated},
+                        status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['post'])
+    def rescore(self, request):
+        """
+        Re-score the detections whose logic or scoring prompts changed since they were last scored
+        (see stale_scores). Their scores are cleared and a scoring job is queued for them.
+        Body: {"include_unrecorded": false, "dry_run": false}; dry_run only counts them.
+        """
+        include_unrecorded = str(request.data.get('include_unrecorded')).lower() in ('true', '1')
+        queryset = stale_scores(include_unrecorded=include_unrecorded)
+        if str(request.data.get('dry_run')).lower() in ('true', '1'):
+            return Response({'stale': queryset.count()}, status=status.HTTP_200_OK)
+
+        # Ensure OpenAI API key is set before clearing scores that can't be recalculated
+        if not configure_backend():
+            return Response({'error': 'OPENAI_API_KEY environment variable is not set.'},
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        with transaction.atomic():
+            detection_ids = list(queryset.order_by('id').values_list('id', flat=True))
+            if not detection_ids:
+                return Response({'detail': 'No detections need re-scoring.', 'stale': 0}, status=status.HTTP_200_OK)
+            clear_scores(Detection.objects.filter(id__in=detection_ids))
+            job = enqueue_scoring_job(detection_ids)
+        return Response({
+            'job_id': job.pk,
+            'status': job.status,
+            'total': job.total,
+        }, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=['get'])
+    def score_history(self, request, pk=None):
+        """
+        Return the scoring history of a detection, newest first.
+        """
+        detection = self.get_object()
+        history = detection.score_history.order_by('-id')
+        return Response(ScoreHistorySerializer(history, many=True).data, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'])
+    def coverage(self, request):
+        """
+        Return per-tactic and per-technique detection counts and average Shannon scores.
+        """
+        try:
+            return Response(mitre_coverage(), status=status.HTTP_200_OK)
+        except Exception as e:
+            logger.error(f"Error computing MITRE coverage: {e}")
+            return Response({'error': 'Failed to compute MITRE coverage.', 'details': str(e)},
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    @action(detail=False, methods=['get'])
+    def statistics(self, request):
+        """
+        Return precomputed dashboard aggregates: per-score mean and percentiles, score histograms,
+        and the top/bottom detections. Use ?top=<n> (default 10) and ?bins=<n> (default 10).
+        """
+        try:
+            top_n = int(request.query_params.get('top', 10))
+            bins = int(request.query_params.get('bins', 10))
+            if not (1 <= top_n <= 100 and 1 <= bins <= 100):
+                raise ValueError
+        except ValueError:
+            return Response({'error': "'top' and 'bins' must be integers between 1 and 100."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            return Response(detection_statistics(top_n, bins), status=status.HTTP_200_OK)
+        except Exception as e:
+            logger.error(f"Error computing detection statistics: {e}")
+            return Response({'error': 'Failed to compute detection statistics.', 'details': str(e)},
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Stream every detection (or those matching the list filters) as ?output=csv (default)
+        or ?output=ndjson, with scores and MITRE mappings. CSV exports can be re-uploaded
+        with upload_csv. Rows are read from a server-side cursor, so memory use stays flat.
+        """
+        export_format = request.query_params.get('output', CSV)
+        if export_format not in EXPORT_FORMATS:
+            return Response({'error': f"Invalid output. Choose one of: {', '.join(EXPORT_FORMATS)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        response = StreamingHttpResponse(stream_export(queryset, export_format),
+                                         content_type=EXPORT_FORMATS[export_format])
+        response['Content-Disposition'] = f'attachment; filename="detections.{export_format}"'
+        return response
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """
+        Return the detections created or modified since ?since=<cursor> and the IDs of those deleted
+        since, in commit order. Store the returned cursor and pass it as ?since= on the next sync;
+        has_more means more changes can be fetched right away. Without ?since= the feed starts
+        from the beginning (a full sync). Use ?limit=<n> and ?fields= as on the list.
+        """
+        try:
+            cursor = parse_cursor(request.query_params.get('since'))
+        except ValueError:
+            return Response({'error': "'since' must be a cursor returned by this endpoint."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = int(request.query_params.get('limit', settings.CHANGE_FEED_PAGE_SIZE))
+            if not 1 <= limit <= settings.CHANGE_FEED_MAX_PAGE_SIZE:
+                raise ValueError
+        except ValueError:
+            return Response({'error': f"'limit' must be an integer between 1 and {settings.CHANGE_FEED_MAX_PAGE_SIZE}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        changes, has_more = changes_since(cursor, limit)
+        live_ids = [change.detection_id for change in changes if not change.deleted]
+        detections = self.get_queryset().in_bulk(live_ids)
+        # A detection deleted since its change was read has a tombstone further down the feed
+        results = [detections[pk] for pk in live_ids if pk in detections]
+        if changes:
+            cursor = (changes[-1].change_seq, changes[-1].detection_id)
+        return Response({
+            'results': self.get_serializer(results, many=True).data,
+            'deleted': [change.detection_id for change in changes if change.deleted],
+            'cursor': format_cursor(*cursor),
+            'has_more': has_more,
+        }, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'])
+    def cache_stats(self, request):
+        """
+        Return hit/miss counters and the size of the LLM response cache.
+        """
+        return Response(llm_cache.stats(), status=status.HTTP_200_OK)
+
+# ---------------------------
+# ScoringJobViewSet
+# ---------------------------
+class ScoringJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    A read-only viewset for polling the progress and results of batch scoring jobs.
+    """
+    serializer_class = ScoringJobSerializer
+    permission_classes = [AllowAny]
+
+    def get_queryset(self):
+        # Count item statuses in the same query as the job
+        return ScoringJob.objects.annotate(
+            queued=Count('items', filter=Q(items__status=ScoringJobItem.QUEUED)),
+            running=Count('items', filter=Q(items__status=ScoringJobItem.RUNNING)),
+            done=Count('items', filter=Q(items__status=ScoringJobItem.DONE)),
+            failed=Count('items', filter=Q(items__status=ScoringJobItem.FAILED)),
+        ).order_by('-id')
+
+    @action(detail=True, methods=['get'])
+    def results(self, request, pk=None):
+        """
+        Return the per-detection outcome of a scoring job.
+        """
+        job = get_object_or_404(ScoringJob, pk=pk)
+        items = job.items.order_by('id')
+        serializer = ScoringJobItemSerializer(items, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
 
 # ---------------------------
 # ShannonScoreWeightsDetail View
@@ -315,10 +720,22 @@ class ShannonScoreWeightsDetail(generics.RetrieveUpdateAPIView):
         """
         Retrieve the singleton instance of ShannonScoreWeights.
         If it doesn't exist, create it with default values.
+        Reads are served from the weights cache; updates work on a fresh copy from the database.
         """
+        if self.request.method in ('GET', 'HEAD', 'OPTIONS'):
+            return ShannonScoreWeights.load()
         obj, created = ShannonScoreWeights.objects.get_or_create(id=1)
         return obj
 
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Return the weights, validated against their updated_at.
+        """
+        instance = self.get_object()
+        etag = f'"weights-{instance.updated_at.timestamp():.6f}-{request.accepted_renderer.format}"'
+        return conditional_get(request, etag, instance.updated_at,
+                               lambda: Response(self.get_serializer(instance).data))
+
     def update(self, request, *args, **kwargs):
         """
         Override the update method to ensure that the sum of all weights equals 1.0.
@@ -345,6 +762,13 @@ class ShannonScoreWeightsDetail(generics.RetrieveUpdateAPIView):
 
         self.perform_update(serializer)
         logger.info(f"Updated Shannon Score Weights: {serializer.data}")
+
+        # Stored scores were calculated with the old weights
+        if settings.RECOMPUTE_SCORES_ON_WEIGHT_UPDATE:
+            try:
+                recompute_shannon_scores()
+            except Exception as e:
+                logger.error(f"Error recomputing Shannon scores after weight update: {e}")
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
@@ -2,15 +2,22 @@ import os
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
-SECRET_KEY = 'your secret key here'  # Replace with your actual secret key
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', 'your secret key here')  # Replace with your actual secret key
 
-DEBUG = True
+# Settings profile: 'development' (the default) or 'production', which turns off DEBUG, keeps
+# database connections open, renders JSON with orjson and is refused at startup if a known slow
+# setting is overridden back in (see app/checks.py)
+PROFILE = os.environ.get('DJANGO_PROFILE', 'development')
+PRODUCTION = PROFILE == 'production'
+
+# DEBUG keeps every SQL query in memory, so it is off in production
+DEBUG = os.environ.get('DJANGO_DEBUG', str(not PRODUCTION)).lower() == 'true'
 
 ROOT_URLCONF = 'project.urls'
 
 CORS_ALLOW_ALL_ORIGINS = True
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = [host.strip() for host in os.environ.get('DJANGO_ALLOWED_HOSTS', '').split(',') if host.strip()]
 
 # Installed apps
 INSTALLED_APPS = [
@@ -21,6 +28,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     # Third-party apps
     'rest_framework',
@@ -32,6 +40,8 @@ INSTALLED_APPS = [
 
 # Middleware
 MIDDLEWARE = [
+    'app.metrics.MetricsMiddleware',  # First, so it times the whole request
+    'app.middleware.CompressionMiddleware',  # Before anything that reads or changes the response body
     'corsheaders.middleware.CorsMiddleware',  # If using CORS headers
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',  # Must be before AuthenticationMiddleware
@@ -64,14 +74,38 @@ TEMPLATES = [
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
-        'NAME': 'detections_db',
-        'USER': 'postgres',
-        'PASSWORD': 'postgres',
-        'HOST': 'db',  # Change 'db' to 'localhost'
-        'PORT': '5432',
+        'NAME': os.environ.get('DB_NAME', 'detections_db'),
+        'USER': os.environ.get('DB_USER', 'postgres'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', 'postgres'),
+        'HOST': os.environ.get('DB_HOST', 'db'),  # Change 'db' to 'localhost'
+        'PORT': os.environ.get('DB_PORT', '5432'),
+        # Seconds a connection is reused across requests (0 opens one per request). In production
+        # point HOST at a pooler such as PgBouncer when running many workers.
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 300 if PRODUCTION else 0)),
+        # Set DB_TRANSACTION_POOLING=true behind a transaction-mode pooler, where a server-side
+        # cursor can't outlive its transaction. Exports then read one keyset query per
+        # EXPORT_CHUNK_SIZE rows: memory stays flat, but an export is no longer one snapshot.
+        'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('DB_TRANSACTION_POOLING', 'false').lower() == 'true',
     }
 }
 
+# Cache used for the Shannon score weights. Without MEMCACHED_LOCATION each process has its own
+# in-memory cache (see WEIGHTS_CACHE_TIMEOUT); with it (e.g. "memcached:11211") all processes share it.
+if os.environ.get('MEMCACHED_LOCATION'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': os.environ['MEMCACHED_LOCATION'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'detections',
+        }
+    }
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -85,8 +119,124 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'app.renderers.TimedJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
+if PRODUCTION:
+    # orjson is several times faster than the json module; the browsable API is left out
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] = ['app.renderers.OrjsonRenderer']
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'] = [
+        'app.parsers.OrjsonParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',  # CSV uploads
+    ]
+
+# Response compression (gzip, or brotli when the brotli package is installed and the client
+# accepts it) for responses of at least this many bytes, e.g. detection list pages
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+# Brotli quality (0-11); 4-5 compresses about as fast as gzip and smaller
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 5))
 
 STATIC_URL = '/static/'
 
+# Detection list pagination
+DETECTION_PAGE_SIZE = int(os.environ.get('DETECTION_PAGE_SIZE', 100))
+DETECTION_MAX_PAGE_SIZE = int(os.environ.get('DETECTION_MAX_PAGE_SIZE', 1000))
+
+# Detection change feed (detections/changes/): entries per page, by default and at most
+CHANGE_FEED_PAGE_SIZE = int(os.environ.get('CHANGE_FEED_PAGE_SIZE', 500))
+CHANGE_FEED_MAX_PAGE_SIZE = int(os.environ.get('CHANGE_FEED_MAX_PAGE_SIZE', 5000))
+
+# CSV upload settings
+# Number of rows inserted per bulk_create call
+CSV_UPLOAD_BATCH_SIZE = int(os.environ.get('CSV_UPLOAD_BATCH_SIZE', 1000))
+# Maximum number of row errors returned for a rejected upload
+CSV_UPLOAD_MAX_ERRORS = int(os.environ.get('CSV_UPLOAD_MAX_ERRORS', 1000))
+
+# Export settings
+# Number of rows fetched from the server-side cursor at a time when streaming an export
+EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', 2000))
+
+# LLM backend used for scoring and MITRE classification: 'openai', 'fake' (a local stand-in with
+# deterministic answers, for load tests and benchmarks) or the dotted path of a CompletionBackend class
+LLM_BACKEND = os.environ.get('LLM_BACKEND', 'openai')
+# Fake backend: base latency (seconds), mean of the extra exponentially distributed latency,
+# probability of a failed call and random seed (unset for a different sequence on every run)
+FAKE_LLM_LATENCY = float(os.environ.get('FAKE_LLM_LATENCY', 0.5))
+FAKE_LLM_LATENCY_JITTER = float(os.environ.get('FAKE_LLM_LATENCY_JITTER', 0.25))
+FAKE_LLM_FAILURE_RATE = float(os.environ.get('FAKE_LLM_FAILURE_RATE', 0))
+FAKE_LLM_SEED = int(os.environ['FAKE_LLM_SEED']) if os.environ.get('FAKE_LLM_SEED') else None
+
+# LLM call limits, shared by all threads and async requests of a process (so divide the provider's
+# quota by the number of processes). A rate of 0 disables rate limiting.
+LLM_RATE_LIMIT_PER_MINUTE = float(os.environ.get('LLM_RATE_LIMIT_PER_MINUTE', 3000))
+# Number of calls that can be made at once before the rate limit applies
+LLM_RATE_LIMIT_BURST = int(os.environ.get('LLM_RATE_LIMIT_BURST', 20))
+# Retries of a failed call, with exponential backoff (random "full jitter" delays up to the max)
+LLM_MAX_RETRIES = int(os.environ.get('LLM_MAX_RETRIES', 3))
+LLM_RETRY_BASE_DELAY = float(os.environ.get('LLM_RETRY_BASE_DELAY', 0.5))
+LLM_RETRY_MAX_DELAY = float(os.environ.get('LLM_RETRY_MAX_DELAY', 8))
+# Consecutive failed calls after which calls fail fast, and seconds before trying the backend again
+LLM_CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get('LLM_CIRCUIT_FAILURE_THRESHOLD', 10))
+LLM_CIRCUIT_RESET_TIMEOUT = float(os.environ.get('LLM_CIRCUIT_RESET_TIMEOUT', 30))
+
+# Scoring settings
+# Maximum number of component prompts sent to OpenAI at the same time for one detection
+SCORING_MAX_CONCURRENCY = int(os.environ.get('SCORING_MAX_CONCURRENCY', 5))
+# Timeout (in seconds) for a single OpenAI call
+SCORING_CALL_TIMEOUT = float(os.environ.get('SCORING_CALL_TIMEOUT', 30))
+# 'per_component' sends one prompt per S3 component, 'combined' asks for all of them in one prompt
+SCORING_MODE = os.environ.get('SCORING_MODE', 'per_component')
+# Maximum number of open OpenAI connections shared by all requests to the async endpoints (per process)
+ASYNC_HTTP_POOL_SIZE = int(os.environ.get('ASYNC_HTTP_POOL_SIZE', 100))
+# Seconds the ShannonScoreWeights singleton is cached. Saves invalidate the cache of the process
+# that saved; with a per-process cache backend other workers pick up changes after this timeout.
+WEIGHTS_CACHE_TIMEOUT = int(os.environ.get('WEIGHTS_CACHE_TIMEOUT', 60))
+# Recompute stored Shannon scores (one UPDATE, no OpenAI calls) whenever the weights change
+RECOMPUTE_SCORES_ON_WEIGHT_UPDATE = os.environ.get('RECOMPUTE_SCORES_ON_WEIGHT_UPDATE', 'true').lower() == 'true'
+
+# Near-duplicate detection (MinHash similarity of logic/description)
+# Default minimum similarity (0-1) for the similar-detections endpoint, and its maximum number of results
+SIMILARITY_THRESHOLD = float(os.environ.get('SIMILARITY_THRESHOLD', 0.5))
+SIMILARITY_MAX_RESULTS = int(os.environ.get('SIMILARITY_MAX_RESULTS', 50))
+# Maximum number of LSH candidates compared per lookup
+SIMILARITY_MAX_CANDIDATES = int(os.environ.get('SIMILARITY_MAX_CANDIDATES', 2000))
+# Default minimum similarity for reusing a neighbor's scores or MITRE mappings ("reuse_similar")
+SIMILARITY_REUSE_THRESHOLD = float(os.environ.get('SIMILARITY_REUSE_THRESHOLD', 0.9))
+
+# MITRE ATT&CK catalog used to validate and normalize classifications: the bundled tactics and
+# techniques, or a STIX bundle such as enterprise-attack.json from https://github.com/mitre/cti
+# (which also has the sub-techniques)
+MITRE_ATTACK_CATALOG = os.environ.get('MITRE_ATTACK_CATALOG', os.path.join(BASE_DIR, 'app', 'data', 'attack_catalog.json'))
+
+# Bulk MITRE classification
+# Descriptions per classification prompt, and completion tokens allowed per description
+MITRE_BATCH_SIZE = int(os.environ.get('MITRE_BATCH_SIZE', 5))
+MITRE_BATCH_ITEM_TOKENS = int(os.environ.get('MITRE_BATCH_ITEM_TOKENS', 250))
+# Maximum number of batch prompts sent at the same time
+MITRE_BATCH_CONCURRENCY = int(os.environ.get('MITRE_BATCH_CONCURRENCY', 8))
+# Maximum number of detections per classify_mitre batch request, which is answered synchronously;
+# larger selections are rejected and must be split by the client
+MITRE_BATCH_MAX_DETECTIONS = int(os.environ.get('MITRE_BATCH_MAX_DETECTIONS', 200))
+
+# LLM response cache
+LLM_CACHE_ENABLED = os.environ.get('LLM_CACHE_ENABLED', 'true').lower() == 'true'
+# Seconds before a cached score or classification expires (default: 30 days)
+LLM_CACHE_TTL = int(os.environ.get('LLM_CACHE_TTL', 30 * 24 * 3600))
+# Maximum number of cached entries; the least recently used ones are evicted first
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get('LLM_CACHE_MAX_ENTRIES', 100000))
+# Run eviction every N cache writes
+LLM_CACHE_EVICT_INTERVAL = int(os.environ.get('LLM_CACHE_EVICT_INTERVAL', 500))
+
+# Batch scoring jobs
+# Number of worker threads per process that drain the scoring queue
+SCORING_JOB_WORKERS = int(os.environ.get('SCORING_JOB_WORKERS', 4))
+# Start the worker threads in the web process when a job is queued
+# (set to False when running `manage.py process_scoring_jobs` separately)
+SCORING_JOB_AUTOSTART = os.environ.get('SCORING_JOB_AUTOSTART', 'true').lower() == 'true'
+# Seconds after which a running item is considered abandoned and reclaimed by the workers
+SCORING_JOB_STALE_AFTER = int(os.environ.get('SCORING_JOB_STALE_AFTER', 600))
+
 # ... rest of your settings ...
\ No newline at end of file
@@ -1,13 +1,21 @@
 from django.urls import include, path
 from rest_framework import routers
-from app.views import DetectionViewSet, ShannonScoreWeightsDetail
+from app.views import DetectionViewSet, ScoringJobViewSet, ShannonScoreWeightsDetail
+from app import async_views
+from app.metrics import metrics_view
 
 router = routers.DefaultRouter()
 router.register(r'detections', DetectionViewSet, basename='detection')
+router.register(r'scoring-jobs', ScoringJobViewSet, basename='scoringjob')
 # router.register(r'shannon-score-weights', ShannonScoreWeightsViewSet, basename='shannonscoreweights') # trying something else
 
 urlpatterns = [
     # path('admin/', admin.site.urls),
     path('api/', include(router.urls)),
     path('api/shannon-score-weights/<int:pk>/', ShannonScoreWeightsDetail.as_view(), name='shannon-score-weights-detail'),
+    # Async (ASGI) versions of the endpoints that wait on OpenAI
+    path('api/async/detections/<int:pk>/calculate_score/', async_views.calculate_score, name='async-calculate-score'),
+    path('api/async/detections/<int:pk>/classify_mitre/', async_views.classify_mitre, name='async-classify-mitre'),
+    # Prometheus metrics of this process
+    path('metrics', metrics_view, name='metrics'),
 ]
\ No newline at end of file
@@ -1,5 +1,5 @@
 import React, { useEffect, useState } from 'react';
-import { getDetections } from '../utils/api';
+import { getDetections, getDetectionsPage, getDetectionStatistics, searchDetections } from '../utils/api';
 import {
     Radar,
     RadarChart,
@@ -9,23 +9,54 @@ import {
     Tooltip,
   } from 'recharts';
 import { Link } from 'react-router-dom';
-import { Typography, Box, List, ListItem, ListItemText, Button } from '@mui/material';
+import { Typography, Box, List, ListItem, ListItemText, Button, TextField } from '@mui/material';
+
+// Only the columns the list needs, so the rule text isn't downloaded
+const LIST_FIELDS = 'id,name,shannon_score';
+
+// Number of top-scored detections shown on the radar chart
+const RADAR_TOP_N = 10;
 
 function DetectionList() {
   const [detections, setDetections] = useState([]);
+  const [nextPage, setNextPage] = useState(null);
+  const [topDetections, setTopDetections] = useState([]);
+  const [query, setQuery] = useState('');
 
   useEffect(() => {
     fetchDetections();
+    fetchTopDetections();
   }, []);
 
-  const fetchDetections = () => {
-    getDetections()
-      .then((res) => setDetections(res.data))
+  const fetchTopDetections = () => {
+    getDetectionStatistics({ top: RADAR_TOP_N })
+      .then((res) => setTopDetections(res.data.top))
+      .catch((err) => console.error(err));
+  };
+
+  const fetchDetections = (search = '') => {
+    const request = search
+      ? searchDetections({ q: search, fields: LIST_FIELDS })
+      : getDetections({ fields: LIST_FIELDS });
+    request
+      .then((res) => {
+        setDetections(res.data.results);
+        setNextPage(res.data.next);
+      })
       .catch((err) => console.error(err));
   };
 
-  // Prepare data for radar chart
-  const radarData = detections.map((detection) => ({
+  const fetchMore = () => {
+    getDetectionsPage(nextPage)
+      .then((res) => {
+        setDetections((current) => [...current, ...res.data.results]);
+        setNextPage(res.data.next);
+      })
+      .catch((err) => console.error(err));
+  };
+
+  // Prepare data for radar chart (top-scored detections only, so it stays readable)
+  const radarData = topDetections.map((detection) => ({
     name: detection.name,
     TAC: detection.tac || 0,
     DI: detection.di || 0,
@@ -52,6 +83,22 @@ function DetectionList() {
         <Radar name="U" dataKey="U" stroke="#d0ed57" fill="#d0ed57" fillOpacity={0.6} />
       </RadarChart>
 
+      <Box
+        component="form"
+        onSubmit={(e) => {
+          e.preventDefault();
+          fetchDetections(query.trim());
+        }}
+      >
+        <TextField
+          label="Search name, description and logic"
+          value={query}
+          onChange={(e) => setQuery(e.target.value)}
+          fullWidth
+          margin="normal"
+        />
+      </Box>
+
       <List>
         {detections.map((detection) => (
           <ListItem key={detection.id}>
@@ -62,6 +109,11 @@ function DetectionList() {
           </ListItem>
         ))}
       </List>
+      {nextPage && (
+        <Button variant="outlined" onClick={fetchMore}>
+          Load more
+        </Button>
+      )}
     </Box>
   );
 }
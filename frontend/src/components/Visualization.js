@@ -1,33 +1,54 @@
 import React, { useState, useEffect } from 'react';
-import { getDetections } from '../utils/api';
-import { Radar } from 'react-chartjs-2';
+import { getDetectionStatistics } from '../utils/api';
+import { Radar, Bar } from 'react-chartjs-2';
 import 'chart.js/auto';
 import { Typography, Box } from '@mui/material';
 
+const COMPONENTS = ['tac', 'di', 'oc', 'irp', 'u'];
+
+// Number of top-scored detections drawn next to the library averages
+const TOP_N = 5;
+
+const color = (index, alpha) =>
+  `rgba(${(index * 50) % 255}, ${(index * 80) % 255}, ${(index * 110) % 255}, ${alpha})`;
+
 function Visualization() {
   const [chartData, setChartData] = useState({});
+  const [histogramData, setHistogramData] = useState({});
 
   useEffect(() => {
-    getDetections()
+    // The aggregates are computed server-side, so the payload stays small however big the library is
+    getDetectionStatistics({ top: TOP_N })
       .then((res) => {
-        const detections = res.data;
+        const stats = res.data;
         const labels = ['TAC', 'DI', 'OC', 'IRP', 'U'];
-        const datasets = detections.map((det, index) => ({
+        const summaries = [
+          { label: 'Library mean', data: COMPONENTS.map((c) => stats.scores[c].mean) },
+          { label: 'Library median', data: COMPONENTS.map((c) => stats.scores[c].p50) },
+        ];
+        const topDetections = stats.top.map((det) => ({
           label: det.name,
-          data: [det.tac, det.di, det.oc, det.irp, det.u],
-          backgroundColor: `rgba(${(index * 50) % 255}, ${
-            (index * 80) % 255
-          }, ${(index * 110) % 255}, 0.2)`,
-          borderColor: `rgba(${(index * 50) % 255}, ${
-            (index * 80) % 255
-          }, ${(index * 110) % 255}, 1)`,
+          data: COMPONENTS.map((c) => det[c]),
+        }));
+        const datasets = [...summaries, ...topDetections].map((dataset, index) => ({
+          ...dataset,
+          backgroundColor: color(index, 0.2),
+          borderColor: color(index, 1),
           borderWidth: 1,
         }));
-        const data = {
-          labels: labels,
-          datasets: datasets,
-        };
-        setChartData(data);
+        setChartData(stats.scored > 0 ? { labels, datasets } : {});
+
+        const edges = stats.histogram_edges;
+        setHistogramData({
+          labels: edges.slice(0, -1).map((edge, index) => `${edge}-${edges[index + 1]}`),
+          datasets: [
+            {
+              label: 'Detections by Shannon score',
+              data: stats.histograms.shannon_score,
+              backgroundColor: color(1, 0.6),
+            },
+          ],
+        });
       })
       .catch((err) => console.error(err));
   }, []);
@@ -38,7 +59,10 @@ function Visualization() {
         Detection Posture Chart (S3 Scores)
       </Typography>
       {chartData.datasets && chartData.datasets.length > 0 ? (
-        <Radar data={chartData} options={{ responsive: true }} />
+        <>
+          <Radar data={chartData} options={{ responsive: true }} />
+          <Bar data={histogramData} options={{ responsive: true }} />
+        </>
       ) : (
         <Typography>No data available for visualization.</Typography>
       )}
@@ -46,4 +70,4 @@ function Visualization() {
   );
 }
 
-export default Visualization;
\ No newline at end of file
+export default Visualization;
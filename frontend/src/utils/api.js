@@ -23,10 +23,34 @@ export const uploadCSV = (file) => {
 };
 
 /**
- * Retrieve all Detection instances.
+ * Retrieve a page of Detection instances.
+ * The response is `{ next, results }`; pass `next` to getDetectionsPage for the following page.
+ * @param {Object} params - Query parameters, e.g. { fields: 'id,name,shannon_score', ordering: '-shannon_score' }.
  * @returns {Promise} - Axios GET request promise.
  */
-export const getDetections = () => axios.get(`${API_URL}/detections/`);
+export const getDetections = (params = {}) => axios.get(`${API_URL}/detections/`, { params });
+
+/**
+ * Retrieve the page of Detection instances at a `next` link returned by getDetections.
+ * @param {string} url - The `next` link of the previous page.
+ * @returns {Promise} - Axios GET request promise.
+ */
+export const getDetectionsPage = (url) => axios.get(url);
+
+/**
+ * Full-text search over detection names, descriptions and logic, best matches first.
+ * The response is paginated like getDetections; pass `next` to getDetectionsPage.
+ * @param {Object} params - Query parameters, e.g. { q: 'powershell -encoded', fields: 'id,name' }.
+ * @returns {Promise} - Axios GET request promise.
+ */
+export const searchDetections = (params = {}) => axios.get(`${API_URL}/detections/search/`, { params });
+
+/**
+ * Retrieve dashboard aggregates (score means/percentiles, histograms, top and bottom detections).
+ * @param {Object} params - Query parameters, e.g. { top: 10, bins: 10 }.
+ * @returns {Promise} - Axios GET request promise.
+ */
+export const getDetectionStatistics = (params = {}) => axios.get(`${API_URL}/detections/statistics/`, { params });
 
 /**
  * Retrieve a specific Detection by ID.